@@ -0,0 +1,114 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""Closed-loop HTTP load generator for the async view benchmark.
+
+Keeps ``--concurrency`` keep-alive connections busy for ``--duration`` seconds, each
+requesting the given paths round-robin, and prints throughput and latency
+percentiles as JSON. Only the standard library is used.
+"""
+
+import argparse
+import asyncio
+import json
+
+from time import perf_counter
+from typing import List
+
+
+async def request(reader, writer, host: str, path: str) -> int:
+    """Send a GET request and read the response, return its status code."""
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split()[1])
+    headers = dict(
+        (k.strip().lower(), v.strip())
+        for k, v in (line.split(":", 1) for line in lines[1:] if ":" in line)
+    )
+    if "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    elif headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    return status
+
+
+async def worker(
+    host: str, port: int, paths: List[str], offset: int, until: float, results
+):
+    """Request paths until the deadline on one connection."""
+    reader, writer = await asyncio.open_connection(host, port)
+    i = offset
+    while perf_counter() < until:
+        start = perf_counter()
+        status = await request(reader, writer, host, paths[i % len(paths)])
+        results["latencies"].append(perf_counter() - start)
+        if status != 200:
+            results["errors"] += 1
+        i += 1
+    writer.close()
+
+
+async def main(args):
+    """Run the benchmark."""
+    with open(args.paths) as f:
+        paths = [line.strip() for line in f if line.startswith("/")]
+    results = {"latencies": [], "errors": 0}
+    # Warm up every worker process and connection pool once.
+    await worker(args.host, args.port, paths, 0, perf_counter() + 2, results)
+    results = {"latencies": [], "errors": 0}
+
+    start = perf_counter()
+    until = start + args.duration
+    await asyncio.gather(
+        *[
+            worker(args.host, args.port, paths, i, until, results)
+            for i in range(args.concurrency)
+        ]
+    )
+    elapsed = perf_counter() - start
+
+    latencies = sorted(results["latencies"])
+
+    def percentile(p: int) -> float:
+        return round(latencies[max(0, -(-len(latencies) * p // 100) - 1)] * 1000, 1)
+
+    print(
+        json.dumps(
+            {
+                "concurrency": args.concurrency,
+                "requests": len(latencies),
+                "errors": results["errors"],
+                "requests_per_second": round(len(latencies) / elapsed, 1),
+                "latency_ms": {p: percentile(p) for p in (50, 90, 99)},
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("paths", help="File with one request path per line.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30)
+    asyncio.run(main(parser.parse_args()))
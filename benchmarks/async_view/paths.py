@@ -0,0 +1,78 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""Write the request paths of the async view benchmark.
+
+Run with ``python manage.py shell < paths.py > paths.txt`` on the benchmark
+database. Half of the requests are GetRecords of random identifiers, the rest are
+ListIdentifiers and ListRecords first pages, set pages and deep pages.
+"""
+
+import random
+
+from django.utils import timezone
+
+from django_oai_pmh import tokens
+from django_oai_pmh.models import Header, Set
+from django_oai_pmh.settings import NUM_PER_PAGE
+
+random.seed(0)
+N = 400
+
+headers = Header.objects.filter(metadata_formats__prefix="oai_dc").order_by(
+    "identifier", "pk"
+)
+count = headers.count()
+identifiers = list(headers.values_list("identifier", flat=True)[:: count // 100])
+specs = list(Set.objects.values_list("spec", flat=True))
+
+
+def deep_page(verb):
+    """Get the path of a random deep page of verb, continued with keyset."""
+    cursor = random.randrange(1, count // NUM_PER_PAGE) * NUM_PER_PAGE
+    token = tokens.issue(
+        {
+            "metadata_prefix": "oai_dc",
+            "set_spec": None,
+            "from_timestamp": None,
+            "until_timestamp": None,
+            "cursor": cursor,
+            "complete_list_size": count,
+            "last_key": headers.values_list("identifier", "pk")[cursor - 1],
+            "expiration_date": timezone.now() + timezone.timedelta(days=30),
+        }
+    )
+    return f"/oai2?verb={verb}&resumptionToken={token}"
+
+
+paths = []
+for i in range(N):
+    verb = random.choice(["ListIdentifiers", "ListRecords"])
+    kind = i % 8
+    if kind < 4:
+        paths.append(
+            "/oai2?verb=GetRecord&metadataPrefix=oai_dc&identifier="
+            + random.choice(identifiers)
+        )
+    elif kind == 4:
+        paths.append(f"/oai2?verb={verb}&metadataPrefix=oai_dc")
+    elif kind == 5:
+        paths.append(
+            f"/oai2?verb={verb}&metadataPrefix=oai_dc&set={random.choice(specs)}"
+        )
+    else:
+        paths.append(deep_page(verb))
+print("\n".join(paths))
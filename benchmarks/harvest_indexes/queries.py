@@ -0,0 +1,86 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""Harvest query shapes of the index benchmark.
+
+Run with ``python manage.py shell < queries.py`` against a database seeded with
+``seed.sql``. Prints the median execution time of five ``EXPLAIN ANALYZE`` runs and
+the plan of every shape.
+"""
+
+import json
+import statistics
+
+from datetime import datetime, timezone
+from django.db import connection
+from django_oai_pmh.models import Header
+from django_oai_pmh.paginator import KeysetPaginator
+
+
+def headers(prefix, spec=None, from_timestamp=None, until_timestamp=None):
+    """Build the header queryset of a ListIdentifiers/ListRecords request."""
+    qs = Header.objects.filter(metadata_formats__prefix=prefix)
+    if spec:
+        qs = qs.filter(sets__spec=spec)
+    if from_timestamp:
+        qs = qs.filter(timestamp__gte=from_timestamp)
+    if until_timestamp:
+        qs = qs.filter(timestamp__lte=until_timestamp)
+    return qs
+
+
+middle = Header.objects.order_by("identifier").values_list("identifier", "pk")[
+    Header.objects.count() // 2
+]
+march = datetime(2020, 3, 1, tzinfo=timezone.utc)
+shapes = {
+    "first page oai_dc": headers("oai_dc")[:100],
+    "first page mets (10%)": headers("mets")[:100],
+    "first page oai_dc + set": headers("oai_dc", "set:42")[:100],
+    "oai_dc from last 60 days": headers(
+        "oai_dc", from_timestamp=datetime(2025, 11, 1, tzinfo=timezone.utc)
+    )[:100],
+    "oai_dc, one day": headers(
+        "oai_dc",
+        from_timestamp=march,
+        until_timestamp=datetime(2020, 3, 2, tzinfo=timezone.utc),
+    )[:100],
+    "oai_dc + set, one month": headers(
+        "oai_dc",
+        "set:42",
+        march,
+        datetime(2020, 4, 1, tzinfo=timezone.utc),
+    )[:100],
+    "keyset deep page oai_dc": KeysetPaginator(headers("oai_dc"), 100, 0, middle)
+    .page()
+    .object_list,
+    "offset deep page oai_dc": headers("oai_dc")[1500000:1500100],
+}
+
+with connection.cursor() as cursor:
+    for name, qs in shapes.items():
+        sql, params = qs.query.sql_with_params()
+        times = []
+        for i in range(5):
+            cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            times.append(plan[0]["Execution Time"])
+        cursor.execute(f"EXPLAIN {sql}", params)
+        print(f"## {name}: {statistics.median(times):.1f} ms")
+        print("\n".join(row[0] for row in cursor.fetchall()))
+        print()
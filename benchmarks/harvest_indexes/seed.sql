@@ -0,0 +1,45 @@
+-- Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+--
+-- This file is part of django_oai_pmh.
+--
+-- django_oai_pmh is free software: you can redistribute it and/or modify
+-- it under the terms of the GNU General Public License as published by
+-- the Free Software Foundation, either version 3 of the License, or
+-- (at your option) any later version.
+--
+-- django_oai_pmh is distributed in the hope that it will be useful,
+-- but WITHOUT ANY WARRANTY; without even the implied warranty of
+-- MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+-- GNU General Public License for more details.
+--
+-- You should have received a copy of the GNU General Public License
+-- along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+
+-- Synthetic corpus for the harvest index benchmark, run with
+-- psql -v n=3000000 -f seed.sql <db> against a freshly migrated database.
+
+INSERT INTO django_oai_pmh_metadataformat (created_at, updated_at, prefix, schema, namespace)
+VALUES (now(), now(), 'marcxml', 'http://www.loc.gov/standards/marcxml/schema/MARC21slim.xsd', 'http://www.loc.gov/MARC21/slim'),
+       (now(), now(), 'mets', 'http://www.loc.gov/standards/mets/mets.xsd', 'http://www.loc.gov/METS/')
+ON CONFLICT DO NOTHING;
+
+INSERT INTO django_oai_pmh_set (created_at, updated_at, spec, name)
+SELECT now(), now(), 'set:' || i, 'Set ' || i FROM generate_series(0, 99) i;
+
+INSERT INTO django_oai_pmh_header (created_at, updated_at, identifier, timestamp, deleted)
+SELECT now(), now(), 'oai:bench:' || md5(i::text),
+       timestamp with time zone '2016-01-01 00:00:00+00' + (i::float / :n) * interval '3650 days' + random() * interval '30 days',
+       i % 50 = 0
+FROM generate_series(1, :n) i;
+
+INSERT INTO django_oai_pmh_header_metadata_formats (header_id, metadataformat_id)
+SELECT h.id, f.id FROM django_oai_pmh_header h, django_oai_pmh_metadataformat f
+WHERE f.prefix = 'oai_dc' OR (f.prefix = 'marcxml' AND h.id % 2 = 0) OR (f.prefix = 'mets' AND h.id % 10 = 0);
+
+INSERT INTO django_oai_pmh_header_sets (header_id, set_id)
+SELECT h.id, s.id FROM django_oai_pmh_header h JOIN django_oai_pmh_set s ON s.spec = 'set:' || (h.id % 100)
+UNION ALL
+SELECT h.id, s.id FROM django_oai_pmh_header h JOIN django_oai_pmh_set s ON s.spec = 'set:' || ((h.id / 100) % 100)
+WHERE h.id % 3 = 0 AND (h.id / 100) % 100 <> h.id % 100;
+
+VACUUM ANALYZE;
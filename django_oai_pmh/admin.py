@@ -21,7 +21,47 @@ from django.db import models
 from django.forms.widgets import TextInput
 from django.utils.translation import gettext_lazy as _
 
-from .models import DCRecord, Header, MetadataFormat, ResumptionToken, Set, XMLRecord
+from .models import (
+    CachedRecord,
+    Change,
+    DCRecord,
+    HarvestHeader,
+    Header,
+    HeaderCount,
+    MetadataFormat,
+    ResumptionToken,
+    Set,
+    Snapshot,
+    XMLRecord,
+)
+
+
+@admin.register(CachedRecord)
+class CachedRecordAdmin(admin.ModelAdmin):
+    """CachedRecord Django admin."""
+
+    fieldsets = [
+        (None, {"fields": ["created_at", "updated_at", "header", "metadata_format"]}),
+        (_("XML"), {"fields": ["xml"]}),
+    ]
+    list_display = ("header", "metadata_format", "updated_at")
+    readonly_fields = ("created_at", "updated_at")
+    search_fields = ("header__identifier", "metadata_format__prefix")
+
+
+@admin.register(Change)
+class ChangeAdmin(admin.ModelAdmin):
+    """Change Django admin."""
+
+    fieldsets = [
+        (
+            None,
+            {"fields": ["header", "timestamp", "metadata_prefixes", "set_specs"]},
+        )
+    ]
+    list_display = ("header", "timestamp")
+    raw_id_fields = ("header",)
+    search_fields = ("header__identifier",)
 
 
 @admin.register(DCRecord)
@@ -81,6 +121,20 @@ class DCRecordAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(HarvestHeader)
+class HarvestHeaderAdmin(admin.ModelAdmin):
+    """HarvestHeader Django admin."""
+
+    fieldsets = [
+        (None, {"fields": ["header", "metadata_format", "metadata_prefix"]}),
+        (_("Header"), {"fields": ["identifier", "timestamp", "deleted", "set_specs"]}),
+    ]
+    list_display = ("identifier", "metadata_prefix", "timestamp", "deleted")
+    list_filter = ("metadata_prefix", "deleted")
+    raw_id_fields = ("header",)
+    search_fields = ("identifier",)
+
+
 @admin.register(Header)
 class HeaderAdmin(admin.ModelAdmin):
     """Header Django admin."""
@@ -111,6 +165,16 @@ class HeaderAdmin(admin.ModelAdmin):
     search_fields = ("identifier",)
 
 
+@admin.register(HeaderCount)
+class HeaderCountAdmin(admin.ModelAdmin):
+    """HeaderCount Django admin."""
+
+    fieldsets = [(None, {"fields": ["metadata_format", "set", "count"]})]
+    list_display = ("metadata_format", "set", "count")
+    list_filter = ("metadata_format",)
+    search_fields = ("metadata_format__prefix", "set__spec")
+
+
 @admin.register(MetadataFormat)
 class MetadataFormatAdmin(admin.ModelAdmin):
     """MetadataFormat Django admin."""
@@ -155,6 +219,8 @@ class ResumptionTokenAdmin(admin.ModelAdmin):
                     "until_timestamp",
                     "metadata_prefix",
                     "set_spec",
+                    "last_identifier",
+                    "last_id",
                 ],
                 "classes": ("collapse",),
             },
@@ -185,6 +251,18 @@ class SetAdmin(admin.ModelAdmin):
     search_fields = ("name", "spec", "description")
 
 
+@admin.register(Snapshot)
+class SnapshotAdmin(admin.ModelAdmin):
+    """Snapshot Django admin."""
+
+    fieldsets = [
+        (None, {"fields": ["created_at", "updated_at", "completed_at", "stale"]})
+    ]
+    list_display = ("created_at", "completed_at", "stale")
+    list_filter = ("stale",)
+    readonly_fields = ("created_at", "updated_at", "completed_at")
+
+
 @admin.register(XMLRecord)
 class XMLRecordAdmin(admin.ModelAdmin):
     """XMLRecord Django admin."""
@@ -0,0 +1,282 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""OAI-PMH Django app benchmark.
+
+Seeds a synthetic corpus and measures latency, queries and response size of every
+verb through the OAI-PMH view, and the throughput of the serializers. Used by the
+``oai_benchmark`` command.
+"""
+
+import random
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection, reset_queries
+from django.db.models import Max, Min, Prefetch
+from django.template.loader import get_template
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import counts, harvest, serializers, sets as set_hierarchy, tokens, views
+from .models import DCRecord, Header, MetadataFormat, Set, XMLRecord
+from .settings import HARVEST_TABLE, NUM_PER_PAGE, PAGINATION
+
+
+def seed(headers: int, sets: int, metadata_formats: int):
+    """Seed a synthetic corpus with SQL.
+
+    Every header is in ``oai_dc`` with a DCRecord and in one set; the n-th additional
+    metadata format ``formatn`` covers every (n + 1)-th header with an XMLRecord.
+    Identifiers are md5 hashes, so their order is unrelated to insertion order.
+    """
+    header = Header._meta.db_table
+    header_formats = Header.metadata_formats.through._meta.db_table
+    header_sets = Header.sets.through._meta.db_table
+    statements = [
+        (
+            f"INSERT INTO {MetadataFormat._meta.db_table} (created_at, updated_at, "
+            + "prefix, schema, namespace) SELECT now(), now(), 'format' || i, "
+            + "'http://example.com/format' || i || '.xsd', 'http://example.com/format' "
+            + "|| i FROM generate_series(1, %s) i ON CONFLICT DO NOTHING",
+            [metadata_formats - 1],
+        ),
+        (
+            f"INSERT INTO {Set._meta.db_table} (created_at, updated_at, spec, name) "
+            + "SELECT now(), now(), 'set:' || i, 'Set ' || i FROM generate_series(0, "
+            + "%s) i ON CONFLICT DO NOTHING",
+            [sets - 1],
+        ),
+        (
+            f"INSERT INTO {header} (created_at, updated_at, identifier, timestamp, "
+            + "deleted) SELECT now(), now(), 'oai:benchmark:' || md5(i::text), "
+            + "timestamp with time zone '2016-01-01 00:00:00+00' + (i::float / %s) "
+            + "* interval '3650 days', i %% 50 = 0 FROM generate_series(1, %s) i",
+            [headers, headers],
+        ),
+        (
+            f"INSERT INTO {header_formats} (header_id, metadataformat_id) SELECT h.id, "
+            + f"f.id FROM {header} h, {MetadataFormat._meta.db_table} f WHERE "
+            + "f.prefix = 'oai_dc' OR (f.prefix LIKE 'format%%' AND h.id %% "
+            + "(substr(f.prefix, 7)::int + 1) = 0)",
+            [],
+        ),
+        (
+            f"INSERT INTO {header_sets} (header_id, set_id) SELECT h.id, s.id FROM "
+            + f"{header} h JOIN {Set._meta.db_table} s ON s.spec = 'set:' || (h.id %% "
+            + "%s)",
+            [sets],
+        ),
+        (
+            f"INSERT INTO {DCRecord._meta.db_table} (created_at, updated_at, "
+            + "header_id, title, creator, date, identifier) SELECT now(), now(), id, "
+            + "ARRAY['Title ' || id], ARRAY['Creator ' || (id %% 1000)], "
+            + "ARRAY[to_char(timestamp, 'YYYY-MM-DD')], ARRAY[identifier] FROM "
+            + header,
+            [],
+        ),
+        (
+            f"INSERT INTO {XMLRecord._meta.db_table} (created_at, updated_at, "
+            + "header_id, metadata_prefix_id, xml_metadata) SELECT now(), now(), "
+            + "hf.header_id, f.id, '<record xmlns=\"' || f.namespace || '\"><id>' || "
+            + f"hf.header_id || '</id></record>' FROM {header_formats} hf JOIN "
+            + f"{MetadataFormat._meta.db_table} f ON f.id = hf.metadataformat_id "
+            + "WHERE f.prefix <> 'oai_dc'",
+            [],
+        ),
+    ]
+    with connection.cursor() as cursor:
+        for sql, params in statements:
+            cursor.execute(sql, params)
+    set_hierarchy.add(Set.objects.filter(ancestors__isnull=True))
+    counts.recount()
+    if HARVEST_TABLE:
+        harvest.rebuild()
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+
+def run(repeat: int = 20, depth: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """Measure every request shape repeat times.
+
+    Requests are answered by the view without its decorators, so throttling,
+    coalescing, compression, timing and metrics are not measured.
+
+    Deep pages are requested with a resumption token issued for the page at depth,
+    by default the middle of the list.
+
+    Returns:
+     * for every request shape the latency percentiles in ms, the median number of
+       queries and the median response size in bytes
+    """
+    factory = RequestFactory()
+    pks = Header.objects.aggregate(min=Min("pk"), max=Max("pk"))
+    identifiers = list(
+        Header.objects.filter(
+            pk__in=random.sample(
+                range(pks["min"], pks["max"] + 1),
+                min(repeat, pks["max"] - pks["min"] + 1),
+            )
+        ).values_list("identifier", flat=True)
+    )
+    count = Header.objects.filter(metadata_formats__prefix="oai_dc").count()
+    if depth is None:
+        depth = count // 2
+    depth -= depth % NUM_PER_PAGE
+
+    def deep_page(verb: str) -> Callable[[], str]:
+        last_key = (
+            Header.objects.filter(metadata_formats__prefix="oai_dc")
+            .order_by("identifier", "pk")
+            .values_list("identifier", "pk")[depth - 1]
+        )
+        token = tokens.issue(
+            {
+                "metadata_prefix": "oai_dc",
+                "set_spec": None,
+                "from_timestamp": None,
+                "until_timestamp": None,
+                "cursor": depth,
+                "complete_list_size": count,
+                "last_key": last_key if PAGINATION == "keyset" else None,
+                "expiration_date": timezone.now() + timezone.timedelta(days=1),
+            }
+        )
+        return lambda: f"/oai2?verb={verb}&resumptionToken={token}"
+
+    list_url = "/oai2?verb={}&metadataPrefix=oai_dc"
+    shapes: Dict[str, Callable[[], str]] = {
+        "Identify": lambda: "/oai2?verb=Identify",
+        "GetRecord": lambda: list_url.format("GetRecord")
+        + f"&identifier={random.choice(identifiers)}",
+        "ListMetadataFormats": lambda: "/oai2?verb=ListMetadataFormats",
+        "ListSets": lambda: "/oai2?verb=ListSets",
+        "ListIdentifiers first page": lambda: list_url.format("ListIdentifiers"),
+        "ListIdentifiers set first page": lambda: list_url.format("ListIdentifiers")
+        + "&set=set:0",
+        "ListRecords first page": lambda: list_url.format("ListRecords"),
+    }
+    if depth > 0:
+        shapes["ListIdentifiers deep page"] = deep_page("ListIdentifiers")
+        shapes["ListRecords deep page"] = deep_page("ListRecords")
+
+    results = {}
+    for name, url in shapes.items():
+        latencies: List[float] = []
+        queries: List[int] = []
+        sizes: List[int] = []
+        for i in range(repeat):
+            request = factory.get(url())
+            request.user = AnonymousUser()
+            # The query log is capped, once it's full nothing would be counted.
+            reset_queries()
+            with CaptureQueriesContext(connection) as context:
+                start = perf_counter()
+                response = views._oai2(request)
+                if response.streaming:
+                    content = b"".join(response.streaming_content)
+                else:
+                    content = response.content
+                latencies.append((perf_counter() - start) * 1000)
+            queries.append(len(context))
+            sizes.append(len(content))
+        results[name] = {
+            "latency_ms": {
+                "min": round(min(latencies), 3),
+                "p50": round(_percentile(latencies, 50), 3),
+                "p90": round(_percentile(latencies, 90), 3),
+                "p99": round(_percentile(latencies, 99), 3),
+                "max": round(max(latencies), 3),
+            },
+            "queries": _percentile(queries, 50),
+            "bytes": _percentile(sizes, 50),
+        }
+    return results
+
+
+def run_serializers(repeat: int = 20) -> Dict[str, Dict[str, float]]:
+    """Measure the throughput of the templates and the fast serializer.
+
+    Renders the first page of headers, of ``oai_dc`` records and, if there is a
+    second metadata format, of XMLRecords repeat times, with everything prefetched
+    like ``views.oai2`` does, so only rendering is measured.
+
+    Returns:
+     * for every kind of page the median records/sec of both serializers
+    """
+    prefixes = ["oai_dc"]
+    if MetadataFormat.objects.filter(prefix="format1").exists():
+        prefixes.append("format1")
+
+    def page(metadata_prefix: str) -> List[Header]:
+        return list(
+            Header.objects.filter(metadata_formats__prefix=metadata_prefix)
+            .select_related("dcrecord")
+            .prefetch_related(
+                "sets",
+                Prefetch(
+                    "xmlrecords",
+                    queryset=XMLRecord.objects.filter(
+                        metadata_prefix__prefix=metadata_prefix
+                    )
+                    .select_related("metadata_prefix")
+                    .order_by(),
+                    to_attr="prefetched_xmlrecords",
+                ),
+            )[:NUM_PER_PAGE]
+        )
+
+    def template(name: str, headers: List[Header], metadata_prefix: str) -> None:
+        t = get_template(f"django_oai_pmh/partials/{name}")
+        for header in headers:
+            t.render({"header": header, "metadata_prefix": metadata_prefix})
+
+    pages: Dict[str, Tuple[Callable[..., None], Callable[..., None], List, str]] = {
+        "headers": (
+            lambda h, p: template("_header.xml", h, p),
+            lambda h, p: serializers.write_headers([], h),
+            page("oai_dc"),
+            "oai_dc",
+        )
+    }
+    for prefix in prefixes:
+        pages[f"records {prefix}"] = (
+            lambda h, p: template("_record.xml", h, p),
+            lambda h, p: serializers.write_records([], h, p),
+            page(prefix),
+            prefix,
+        )
+
+    results: Dict[str, Dict[str, float]] = {}
+    for name, (slow, fast, headers, prefix) in pages.items():
+        results[name] = {}
+        for serializer, f in [("template", slow), ("fast", fast)]:
+            rates = []
+            for i in range(repeat):
+                start = perf_counter()
+                f(headers, prefix)
+                rates.append(len(headers) / (perf_counter() - start))
+            results[name][serializer] = round(_percentile(rates, 50), 1)
+    return results
+
+
+def _percentile(values: List, p: int):
+    """Get the nearest-rank percentile."""
+    values = sorted(values)
+    return values[max(0, -(-len(values) * p // 100) - 1)]
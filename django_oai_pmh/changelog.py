@@ -0,0 +1,119 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""OAI-PMH Django app change log.
+
+With CHANGE_LOG enabled every change of a header, its records or its metadata
+formats and sets appends a Change with the header's timestamp and memberships at
+that time. The last change of a header always carries its current timestamp, so
+the headers with a timestamp since ``from`` are among the headers of the changes
+since then, found with a range scan of the change index instead of the whole
+repository.
+"""
+
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db.models import Exists, OuterRef
+from typing import Iterable, Optional
+
+from . import sets
+from .models import Change, Header, MetadataFormat, Set
+
+
+def log(header_pks: Iterable[int]) -> int:
+    """Append a change for every header with its current timestamp and memberships.
+
+    Returns:
+     * number of appended changes
+    """
+    rows = (
+        Header.objects.filter(pk__in=list(header_pks))
+        .annotate(
+            prefixes=ArraySubquery(
+                MetadataFormat.objects.filter(identifiers=OuterRef("pk")).values(
+                    "prefix"
+                )
+            ),
+            specs=ArraySubquery(
+                Set.objects.filter(headers=OuterRef("pk")).values("spec")
+            ),
+        )
+        .values_list("pk", "timestamp", "prefixes", "specs")
+    )
+    return len(
+        Change.objects.bulk_create(
+            [
+                Change(
+                    header_id=pk,
+                    timestamp=timestamp,
+                    metadata_prefixes=prefixes,
+                    set_specs=specs,
+                )
+                for pk, timestamp, prefixes, specs in rows
+            ],
+            batch_size=1000,
+        )
+    )
+
+
+def changed(
+    from_timestamp,
+    until_timestamp=None,
+    metadata_prefix: Optional[str] = None,
+    set_spec: Optional[str] = None,
+):
+    """Get the pks of the headers changed between from and until.
+
+    Includes every header with a timestamp in that window and metadata prefix and
+    set, but possibly more, filter on the headers as well.
+    """
+    changes = Change.objects.filter(timestamp__gte=from_timestamp)
+    if until_timestamp:
+        changes = changes.filter(timestamp__lte=until_timestamp)
+    if metadata_prefix:
+        changes = changes.filter(metadata_prefixes__contains=[metadata_prefix])
+    if set_spec:
+        changes = changes.filter(set_specs__overlap=sets.subset_specs(set_spec))
+    return changes.order_by().values("header_id")
+
+
+def prune() -> int:
+    """Delete the changes superseded by a later change of the same header.
+
+    Returns:
+     * number of deleted changes
+    """
+    return Change.objects.filter(
+        Exists(
+            Change.objects.filter(
+                header_id=OuterRef("header_id"), pk__gt=OuterRef("pk")
+            )
+        )
+    ).delete()[0]
+
+
+def rebuild(batch_size: int = 10000) -> int:
+    """Replace the change log with one change per header.
+
+    Returns:
+     * number of logged headers
+    """
+    Change.objects.all().delete()
+    pks = list(Header.objects.order_by("pk").values_list("pk", flat=True))
+    logged = 0
+    for i in range(0, len(pks), batch_size):
+        j = i + batch_size
+        logged += log(pks[i:j])
+    return logged
@@ -0,0 +1,238 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""OAI-PMH Django app request coalescing.
+
+Concurrent requests with the same verb and arguments are answered by the first of
+them, the others wait for its response and get a copy of it instead of running all
+queries and rendering again. Enabled by COALESCING, within a process. With
+COALESCING_CACHE a lock in the cache coalesces the requests of all processes, the
+response is passed on through the cache. Followers wait at most COALESCING_TIMEOUT
+seconds, and answer the request themselves if the response can't be shared.
+
+Only successful responses that are not streamed are shared. Conditional requests
+are always answered on their own, their response depends on the client's ETag.
+Requests are only coalesced with requests that prefer the same encoding, as a
+compressed response might be served from the cache.
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.http import urlencode
+from functools import wraps
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import compression, metrics
+from .settings import COALESCING, COALESCING_CACHE, COALESCING_TIMEOUT
+
+
+LOCK_KEY = "django_oai_pmh:coalescing:lock:{key}"
+RESPONSE_KEY = "django_oai_pmh:coalescing:response:{flight}"
+# Seconds between looking for the response of another process.
+POLL_INTERVAL = 0.05
+# Seconds the response is kept for the processes waiting for it.
+RESPONSE_TIMEOUT = 5
+
+Shared = Tuple[bytes, int, List[Tuple[str, str]], Optional[Dict[str, Any]]]
+
+
+class Flight:
+    """A request in flight in this process."""
+
+    def __init__(self) -> None:
+        """Init."""
+        self.done = threading.Event()
+        self.response: Optional[Shared] = None
+
+
+_flights: Dict[str, Flight] = {}
+_lock = threading.Lock()
+_async_flights: Dict[Tuple[asyncio.AbstractEventLoop, str], asyncio.Future] = {}
+
+
+def request_key(request) -> Optional[str]:
+    """Get the key of request, from path, verb, arguments and preferred encoding.
+
+    Returns None if request can't be coalesced.
+    """
+    if request.method not in ("GET", "POST") or any(
+        header in request.headers for header in ("If-Modified-Since", "If-None-Match")
+    ):
+        return None
+    params = request.POST if request.method == "POST" else request.GET
+    encoding = next(iter(compression.accepted(request)), "identity")
+    key = "\n".join(
+        [request.path, urlencode(sorted(params.lists()), doseq=True), encoding]
+    )
+    return hashlib.sha1(key.encode("utf8")).hexdigest()
+
+
+def share(response) -> Optional[Shared]:
+    """Get body, status, headers and metrics of response, if it can be shared."""
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return None
+    return (
+        response.content,
+        response.status_code,
+        list(response.items()),
+        metrics.get_request(),
+    )
+
+
+def copy(shared: Shared) -> HttpResponse:
+    """Get a new response from a shared one, and take over its metrics."""
+    content, status, headers, sample = shared
+    metrics.update_request(sample)
+    response = HttpResponse(content, status=status)
+    for header, value in headers:
+        response.headers[header] = value
+    return response
+
+
+def coalesced(view):
+    """Coalesce concurrent identical requests of view, if COALESCING is enabled."""
+    if iscoroutinefunction(view):
+
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            key = request_key(request) if COALESCING else None
+            if key is None:
+                return await view(request, *args, **kwargs)
+
+            flight_key = (asyncio.get_running_loop(), key)
+            if flight_key in _async_flights:
+                try:
+                    shared = await asyncio.wait_for(
+                        asyncio.shield(_async_flights[flight_key]), COALESCING_TIMEOUT
+                    )
+                except Exception:
+                    shared = None
+                if shared is not None:
+                    return copy(shared)
+                return await view(request, *args, **kwargs)
+
+            future = asyncio.get_running_loop().create_future()
+            _async_flights[flight_key] = future
+            try:
+                response = await _alead(key, view, request, *args, **kwargs)
+                future.set_result(share(response))
+                return response
+            finally:
+                if not future.done():
+                    future.set_result(None)
+                del _async_flights[flight_key]
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request_key(request) if COALESCING else None
+        if key is None:
+            return view(request, *args, **kwargs)
+
+        with _lock:
+            flight = _flights.get(key)
+            leader = flight is None
+            if flight is None:
+                flight = _flights[key] = Flight()
+        if not leader:
+            if flight.done.wait(COALESCING_TIMEOUT) and flight.response is not None:
+                return copy(flight.response)
+            return view(request, *args, **kwargs)
+
+        try:
+            response = _lead(key, view, request, *args, **kwargs)
+            flight.response = share(response)
+            return response
+        finally:
+            with _lock:
+                del _flights[key]
+            flight.done.set()
+
+    return wrapper
+
+
+def _lead(key: str, view, request, *args, **kwargs):
+    """Answer request, or wait for the response of another process."""
+    if not COALESCING_CACHE:
+        return view(request, *args, **kwargs)
+
+    flight = uuid.uuid4().hex
+    lock_key = LOCK_KEY.format(key=key)
+    if cache.add(lock_key, flight, COALESCING_TIMEOUT):
+        try:
+            response = view(request, *args, **kwargs)
+            shared = share(response)
+            if shared is not None:
+                cache.set(RESPONSE_KEY.format(flight=flight), shared, RESPONSE_TIMEOUT)
+            return response
+        finally:
+            if cache.get(lock_key) == flight:
+                cache.delete(lock_key)
+
+    other = cache.get(lock_key)
+    deadline = time.monotonic() + COALESCING_TIMEOUT
+    while other is not None and time.monotonic() < deadline:
+        # The response is stored before the lock is released.
+        running = cache.get(lock_key) == other
+        shared = cache.get(RESPONSE_KEY.format(flight=other))
+        if shared is not None:
+            return copy(shared)
+        elif not running:
+            break
+        time.sleep(POLL_INTERVAL)
+    return view(request, *args, **kwargs)
+
+
+async def _alead(key: str, view, request, *args, **kwargs):
+    """Answer request, or wait for the response of another process, see _lead."""
+    if not COALESCING_CACHE:
+        return await view(request, *args, **kwargs)
+
+    flight = uuid.uuid4().hex
+    lock_key = LOCK_KEY.format(key=key)
+    if await cache.aadd(lock_key, flight, COALESCING_TIMEOUT):
+        try:
+            response = await view(request, *args, **kwargs)
+            shared = share(response)
+            if shared is not None:
+                await cache.aset(
+                    RESPONSE_KEY.format(flight=flight), shared, RESPONSE_TIMEOUT
+                )
+            return response
+        finally:
+            if await cache.aget(lock_key) == flight:
+                await cache.adelete(lock_key)
+
+    other = await cache.aget(lock_key)
+    deadline = time.monotonic() + COALESCING_TIMEOUT
+    while other is not None and time.monotonic() < deadline:
+        # The response is stored before the lock is released.
+        running = await cache.aget(lock_key) == other
+        shared = await cache.aget(RESPONSE_KEY.format(flight=other))
+        if shared is not None:
+            return copy(shared)
+        elif not running:
+            break
+        await asyncio.sleep(POLL_INTERVAL)
+    return await view(request, *args, **kwargs)
@@ -0,0 +1,190 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""OAI-PMH Django app compression.
+
+Responses are compressed with the encoding of COMPRESSION the client prefers, gzip
+or deflate, Identify advertises them. Streaming responses are compressed as they
+are sent. If COMPRESSION_CACHE_TIMEOUT is set, compressed bodies of responses with
+an ETag are kept in the cache for that many seconds, so repeated Identify,
+GetRecord, ListMetadataFormats and ListSets requests are neither rendered nor
+compressed again, at the cost of a ``responseDate`` up to that old.
+"""
+
+import re
+import zlib
+
+from asgiref.sync import iscoroutinefunction
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from functools import wraps
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from .settings import COMPRESSION, COMPRESSION_CACHE_TIMEOUT
+
+
+CACHE_KEY = "django_oai_pmh:compressed:{encoding}:{etag}"
+# Smaller bodies don't get smaller.
+MIN_LENGTH = 200
+WBITS = {"gzip": 16 + zlib.MAX_WBITS, "deflate": zlib.MAX_WBITS}
+
+
+def accepted(request) -> List[str]:
+    """Get the encodings of COMPRESSION the client accepts, preferred first."""
+    qvalues = {}
+    for part in request.headers.get("Accept-Encoding", "").split(","):
+        coding, _, params = part.partition(";")
+        match = re.search(r"\bq=([0-9.]+)", params)
+        try:
+            qvalue = float(match.group(1)) if match else 1.0
+        except ValueError:
+            qvalue = 0.0
+        coding = coding.strip().lower()
+        qvalues["gzip" if coding == "x-gzip" else coding] = qvalue
+
+    encodings = [e for e in COMPRESSION if qvalues.get(e, qvalues.get("*", 0)) > 0]
+    return sorted(encodings, key=lambda e: -qvalues.get(e, qvalues.get("*", 0)))
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Compress data with encoding."""
+    compressor = zlib.compressobj(wbits=WBITS[encoding])
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_sequence(sequence: Iterable, encoding: str) -> Iterator[bytes]:
+    """Compress the chunks of a streaming response with encoding.
+
+    Compressed data is yielded as soon as zlib emits it, without flushing after
+    every chunk.
+    """
+    compressor = zlib.compressobj(wbits=WBITS[encoding])
+    for chunk in sequence:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def cached_response(request, etag: Optional[str]) -> Optional[HttpResponse]:
+    """Get the response with etag from the cache, compressed for request."""
+    key, encoding = _cache_key(request, etag)
+    if key is None:
+        return None
+    return _cached_response(cache.get(key), encoding)
+
+
+async def acached_response(request, etag: Optional[str]) -> Optional[HttpResponse]:
+    """Get the response with etag from the cache, compressed for request."""
+    key, encoding = _cache_key(request, etag)
+    if key is None:
+        return None
+    return _cached_response(await cache.aget(key), encoding)
+
+
+def compress_response(request, response):
+    """Compress response with the encoding the client prefers.
+
+    Error status codes, responses that are already encoded and small bodies are
+    left alone.
+    """
+    key, content = _compress_response(request, response)
+    if key is not None:
+        cache.set(key, content, COMPRESSION_CACHE_TIMEOUT)
+    return response
+
+
+async def acompress_response(request, response):
+    """Compress response with the encoding the client prefers, see compress_response."""
+    key, content = _compress_response(request, response)
+    if key is not None:
+        await cache.aset(key, content, COMPRESSION_CACHE_TIMEOUT)
+    return response
+
+
+def compressed(view):
+    """Compress the responses of view, see compress_response."""
+    if iscoroutinefunction(view):
+
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            return await acompress_response(
+                request, await view(request, *args, **kwargs)
+            )
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        return compress_response(request, view(request, *args, **kwargs))
+
+    return wrapper
+
+
+def _cache_key(request, etag: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """Get the cache key and encoding of the response with etag for request."""
+    encodings = accepted(request)
+    if not etag or not encodings or not COMPRESSION_CACHE_TIMEOUT:
+        return None, None
+    return CACHE_KEY.format(encoding=encodings[0], etag=etag), encodings[0]
+
+
+def _cached_response(
+    content: Optional[bytes], encoding: Optional[str]
+) -> Optional[HttpResponse]:
+    if content is None:
+        return None
+    response = HttpResponse(content, content_type="text/xml")
+    response.headers["Content-Encoding"] = encoding
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return response
+
+
+def _compress_response(request, response) -> Tuple[Optional[str], Optional[bytes]]:
+    """Compress response, see compress_response.
+
+    Returns the cache key and the compressed body, if it is to be cached.
+    """
+    if (
+        not COMPRESSION
+        or response.status_code != 200
+        or response.has_header("Content-Encoding")
+    ):
+        return None, None
+    patch_vary_headers(response, ["Accept-Encoding"])
+    encodings = accepted(request)
+    if not encodings:
+        return None, None
+
+    key, content = None, None
+    if response.streaming:
+        response.streaming_content = compress_sequence(
+            response.streaming_content, encodings[0]
+        )
+        if response.has_header("Content-Length"):
+            del response.headers["Content-Length"]
+    else:
+        if len(response.content) < MIN_LENGTH:
+            return None, None
+        etag = response.headers.get("ETag")
+        content = compress(response.content, encodings[0])
+        if etag and COMPRESSION_CACHE_TIMEOUT:
+            key = CACHE_KEY.format(encoding=encodings[0], etag=etag)
+        response.content = content
+        response.headers["Content-Length"] = str(len(content))
+    response.headers["Content-Encoding"] = encodings[0]
+    return key, content
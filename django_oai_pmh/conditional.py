@@ -0,0 +1,112 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""OAI-PMH Django app conditional requests."""
+
+import hashlib
+
+from datetime import datetime
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils.http import quote_etag
+from typing import List, Optional, Tuple
+
+from . import __version__
+from .identify import earliest_header_timestamp
+from .models import Header, MetadataFormat, Set
+from .settings import BASE_URL, NUM_PER_PAGE, REPOSITORY_NAME
+
+
+ARGUMENTS = {
+    "GetRecord": {"identifier", "metadataPrefix"},
+    "Identify": set(),
+    "ListMetadataFormats": {"identifier"},
+    "ListSets": set(),
+}
+
+
+def get_validators(params) -> Tuple[Optional[str], Optional[datetime]]:
+    """Get ETag and Last-Modified of the response to a request.
+
+    Only Identify, GetRecord, ListMetadataFormats and ListSets responses that are
+    not an error and contain no resumption token can be validated, for every other
+    request ``(None, None)`` is returned. The ETag is weak, as ``responseDate``
+    differs between two otherwise equal responses.
+    """
+    verb = params.get("verb")
+    if verb not in ARGUMENTS or any(len(v) != 1 for k, v in params.lists()):
+        return None, None
+    if set(params.keys()) - {"verb"} - ARGUMENTS[verb]:
+        return None, None
+    if verb == "GetRecord" and set(params.keys()) != {"verb"} | ARGUMENTS[verb]:
+        return None, None
+
+    parts: List[object] = [
+        __version__,
+        REPOSITORY_NAME,
+        BASE_URL,
+        settings.ADMINS,
+        sorted(params.items()),
+    ]
+    last_modified = None
+    if verb == "Identify":
+        timestamp = earliest_header_timestamp()
+        # The current time is reported as earliest datestamp without any header.
+        parts.append(timestamp.isoformat() if timestamp else None)
+    elif verb == "GetRecord":
+        last_modified = (
+            Header.objects.filter(
+                identifier=params["identifier"],
+                metadata_formats__prefix=params["metadataPrefix"],
+            )
+            .values_list("timestamp", flat=True)
+            .first()
+        )
+        if last_modified is None:
+            return None, None
+    elif verb == "ListMetadataFormats" and "identifier" in params:
+        metadata_formats = sorted(
+            MetadataFormat.objects.filter(
+                identifiers__identifier=params["identifier"]
+            ).values_list("pk", "updated_at")
+        )
+        if not metadata_formats:
+            return None, None
+        # Adding or removing a format of a header changes no timestamp, so the
+        # formats are part of the ETag and there is no Last-Modified.
+        parts.append([pk for pk, updated_at in metadata_formats])
+        parts.append(max(updated_at for pk, updated_at in metadata_formats).isoformat())
+    elif verb == "ListMetadataFormats":
+        last_modified, count = _aggregate(MetadataFormat.objects.all())
+        if count == 0:
+            return None, None
+        parts.append(count)
+    elif verb == "ListSets":
+        last_modified, count = _aggregate(Set.objects.all())
+        # Larger lists carry a resumption token, which expires.
+        if count == 0 or count > NUM_PER_PAGE:
+            return None, None
+        parts.append(count)
+
+    if last_modified is not None:
+        parts.append(last_modified.isoformat())
+    etag = hashlib.md5(repr(parts).encode("utf8"), usedforsecurity=False)
+    return f"W/{quote_etag(etag.hexdigest())}", last_modified
+
+
+def _aggregate(qs) -> Tuple[Optional[datetime], int]:
+    values = qs.aggregate(last_modified=Max("updated_at"), count=Count("pk"))
+    return values["last_modified"], values["count"]
@@ -0,0 +1,140 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""OAI-PMH Django app header counts.
+
+Maintains HeaderCount, the number of headers per metadata format and per
+(metadata format, set), and estimates the size of filtered lists.
+"""
+
+import json
+
+from collections import Counter
+from django.db import connections, transaction
+from django.db.models import Count, F
+from typing import Iterable, Optional
+
+from .models import Header, HeaderCount
+
+
+def adjust(
+    header_pks: Iterable[int],
+    delta: int,
+    metadata_format_pks: Optional[Iterable[int]] = None,
+    set_pks: Optional[Iterable[int]] = None,
+):
+    """Adjust the counts for headers added to or removed from formats or sets.
+
+    Args:
+     * header_pks: headers that were added or removed
+     * delta: ``1`` if they were added, ``-1`` if they were removed
+     * metadata_format_pks: metadata formats the headers were added to or removed
+       from, the headers stay in their sets
+     * set_pks: sets the headers were added to or removed from, the headers stay in
+       their metadata formats
+    """
+    header_pks = list(header_pks)
+    counts: Counter = Counter()
+    if metadata_format_pks is not None:
+        in_sets = (
+            Header.sets.through.objects.filter(header_id__in=header_pks)
+            .values("set_id")
+            .annotate(n=Count("header_id"))
+        )
+        for metadata_format_pk in metadata_format_pks:
+            counts[(metadata_format_pk, None)] += len(header_pks)
+            for row in in_sets:
+                counts[(metadata_format_pk, row["set_id"])] += row["n"]
+    if set_pks is not None:
+        in_formats = (
+            Header.metadata_formats.through.objects.filter(header_id__in=header_pks)
+            .values("metadataformat_id")
+            .annotate(n=Count("header_id"))
+        )
+        for set_pk in set_pks:
+            for row in in_formats:
+                counts[(row["metadataformat_id"], set_pk)] += row["n"]
+
+    with transaction.atomic():
+        for (metadata_format_pk, set_pk), n in counts.items():
+            if n == 0:
+                continue
+            header_count, created = HeaderCount.objects.get_or_create(
+                metadata_format_id=metadata_format_pk,
+                set_id=set_pk,
+                defaults={"count": max(delta * n, 0)},
+            )
+            if not created:
+                HeaderCount.objects.filter(pk=header_count.pk).update(
+                    count=F("count") + delta * n
+                )
+
+
+def get(metadata_prefix: str, set_spec: Optional[str] = None) -> int:
+    """Get the number of headers in a metadata format and set."""
+    header_counts = HeaderCount.objects.filter(metadata_format__prefix=metadata_prefix)
+    if set_spec:
+        header_counts = header_counts.filter(set__spec=set_spec)
+    else:
+        header_counts = header_counts.filter(set__isnull=True)
+    count = header_counts.values_list("count", flat=True).first()
+    return count if count else 0
+
+
+def estimate(queryset) -> int:
+    """Estimate the number of objects in queryset from the PostgreSQL planner."""
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return queryset.count()
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def recount():
+    """Rebuild all counts from scratch.
+
+    Needed after headers or their relations were changed without signals, for
+    example with ``bulk_create``.
+    """
+    through = Header.metadata_formats.through
+    with transaction.atomic():
+        HeaderCount.objects.all().delete()
+        HeaderCount.objects.bulk_create(
+            [
+                HeaderCount(metadata_format_id=row["metadataformat_id"], count=row["n"])
+                for row in through.objects.values("metadataformat_id").annotate(
+                    n=Count("header_id")
+                )
+            ]
+        )
+        HeaderCount.objects.bulk_create(
+            [
+                HeaderCount(
+                    metadata_format_id=row["metadataformat_id"],
+                    set_id=row["header__sets"],
+                    count=row["n"],
+                )
+                for row in through.objects.filter(header__sets__isnull=False)
+                .values("metadataformat_id", "header__sets")
+                .annotate(n=Count("header_id"))
+            ]
+        )
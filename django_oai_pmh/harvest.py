@@ -0,0 +1,86 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""OAI-PMH Django app harvest table.
+
+Maintenance of HarvestHeader, one row per header and metadata format with the
+specs of the header's sets. Rows of a header are replaced as a whole whenever the
+header, its metadata formats or its sets change.
+"""
+
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db import transaction
+from django.db.models import OuterRef
+from typing import Iterable
+
+from .models import HarvestHeader, Header, Set
+
+
+def update(header_pks: Iterable[int]) -> int:
+    """Replace the harvest headers of headers.
+
+    Returns:
+     * number of written harvest headers
+    """
+    header_pks = list(header_pks)
+    headers = {
+        row[0]: row[1:]
+        for row in Header.objects.filter(pk__in=header_pks)
+        .annotate(
+            specs=ArraySubquery(
+                Set.objects.filter(headers=OuterRef("pk")).values("spec")
+            )
+        )
+        .values_list("pk", "identifier", "timestamp", "deleted", "specs")
+    }
+    formats = Header.metadata_formats.through.objects.filter(
+        header_id__in=headers.keys()
+    ).values_list("header_id", "metadataformat_id", "metadataformat__prefix")
+
+    with transaction.atomic():
+        HarvestHeader.objects.filter(header_id__in=header_pks).delete()
+        return len(
+            HarvestHeader.objects.bulk_create(
+                [
+                    HarvestHeader(
+                        header_id=header_pk,
+                        metadata_format_id=metadata_format_pk,
+                        metadata_prefix=metadata_prefix,
+                        identifier=headers[header_pk][0],
+                        timestamp=headers[header_pk][1],
+                        deleted=headers[header_pk][2],
+                        set_specs=headers[header_pk][3],
+                    )
+                    for header_pk, metadata_format_pk, metadata_prefix in formats
+                ],
+                batch_size=1000,
+            )
+        )
+
+
+def rebuild(batch_size: int = 10000) -> int:
+    """Rebuild the harvest headers of all headers.
+
+    Returns:
+     * number of written harvest headers
+    """
+    HarvestHeader.objects.all().delete()
+    pks = list(Header.objects.order_by("pk").values_list("pk", flat=True))
+    written = 0
+    for i in range(0, len(pks), batch_size):
+        j = i + batch_size
+        written += update(pks[i:j])
+    return written
@@ -0,0 +1,59 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""OAI-PMH Django app Identify."""
+
+from datetime import datetime
+from django.core.cache import cache
+from django.db.models import Min
+from django.utils import timezone
+from typing import Optional
+
+from .models import Header
+from .settings import EARLIEST_DATESTAMP_CACHE_TIMEOUT
+
+
+CACHE_KEY = "django_oai_pmh:earliest_datestamp"
+# Cached if there is no header.
+NO_HEADER = "none"
+
+
+def earliest_datestamp() -> datetime:
+    """Get the earliest header timestamp, the current time if there is no header."""
+    timestamp = earliest_header_timestamp()
+    return timezone.now() if timestamp is None else timestamp
+
+
+def earliest_header_timestamp() -> Optional[datetime]:
+    """Get the earliest header timestamp, None if there is no header.
+
+    The value is kept in the cache until a header is saved or deleted, also if
+    there is no header.
+    """
+    timestamp = cache.get(CACHE_KEY)
+    if timestamp is None:
+        timestamp = Header.objects.aggregate(timestamp=Min("timestamp"))["timestamp"]
+        cache.set(
+            CACHE_KEY,
+            NO_HEADER if timestamp is None else timestamp,
+            EARLIEST_DATESTAMP_CACHE_TIMEOUT,
+        )
+    return None if timestamp == NO_HEADER else timestamp
+
+
+def clear_earliest_datestamp():
+    """Remove the earliest header timestamp from the cache."""
+    cache.delete(CACHE_KEY)
@@ -0,0 +1,355 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""OAI-PMH Django app bulk ingestion.
+
+Imports Dublin Core records in batches with ``bulk_create`` and XML records with
+PostgreSQL ``COPY``. As this bypasses the signals, header counts, the earliest
+datestamp and cached records are updated by ``import_dc`` and ``load_xml``
+themselves.
+"""
+
+import os
+import tarfile
+
+from concurrent.futures import ProcessPoolExecutor
+from django.contrib.postgres.fields import ArrayField
+from django.db import connections, router, transaction
+from django.utils import timezone
+from lxml import etree
+from typing import (
+    Dict,
+    IO,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from . import changelog, counts, harvest, sets, snapshots
+from .identify import clear_earliest_datestamp
+from .models import DCRecord, Header, MetadataFormat, Set, XMLRecord
+from .records import update_cached_records
+from .settings import CHANGE_LOG, COMPLETE_LIST_SIZE, HARVEST_TABLE, RECORD_CACHE
+from .workers import worker_pool
+
+
+OAI_NS = "http://www.openarchives.org/OAI/2.0/"
+OAI_DC_NS = "http://www.openarchives.org/OAI/2.0/oai_dc/"
+DC_ELEMENTS = [
+    f.name for f in DCRecord._meta.concrete_fields if isinstance(f, ArrayField)
+]
+
+
+class DCDocument(NamedTuple):
+    """Dublin Core record to import."""
+
+    identifier: str
+    set_specs: List[str]
+    values: Dict[str, List[str]]
+
+
+def iter_dc(source: Union[str, IO[bytes]]) -> Iterator[DCDocument]:
+    """Read the ``oai_dc:dc`` elements of an XML file.
+
+    The file is parsed incrementally and every element is discarded once it has been
+    read, so memory stays flat no matter the size of the file. If a ``dc`` element is
+    part of an OAI-PMH ``record``, the identifier and set specs are taken from its
+    ``header``, otherwise the first ``dc:identifier`` is used as identifier.
+    Elements without identifier are skipped.
+    """
+    identifier = None
+    set_specs: List[str] = []
+    for event, element in etree.iterparse(
+        source, events=("end",), tag=(f"{{{OAI_NS}}}header", f"{{{OAI_DC_NS}}}dc")
+    ):
+        if element.tag == f"{{{OAI_NS}}}header":
+            identifier = element.findtext(f"{{{OAI_NS}}}identifier")
+            set_specs = [
+                e.text for e in element.iterfind(f"{{{OAI_NS}}}setSpec") if e.text
+            ]
+            continue
+
+        values = DCRecord.parse_xml(element)
+        if identifier is None and values.get("identifier"):
+            identifier = values["identifier"][0]
+        if identifier is not None:
+            yield DCDocument(identifier.strip(), set_specs, values)
+        identifier = None
+        set_specs = []
+
+        element.clear(keep_tail=True)
+        for node in [element, *element.iterancestors()]:
+            while node.getprevious() is not None:
+                del node.getparent()[0]
+
+
+def import_dc(documents: Iterable[DCDocument], batch_size: int = 1000) -> int:
+    """Create or update headers and their Dublin Core records in batches.
+
+    Headers are added to the ``oai_dc`` metadata format and the sets of their set
+    specs, missing sets are created. Dublin Core elements not in a document are
+    cleared on existing records.
+
+    Returns:
+     * number of imported records
+    """
+    oai_dc = MetadataFormat.objects.get(prefix="oai_dc")
+    set_pks: Dict[str, int] = {}
+
+    imported = 0
+    batch: Dict[str, DCDocument] = {}
+    for document in documents:
+        batch[document.identifier] = document
+        if len(batch) >= batch_size:
+            imported += _import_batch(list(batch.values()), oai_dc, set_pks)
+            batch = {}
+    if batch:
+        imported += _import_batch(list(batch.values()), oai_dc, set_pks)
+
+    if COMPLETE_LIST_SIZE == "materialized":
+        counts.recount()
+    clear_earliest_datestamp()
+    snapshots.invalidate()
+    return imported
+
+
+def _import_batch(
+    documents: List[DCDocument], oai_dc: MetadataFormat, set_pks: Dict[str, int]
+) -> int:
+    missing = {spec for d in documents for spec in d.set_specs} - set_pks.keys()
+    if missing:
+        Set.objects.bulk_create(
+            [Set(spec=spec, name=spec) for spec in missing], ignore_conflicts=True
+        )
+        set_pks.update(
+            Set.objects.filter(spec__in=missing).values_list("spec", "pk").iterator()
+        )
+        sets.add(Set.objects.filter(spec__in=missing, ancestors__isnull=True))
+
+    with transaction.atomic():
+        Header.objects.bulk_create(
+            [Header(identifier=d.identifier) for d in documents],
+            update_conflicts=True,
+            unique_fields=["identifier"],
+            update_fields=["timestamp", "updated_at"],
+        )
+        # Django < 5.0 doesn't set the pks of conflicting rows.
+        header_pks = dict(
+            Header.objects.filter(
+                identifier__in=[d.identifier for d in documents]
+            ).values_list("identifier", "pk")
+        )
+        headers = [Header(pk=header_pks[d.identifier]) for d in documents]
+        DCRecord.objects.bulk_create(
+            [
+                DCRecord(
+                    header=header,
+                    **{k: document.values.get(k) for k in DC_ELEMENTS},
+                )
+                for header, document in zip(headers, documents)
+            ],
+            update_conflicts=True,
+            unique_fields=["header"],
+            update_fields=DC_ELEMENTS + ["updated_at"],
+        )
+        Header.metadata_formats.through.objects.bulk_create(
+            [
+                Header.metadata_formats.through(
+                    header_id=header.pk, metadataformat_id=oai_dc.pk
+                )
+                for header in headers
+            ],
+            ignore_conflicts=True,
+        )
+        Header.sets.through.objects.bulk_create(
+            [
+                Header.sets.through(header_id=header.pk, set_id=set_pks[spec])
+                for header, document in zip(headers, documents)
+                for spec in document.set_specs
+            ],
+            ignore_conflicts=True,
+        )
+        if RECORD_CACHE:
+            update_cached_records(header.pk for header in headers)
+        if CHANGE_LOG:
+            changelog.log(header.pk for header in headers)
+        if HARVEST_TABLE:
+            harvest.update(header.pk for header in headers)
+    return len(headers)
+
+
+def iter_xml_files(source: str) -> Iterator[Tuple[str, bytes]]:
+    """Read the files of a directory or a (compressed) tar archive.
+
+    Yields the path of every file relative to source resp. its name in the archive
+    and its content.
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                with open(path, "rb") as f:
+                    yield os.path.relpath(path, source), f.read()
+    else:
+        with tarfile.open(source) as tar:
+            for member in tar:
+                data = tar.extractfile(member) if member.isfile() else None
+                if data is not None:
+                    yield member.name, data.read()
+
+
+def normalize_xml(data: bytes) -> str:
+    """Decode an XML file and remove its XML declaration."""
+    return XMLRecord.normalize(data.decode("utf-8-sig"))
+
+
+def load_xml(
+    files: Iterable[Tuple[str, bytes]],
+    identifiers: Dict[str, str],
+    metadata_prefix: str,
+    batch_size: int = 1000,
+    processes: Optional[int] = None,
+) -> int:
+    """Load XML files as XMLRecords.
+
+    Files are normalized in a process pool and written with ``COPY``, existing
+    records of a header in the metadata format are replaced. Missing headers are
+    created and added to the metadata format.
+
+    Args:
+     * files: name and content of the files, see ``iter_xml_files``
+     * identifiers: header identifier of each file name, files not in here are
+       skipped
+     * metadata_prefix: prefix of the metadata format of the records
+     * batch_size: number of files normalized and written per batch
+     * processes: number of worker processes, with ``1`` files are normalized in
+       this process
+
+    Returns:
+     * number of loaded records
+    """
+    metadata_format = MetadataFormat.objects.get(prefix=metadata_prefix)
+    executor = None
+    if processes != 1:
+        executor = worker_pool(processes)
+
+    loaded = 0
+    try:
+        batch: List[Tuple[str, bytes]] = []
+        for name, data in files:
+            if name not in identifiers:
+                continue
+            batch.append((identifiers[name], data))
+            if len(batch) >= batch_size:
+                loaded += _load_batch(batch, metadata_format, executor)
+                batch = []
+        if batch:
+            loaded += _load_batch(batch, metadata_format, executor)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if COMPLETE_LIST_SIZE == "materialized":
+        counts.recount()
+    clear_earliest_datestamp()
+    snapshots.invalidate()
+    return loaded
+
+
+def _load_batch(
+    batch: List[Tuple[str, bytes]],
+    metadata_format: MetadataFormat,
+    executor: Optional[ProcessPoolExecutor],
+) -> int:
+    data = [d for identifier, d in batch]
+    if executor is None:
+        xml = list(map(normalize_xml, data))
+    else:
+        xml = list(executor.map(normalize_xml, data, chunksize=64))
+    records = dict(zip((identifier for identifier, d in batch), xml))
+
+    Header.objects.bulk_create(
+        [Header(identifier=identifier) for identifier in records.keys()],
+        update_conflicts=True,
+        unique_fields=["identifier"],
+        update_fields=["timestamp", "updated_at"],
+    )
+    header_pks = dict(
+        Header.objects.filter(identifier__in=records.keys()).values_list(
+            "identifier", "pk"
+        )
+    )
+
+    now = timezone.now()
+    with transaction.atomic():
+        # The signal receivers of a delete are done for the whole batch below.
+        old = XMLRecord.objects.filter(
+            header_id__in=header_pks.values(), metadata_prefix=metadata_format
+        )
+        old._raw_delete(old.db)
+        _copy_xml_records(
+            [
+                (now, now, header_pks[identifier], metadata_format.pk, xml_metadata)
+                for identifier, xml_metadata in records.items()
+            ]
+        )
+        Header.metadata_formats.through.objects.bulk_create(
+            [
+                Header.metadata_formats.through(
+                    header_id=pk, metadataformat_id=metadata_format.pk
+                )
+                for pk in header_pks.values()
+            ],
+            ignore_conflicts=True,
+        )
+        if RECORD_CACHE:
+            update_cached_records(header_pks.values())
+        if CHANGE_LOG:
+            changelog.log(header_pks.values())
+        if HARVEST_TABLE:
+            harvest.update(header_pks.values())
+    return len(records)
+
+
+def _copy_xml_records(rows: List[Tuple]):
+    fields = [
+        XMLRecord._meta.get_field(name)
+        for name in [
+            "created_at",
+            "updated_at",
+            "header",
+            "metadata_prefix",
+            "xml_metadata",
+        ]
+    ]
+    connection = connections[router.db_for_write(XMLRecord)]
+    if connection.vendor != "postgresql":
+        XMLRecord.objects.bulk_create(
+            [XMLRecord(**{f.attname: v for f, v in zip(fields, row)}) for row in rows]
+        )
+        return
+
+    columns = ", ".join(connection.ops.quote_name(f.column) for f in fields)
+    table = connection.ops.quote_name(XMLRecord._meta.db_table)
+    with connection.cursor() as cursor:
+        with cursor.copy(f"COPY {table} ({columns}) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row(row)
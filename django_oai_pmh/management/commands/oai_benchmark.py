@@ -0,0 +1,136 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""OAI-PMH Django app oai_benchmark command."""
+
+import django
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from ... import __version__, benchmark, settings
+from ...identify import clear_earliest_datestamp
+from ...models import Header
+
+
+class Command(BaseCommand):
+    """Benchmark every OAI-PMH verb on a synthetic corpus."""
+
+    help = (
+        "Seed a synthetic corpus into a throwaway test database and measure "
+        + "latency, queries and response size of every verb and the throughput of "
+        + "the serializers, reported as JSON."
+    )
+
+    def add_arguments(self, parser):
+        """Add arguments."""
+        parser.add_argument(
+            "--headers",
+            type=int,
+            default=10000,
+            help="Number of headers, default: %(default)s.",
+        )
+        parser.add_argument(
+            "--sets",
+            type=int,
+            default=100,
+            help="Number of sets, default: %(default)s.",
+        )
+        parser.add_argument(
+            "--metadata-formats",
+            type=int,
+            default=3,
+            help="Number of metadata formats including oai_dc, default: %(default)s.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="Number of requests per request shape, default: %(default)s.",
+        )
+        parser.add_argument(
+            "--depth",
+            type=int,
+            default=None,
+            help="Cursor of the deep pages, default: the middle of the list.",
+        )
+        parser.add_argument(
+            "--output", default=None, help="Write the JSON to this file."
+        )
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Keep the test database and reuse its corpus if it has the same "
+            + "number of headers.",
+        )
+
+    def handle(self, *args, **options):
+        """Handle."""
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options["keepdb"]
+        )
+        # The cache isn't part of the test database.
+        clear_earliest_datestamp()
+        try:
+            existing = Header.objects.count()
+            if existing == 0:
+                benchmark.seed(
+                    options["headers"], options["sets"], options["metadata_formats"]
+                )
+            elif existing != options["headers"]:
+                raise CommandError(
+                    f"The kept test database has {existing} headers, run without "
+                    + "--keepdb to seed a new corpus."
+                )
+            results = benchmark.run(options["repeat"], options["depth"])
+            serializers = benchmark.run_serializers(options["repeat"])
+        finally:
+            clear_earliest_datestamp()
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options["keepdb"]
+            )
+
+        report = json.dumps(
+            {
+                "version": __version__,
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "corpus": {
+                    "headers": options["headers"],
+                    "sets": options["sets"],
+                    "metadata_formats": options["metadata_formats"],
+                },
+                "settings": {
+                    "NUM_PER_PAGE": settings.NUM_PER_PAGE,
+                    "PAGINATION": settings.PAGINATION,
+                    "RESUMPTION_TOKEN_BACKEND": settings.RESUMPTION_TOKEN_BACKEND,
+                    "STREAMING": settings.STREAMING,
+                    "RECORD_CACHE": settings.RECORD_CACHE,
+                    "COMPLETE_LIST_SIZE": settings.COMPLETE_LIST_SIZE,
+                    "SERIALIZER": settings.SERIALIZER,
+                },
+                "results": results,
+                "serializers": serializers,
+            },
+            indent=2,
+        )
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(report + "\n")
+        else:
+            self.stdout.write(report)
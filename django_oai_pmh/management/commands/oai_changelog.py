@@ -0,0 +1,53 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""OAI-PMH Django app oai_changelog command."""
+
+from django.core.management.base import BaseCommand
+from time import monotonic
+
+from ... import changelog
+
+
+class Command(BaseCommand):
+    """Prune or rebuild the change log."""
+
+    help = (
+        "Delete the changes superseded by a later change of the same header, or "
+        + "with --rebuild replace the change log with one change per header."
+    )
+
+    def add_arguments(self, parser):
+        """Add arguments."""
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Replace the change log with one change per header, needed once "
+            + "after enabling CHANGE_LOG.",
+        )
+
+    def handle(self, *args, **options):
+        """Handle."""
+        start = monotonic()
+        if options["rebuild"]:
+            count = changelog.rebuild()
+            action = "Logged"
+        else:
+            count = changelog.prune()
+            action = "Deleted"
+        elapsed = monotonic() - start
+
+        self.stdout.write(f"{action} {count} changes in {elapsed:.2f}s.")
@@ -0,0 +1,56 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""OAI-PMH Django app oai_import_dc command."""
+
+from django.core.management.base import BaseCommand
+from itertools import chain
+from time import monotonic
+
+from ...ingest import import_dc, iter_dc
+
+
+class Command(BaseCommand):
+    """Import Dublin Core records from XML files."""
+
+    help = (
+        "Import the oai_dc:dc records of XML files, e.g. ListRecords responses, in "
+        + "batches."
+    )
+
+    def add_arguments(self, parser):
+        """Add arguments."""
+        parser.add_argument("files", nargs="+", help="XML files to import.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of records written per batch, default: %(default)s.",
+        )
+
+    def handle(self, *args, **options):
+        """Handle."""
+        start = monotonic()
+        imported = import_dc(
+            chain.from_iterable(iter_dc(path) for path in options["files"]),
+            options["batch_size"],
+        )
+        elapsed = monotonic() - start
+
+        self.stdout.write(
+            f"Imported {imported} records in {elapsed:.2f}s "
+            + f"({imported / elapsed if elapsed > 0 else 0:.0f} records/s)."
+        )
@@ -0,0 +1,80 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""OAI-PMH Django app oai_load_xml command."""
+
+import csv
+
+from django.core.management.base import BaseCommand
+from time import monotonic
+
+from ...ingest import iter_xml_files, load_xml
+
+
+class Command(BaseCommand):
+    """Load XML records from a directory or tar archive."""
+
+    help = (
+        "Load the XML files of a directory or tar archive as XML records of a "
+        + "metadata format using PostgreSQL COPY."
+    )
+
+    def add_arguments(self, parser):
+        """Add arguments."""
+        parser.add_argument("source", help="Directory or tar archive of XML files.")
+        parser.add_argument(
+            "mapping",
+            help="CSV file with the file path resp. archive member name in the first "
+            + "and the header identifier in the second column.",
+        )
+        parser.add_argument(
+            "--metadata-prefix",
+            required=True,
+            help="Metadata prefix of the records.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of files written per batch, default: %(default)s.",
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=None,
+            help="Number of worker processes, default: number of CPUs. With 1 the "
+            + "files are normalized in this process.",
+        )
+
+    def handle(self, *args, **options):
+        """Handle."""
+        with open(options["mapping"], newline="") as f:
+            identifiers = {row[0]: row[1] for row in csv.reader(f) if len(row) >= 2}
+
+        start = monotonic()
+        loaded = load_xml(
+            iter_xml_files(options["source"]),
+            identifiers,
+            options["metadata_prefix"],
+            batch_size=options["batch_size"],
+            processes=options["processes"],
+        )
+        elapsed = monotonic() - start
+
+        self.stdout.write(
+            f"Loaded {loaded} records in {elapsed:.2f}s "
+            + f"({loaded / elapsed if elapsed > 0 else 0:.0f} records/s)."
+        )
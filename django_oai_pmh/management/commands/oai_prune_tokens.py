@@ -0,0 +1,68 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""OAI-PMH Django app oai_prune_tokens command."""
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from time import monotonic, sleep
+
+from ...models import ResumptionToken
+
+
+class Command(BaseCommand):
+    """Delete expired resumption tokens in batches."""
+
+    help = "Delete expired resumption tokens in batches."
+
+    def add_arguments(self, parser):
+        """Add arguments."""
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of tokens deleted per batch, default: %(default)s.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.0,
+            help="Seconds to sleep between batches, default: %(default)s.",
+        )
+
+    def handle(self, *args, **options):
+        """Handle."""
+        now = timezone.now()
+        deleted = 0
+        start = monotonic()
+        while True:
+            pks = list(
+                ResumptionToken.objects.filter(expiration_date__lte=now)
+                .order_by("expiration_date")
+                .values_list("pk", flat=True)[: options["batch_size"]]
+            )
+            if not pks:
+                break
+            count, _ = ResumptionToken.objects.filter(pk__in=pks).delete()
+            deleted += count
+            if options["sleep"] > 0:
+                sleep(options["sleep"])
+        elapsed = monotonic() - start
+
+        self.stdout.write(
+            f"Deleted {deleted} expired resumption tokens in {elapsed:.2f}s "
+            + f"({deleted / elapsed if elapsed > 0 else 0:.0f} rows/s)."
+        )
@@ -0,0 +1,48 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""OAI-PMH Django app oai_rebuild_harvest command."""
+
+from django.core.management.base import BaseCommand
+from time import monotonic
+
+from ... import harvest
+
+
+class Command(BaseCommand):
+    """Rebuild the harvest table."""
+
+    help = (
+        "Rebuild the denormalised harvest headers of all headers, needed once after "
+        + "enabling HARVEST_TABLE."
+    )
+
+    def add_arguments(self, parser):
+        """Add arguments."""
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="Number of headers written per batch, default: %(default)s.",
+        )
+
+    def handle(self, *args, **options):
+        """Handle."""
+        start = monotonic()
+        written = harvest.rebuild(options["batch_size"])
+        elapsed = monotonic() - start
+
+        self.stdout.write(f"Wrote {written} harvest headers in {elapsed:.2f}s.")
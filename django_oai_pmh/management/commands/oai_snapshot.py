@@ -0,0 +1,81 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""OAI-PMH Django app oai_snapshot command."""
+
+from django.core.management.base import BaseCommand
+from time import monotonic
+
+from ... import snapshots
+
+
+class Command(BaseCommand):
+    """Render a snapshot of all ListRecords pages."""
+
+    help = (
+        "Render all ListRecords pages of every metadata format, and of every "
+        + "metadata format and set, to gzip-compressed files in SNAPSHOT_DIR using a "
+        + "process pool."
+    )
+
+    def add_arguments(self, parser):
+        """Add arguments."""
+        parser.add_argument(
+            "--metadata-prefix",
+            action="append",
+            dest="metadata_prefixes",
+            help="Metadata format to snapshot, can be given multiple times, default: "
+            + "all.",
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=None,
+            help="Number of worker processes, default: number of CPUs. With 1 the "
+            + "pages are rendered in this process.",
+        )
+        parser.add_argument(
+            "--pages-per-task",
+            type=int,
+            default=100,
+            help="Number of consecutive pages a worker renders at once, default: "
+            + "%(default)s.",
+        )
+        parser.add_argument(
+            "--keep",
+            type=int,
+            default=2,
+            help="Number of snapshots to keep, older ones are deleted, default: "
+            + "%(default)s.",
+        )
+
+    def handle(self, *args, **options):
+        """Handle."""
+        start = monotonic()
+        snapshot = snapshots.create(
+            options["metadata_prefixes"],
+            processes=options["processes"],
+            pages_per_task=options["pages_per_task"],
+            keep=options["keep"],
+        )
+        elapsed = monotonic() - start
+
+        index = snapshots.load_index(snapshot.pk)
+        pages = sum(info["pages"] for info in index["lists"])
+        self.stdout.write(
+            f"Rendered snapshot {snapshot.pk} with {pages} pages of "
+            + f"{len(index['lists'])} lists in {elapsed:.2f}s."
+        )
@@ -0,0 +1,73 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""OAI-PMH Django app oai_warm_records command."""
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from time import monotonic
+
+from ...models import Header
+from ...records import update_cached_records
+from ...workers import worker_pool
+
+
+class Command(BaseCommand):
+    """Render the cached records of all headers."""
+
+    help = "Render the cached records of all headers using a process pool."
+
+    def add_arguments(self, parser):
+        """Add arguments."""
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of headers rendered per batch, default: %(default)s.",
+        )
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=None,
+            help="Number of worker processes, default: number of CPUs. With 1 the "
+            + "records are rendered in this process.",
+        )
+
+    def handle(self, *args, **options):
+        """Handle."""
+        pks = list(Header.objects.order_by("pk").values_list("pk", flat=True))
+        batches = []
+        for i in range(0, len(pks), options["batch_size"]):
+            j = i + options["batch_size"]
+            batches.append(pks[i:j])
+
+        rendered = 0
+        start = monotonic()
+        if options["processes"] == 1:
+            for batch in batches:
+                rendered += update_cached_records(batch)
+        else:
+            # Workers must not share the connections of this process.
+            connections.close_all()
+            with worker_pool(options["processes"]) as executor:
+                for count in executor.map(update_cached_records, batches):
+                    rendered += count
+        elapsed = monotonic() - start
+
+        self.stdout.write(
+            f"Rendered {rendered} records of {len(pks)} headers in {elapsed:.2f}s "
+            + f"({rendered / elapsed if elapsed > 0 else 0:.0f} records/s)."
+        )
@@ -0,0 +1,333 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""OAI-PMH Django app metrics.
+
+Counters and histograms of the harvest traffic, exposed in the Prometheus text
+format. Enabled by the METRICS setting. Every process keeps its own metrics; with
+METRICS_DIR set, each process writes them to a file in that directory at most every
+FLUSH_INTERVAL seconds and when it exits, and the exposition sums the files of all
+processes. The files of processes that no longer run are merged into the process
+serving the exposition and deleted, so METRICS_DIR must not be shared between
+hosts.
+"""
+
+import atexit
+import json
+import os
+import re
+import tempfile
+import threading
+
+from asgiref.sync import iscoroutinefunction
+from collections import defaultdict
+from contextvars import ContextVar
+from functools import wraps
+from time import monotonic, perf_counter, time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .settings import METRICS, METRICS_DIR
+
+
+VERBS = {
+    "GetRecord",
+    "Identify",
+    "ListIdentifiers",
+    "ListMetadataFormats",
+    "ListRecords",
+    "ListSets",
+}
+FILE_RE = re.compile(r"^metrics-(?P<pid>\d+)-\d+\.json$")
+FLUSH_INTERVAL = 5
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_HELP = {
+    "oai_pmh_request_duration_seconds": (
+        "histogram",
+        "Latency of OAI-PMH requests by verb.",
+    ),
+    "oai_pmh_records_total": (
+        "counter",
+        "Headers resp. records served by verb.",
+    ),
+    "oai_pmh_response_bytes_total": ("counter", "Bytes written by verb."),
+    "oai_pmh_resumption_tokens_total": (
+        "counter",
+        "Resumption tokens issued, expired and invalid.",
+    ),
+    "oai_pmh_errors_total": ("counter", "OAI-PMH errors by error code."),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Collector:
+    """Metrics of this process."""
+
+    def __init__(self) -> None:
+        """Init."""
+        self.lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Labels], float] = defaultdict(float)
+        self.histograms: Dict[Tuple[str, Labels], List[float]] = {}
+        self.path: Optional[str] = None
+        self.flushed = float("-inf")
+        self.timer: Optional[threading.Timer] = None
+
+    def inc(self, name: str, value: float = 1, **labels: str):
+        """Increase a counter."""
+        with self.lock:
+            self.counters[(name, tuple(sorted(labels.items())))] += value
+
+    def observe(self, name: str, value: float, **labels: str):
+        """Add a value to a histogram."""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            # Counts per bucket, the +Inf bucket, then the sum.
+            histogram = self.histograms.setdefault(key, [0.0] * (len(BUCKETS) + 2))
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    histogram[i] += 1
+            histogram[-2] += 1
+            histogram[-1] += value
+
+    def merge(self, dump: Dict[str, List]):
+        """Add the metrics of a dump."""
+        with self.lock:
+            for name, labels, value in dump["counters"]:
+                self.counters[(name, tuple(tuple(label) for label in labels))] += value
+            for name, labels, values in dump["histograms"]:
+                key = (name, tuple(tuple(label) for label in labels))
+                histogram = self.histograms.setdefault(key, [0.0] * len(values))
+                for i, value in enumerate(values):
+                    histogram[i] += value
+
+    def dump(self) -> Dict[str, List]:
+        """Get the metrics as JSON serializable dict."""
+        with self.lock:
+            return {
+                "counters": [[k[0], k[1], v] for k, v in self.counters.items()],
+                "histograms": [[k[0], k[1], v] for k, v in self.histograms.items()],
+            }
+
+    def flush(self, force: bool = False):
+        """Write the metrics of this process to METRICS_DIR.
+
+        Unless forced, they are written at most every FLUSH_INTERVAL seconds, a
+        timer writes later changes.
+        """
+        if not METRICS_DIR:
+            return
+        with self.lock:
+            wait = self.flushed + FLUSH_INTERVAL - monotonic()
+            if not force and wait > 0:
+                if self.timer is None:
+                    self.timer = threading.Timer(wait, self.flush, [True])
+                    self.timer.daemon = True
+                    self.timer.start()
+                return
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            self.flushed = monotonic()
+        if self.path is None:
+            os.makedirs(METRICS_DIR, exist_ok=True)
+            self.path = os.path.join(
+                METRICS_DIR, f"metrics-{os.getpid()}-{int(time() * 1000)}.json"
+            )
+            atexit.register(self.flush, True)
+        fd, tmp = tempfile.mkstemp(dir=METRICS_DIR, prefix=".metrics-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.dump(), f)
+        os.replace(tmp, self.path)
+
+
+collector = Collector()
+_request: ContextVar[Optional[Dict[str, Any]]] = ContextVar("_request", default=None)
+
+
+def instrument(view):
+    """Collect the metrics of requests of view, if METRICS is enabled."""
+    if iscoroutinefunction(view):
+
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if not METRICS:
+                return await view(request, *args, **kwargs)
+
+            sample = {"verb": None, "records": 0, "errors": []}
+            token = _request.set(sample)
+            start = perf_counter()
+            try:
+                response = await view(request, *args, **kwargs)
+            finally:
+                _request.reset(token)
+            return _finish(response, sample, start)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not METRICS:
+            return view(request, *args, **kwargs)
+
+        sample = {"verb": None, "records": 0, "errors": []}
+        token = _request.set(sample)
+        start = perf_counter()
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            _request.reset(token)
+        return _finish(response, sample, start)
+
+    return wrapper
+
+
+def _finish(response, sample: Dict[str, Any], start: float):
+    """Observe the request of response, streaming responses once they are sent."""
+    if response.streaming:
+        response.streaming_content = _stream(response.streaming_content, sample, start)
+    else:
+        _observe(sample, len(response.content), perf_counter() - start)
+    return response
+
+
+def set_request(verb: Optional[str], records: int, errors: Iterable[Dict[str, str]]):
+    """Set verb, number of records and errors of the current request."""
+    sample = _request.get()
+    if sample is not None:
+        sample["verb"] = verb
+        sample["records"] = records
+        sample["errors"] = [error["code"] for error in errors]
+
+
+def get_request() -> Optional[Dict[str, Any]]:
+    """Get verb, number of records and error codes of the current request."""
+    sample = _request.get()
+    return dict(sample) if sample is not None else None
+
+
+def update_request(sample: Optional[Dict[str, Any]]):
+    """Set verb, number of records and error codes of the current request."""
+    current = _request.get()
+    if current is not None and sample is not None:
+        current.update(sample)
+
+
+def resumption_token(event: str):
+    """Count a resumption token event, one of issued, expired or invalid."""
+    if METRICS:
+        collector.inc("oai_pmh_resumption_tokens_total", event=event)
+
+
+def exposition() -> str:
+    """Get the metrics of all processes in the Prometheus text format."""
+    total = Collector()
+    if METRICS_DIR:
+        _merge_dead()
+        collector.flush(True)
+        for name in os.listdir(METRICS_DIR):
+            if FILE_RE.match(name):
+                try:
+                    with open(os.path.join(METRICS_DIR, name)) as f:
+                        total.merge(json.load(f))
+                except (OSError, ValueError):
+                    continue
+    else:
+        total.merge(collector.dump())
+    counters, histograms = total.counters, total.histograms
+
+    lines = []
+    for metric, (kind, help_text) in METRICS_HELP.items():
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for (name, labels), value in sorted(counters.items()):
+            if name == metric:
+                lines.append(f"{name}{_labels(labels)} {_value(value)}")
+        for (name, labels), values in sorted(histograms.items()):
+            if name != metric:
+                continue
+            for bound, count in zip([*map(str, BUCKETS), "+Inf"], values):
+                bucket_labels = labels + (("le", bound),)
+                lines.append(f"{name}_bucket{_labels(bucket_labels)} {_value(count)}")
+            lines.append(f"{name}_sum{_labels(labels)} {_value(values[-1])}")
+            lines.append(f"{name}_count{_labels(labels)} {_value(values[-2])}")
+    return "\n".join(lines) + "\n"
+
+
+def _merge_dead():
+    """Merge the metrics files of processes that no longer run into this process.
+
+    A file is renamed before it is read, so that only one process merges it.
+    """
+    for name in os.listdir(str(METRICS_DIR)):
+        match = FILE_RE.match(name)
+        if match is None or _alive(int(match.group("pid"))):
+            continue
+        claimed = os.path.join(str(METRICS_DIR), f".{name}")
+        try:
+            os.rename(os.path.join(str(METRICS_DIR), name), claimed)
+        except OSError:
+            continue
+        try:
+            with open(claimed) as f:
+                collector.merge(json.load(f))
+            collector.flush(True)
+        except (OSError, ValueError):
+            pass
+        os.remove(claimed)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _stream(content, sample: Dict[str, Any], start: float):
+    size = 0
+    for chunk in content:
+        size += len(chunk)
+        yield chunk
+    _observe(sample, size, perf_counter() - start)
+
+
+def _observe(sample: Dict[str, Any], size: int, duration: float):
+    # Illegal verbs are not used as label, anyone could add label values otherwise.
+    verb = sample["verb"] if sample["verb"] in VERBS else ""
+    collector.observe("oai_pmh_request_duration_seconds", duration, verb=verb)
+    collector.inc("oai_pmh_response_bytes_total", size, verb=verb)
+    if sample["records"]:
+        collector.inc("oai_pmh_records_total", sample["records"], verb=verb)
+    for code in sample["errors"]:
+        collector.inc("oai_pmh_errors_total", code=code)
+    collector.flush()
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (k, v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for k, v in labels
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _value(value: float) -> str:
+    return str(int(value)) if value == int(value) else repr(value)
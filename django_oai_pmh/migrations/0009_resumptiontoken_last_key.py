@@ -0,0 +1,44 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+# Generated by Django 5.2.18 on 2026-10-17 17:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "django_oai_pmh",
+            "0008_alter_dcrecord_contributor_alter_dcrecord_coverage_and_more",
+        ),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="resumptiontoken",
+            name="last_id",
+            field=models.BigIntegerField(blank=True, null=True, verbose_name="Last ID"),
+        ),
+        migrations.AddField(
+            model_name="resumptiontoken",
+            name="last_identifier",
+            field=models.TextField(
+                blank=True, null=True, verbose_name="Last identifier"
+            ),
+        ),
+    ]
@@ -0,0 +1,110 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+# Generated by Django 5.2.18 on 2026-10-17 17:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_headers(apps, schema_editor):
+    Header = apps.get_model("django_oai_pmh", "Header")
+    HeaderCount = apps.get_model("django_oai_pmh", "HeaderCount")
+    through = Header.metadata_formats.through
+
+    HeaderCount.objects.bulk_create(
+        [
+            HeaderCount(metadata_format_id=row["metadataformat_id"], count=row["n"])
+            for row in through.objects.values("metadataformat_id").annotate(
+                n=Count("header_id")
+            )
+        ]
+    )
+    HeaderCount.objects.bulk_create(
+        [
+            HeaderCount(
+                metadata_format_id=row["metadataformat_id"],
+                set_id=row["header__sets"],
+                count=row["n"],
+            )
+            for row in through.objects.filter(header__sets__isnull=False)
+            .values("metadataformat_id", "header__sets")
+            .annotate(n=Count("header_id"))
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("django_oai_pmh", "0011_cachedrecord"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HeaderCount",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("count", models.BigIntegerField(default=0, verbose_name="Count")),
+                (
+                    "metadata_format",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="header_counts",
+                        to="django_oai_pmh.metadataformat",
+                        verbose_name="Metadata format",
+                    ),
+                ),
+                (
+                    "set",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="header_counts",
+                        to="django_oai_pmh.set",
+                        verbose_name="Set",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Header count",
+                "verbose_name_plural": "Header counts",
+                "ordering": ("metadata_format", "set"),
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("metadata_format", "set"),
+                        name="django_oai_pmh_headercount_unique",
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(("set__isnull", True)),
+                        fields=("metadata_format",),
+                        name="django_oai_pmh_headercount_unique_without_set",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(count_headers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+# Generated by Django 5.2.18 on 2026-10-17 17:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("django_oai_pmh", "0012_headercount"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="header",
+            index=models.Index(
+                fields=["timestamp", "identifier"], name="django_oai_pmh_header_ts_idx"
+            ),
+        ),
+        # Header.metadata_formats and Header.sets use auto-created through tables,
+        # so their indexes can't be declared on a model. The unique indexes Django
+        # creates on them start with header_id, these start with the format resp.
+        # the set a harvest filters by.
+        migrations.RunSQL(
+            "CREATE INDEX django_oai_pmh_header_metadata_formats_rev_idx ON "
+            + "django_oai_pmh_header_metadata_formats (metadataformat_id, header_id);",
+            "DROP INDEX django_oai_pmh_header_metadata_formats_rev_idx;",
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX django_oai_pmh_header_sets_rev_idx ON "
+            + "django_oai_pmh_header_sets (set_id, header_id);",
+            "DROP INDEX django_oai_pmh_header_sets_rev_idx;",
+        ),
+    ]
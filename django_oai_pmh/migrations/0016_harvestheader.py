@@ -0,0 +1,97 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+# Generated by Django 5.2.18 on 2026-10-17 18:58
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("django_oai_pmh", "0015_change"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HarvestHeader",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("metadata_prefix", models.TextField(verbose_name="Metadata prefix")),
+                ("identifier", models.TextField(verbose_name="Identifier")),
+                ("timestamp", models.DateTimeField(verbose_name="Timestamp")),
+                ("deleted", models.BooleanField(default=False, verbose_name="Deleted")),
+                (
+                    "set_specs",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.TextField(),
+                        default=list,
+                        size=None,
+                        verbose_name="Set specs",
+                    ),
+                ),
+                (
+                    "header",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="harvest_headers",
+                        to="django_oai_pmh.header",
+                        verbose_name="Header",
+                    ),
+                ),
+                (
+                    "metadata_format",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="harvest_headers",
+                        to="django_oai_pmh.metadataformat",
+                        verbose_name="Metadata format",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Harvest header",
+                "verbose_name_plural": "Harvest headers",
+                "ordering": ("identifier",),
+                "indexes": [
+                    models.Index(
+                        fields=["metadata_prefix", "timestamp", "identifier"],
+                        name="django_oai_pmh_harvest_ts_idx",
+                    ),
+                    django.contrib.postgres.indexes.GinIndex(
+                        fields=["set_specs"], name="django_oai_pmh_harvest_set_idx"
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("metadata_prefix", "identifier"),
+                        name="django_oai_pmh_harvestheader_unique",
+                    )
+                ],
+            },
+        ),
+    ]
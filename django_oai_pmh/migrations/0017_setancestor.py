@@ -0,0 +1,79 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+# Generated by Django 5.2.18 on 2026-10-17 19:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def add_ancestors(apps, schema_editor):
+    Set = apps.get_model("django_oai_pmh", "Set")
+    SetAncestor = apps.get_model("django_oai_pmh", "SetAncestor")
+
+    ancestors = []
+    for pk, spec in Set.objects.values_list("pk", "spec").iterator():
+        ancestor = None
+        for depth, part in enumerate(spec.split(":")):
+            ancestor = f"{ancestor}:{part}" if ancestor else part
+            ancestors.append(SetAncestor(set_id=pk, spec=ancestor, depth=depth))
+    SetAncestor.objects.bulk_create(ancestors, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("django_oai_pmh", "0016_harvestheader"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SetAncestor",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("spec", models.TextField(verbose_name="Spec")),
+                ("depth", models.PositiveSmallIntegerField(verbose_name="Depth")),
+                (
+                    "set",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ancestors",
+                        to="django_oai_pmh.set",
+                        verbose_name="Set",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Set ancestor",
+                "verbose_name_plural": "Set ancestors",
+                "ordering": ("set", "depth"),
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("spec", "set"), name="django_oai_pmh_setancestor_unique"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(add_ancestors, migrations.RunPython.noop),
+    ]
@@ -19,6 +19,7 @@
 import re
 
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from lxml import etree
@@ -69,6 +70,38 @@ class Set(models.Model):
         verbose_name_plural = _("Sets")
 
 
+class SetAncestor(models.Model):
+    """SetAncestor Model.
+
+    Closure of the set hierarchy: one row for every prefix path of the spec of a
+    set, including the spec itself, e.g. ``a``, ``a:b`` and ``a:b:c`` for
+    ``a:b:c``. The sets in ``a`` are the rows with spec ``a``. Maintained by
+    signals.
+    """
+
+    set = models.ForeignKey(
+        Set, models.CASCADE, related_name="ancestors", verbose_name=_("Set")
+    )
+    spec = models.TextField(verbose_name=_("Spec"))
+    depth = models.PositiveSmallIntegerField(verbose_name=_("Depth"))
+
+    def __str__(self) -> str:
+        """Name."""
+        return f"{self.spec} > {self.set}"
+
+    class Meta:
+        """Meta."""
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["spec", "set"], name="django_oai_pmh_setancestor_unique"
+            )
+        ]
+        ordering = ("set", "depth")
+        verbose_name = _("Set ancestor")
+        verbose_name_plural = _("Set ancestors")
+
+
 class Header(models.Model):
     """Header Model."""
 
@@ -98,11 +131,116 @@ class Header(models.Model):
     class Meta:
         """Meta."""
 
+        indexes = [
+            models.Index(
+                fields=["timestamp", "identifier"],
+                name="django_oai_pmh_header_ts_idx",
+            ),
+        ]
         ordering = ("identifier",)
         verbose_name = _("Header")
         verbose_name_plural = _("Headers")
 
 
+class HeaderCount(models.Model):
+    """HeaderCount Model.
+
+    Number of headers in a metadata format, and optionally in a set, maintained by
+    signals.
+    """
+
+    metadata_format = models.ForeignKey(
+        MetadataFormat,
+        models.CASCADE,
+        related_name="header_counts",
+        verbose_name=_("Metadata format"),
+    )
+    set = models.ForeignKey(
+        Set,
+        models.CASCADE,
+        blank=True,
+        null=True,
+        related_name="header_counts",
+        verbose_name=_("Set"),
+    )
+    count = models.BigIntegerField(default=0, verbose_name=_("Count"))
+
+    def __str__(self) -> str:
+        """Name."""
+        return f"{self.metadata_format}[{self.set}]: {self.count}"
+
+    class Meta:
+        """Meta."""
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["metadata_format", "set"],
+                name="django_oai_pmh_headercount_unique",
+            ),
+            models.UniqueConstraint(
+                fields=["metadata_format"],
+                condition=models.Q(set__isnull=True),
+                name="django_oai_pmh_headercount_unique_without_set",
+            ),
+        ]
+        ordering = ("metadata_format", "set")
+        verbose_name = _("Header count")
+        verbose_name_plural = _("Header counts")
+
+
+class HarvestHeader(models.Model):
+    """HarvestHeader Model.
+
+    Denormalised header in a metadata format, with the specs of its sets, maintained
+    by signals if HARVEST_TABLE is enabled. ListIdentifiers reads these instead of
+    joining headers, metadata formats and sets.
+    """
+
+    header = models.ForeignKey(
+        Header,
+        models.CASCADE,
+        related_name="harvest_headers",
+        verbose_name=_("Header"),
+    )
+    metadata_format = models.ForeignKey(
+        MetadataFormat,
+        models.CASCADE,
+        related_name="harvest_headers",
+        verbose_name=_("Metadata format"),
+    )
+    metadata_prefix = models.TextField(verbose_name=_("Metadata prefix"))
+    identifier = models.TextField(verbose_name=_("Identifier"))
+    timestamp = models.DateTimeField(verbose_name=_("Timestamp"))
+    deleted = models.BooleanField(default=False, verbose_name=_("Deleted"))
+    set_specs = ArrayField(
+        models.TextField(), default=list, verbose_name=_("Set specs")
+    )
+
+    def __str__(self) -> str:
+        """Name."""
+        return f"{self.metadata_prefix}[{self.identifier}]"
+
+    class Meta:
+        """Meta."""
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["metadata_prefix", "identifier"],
+                name="django_oai_pmh_harvestheader_unique",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["metadata_prefix", "timestamp", "identifier"],
+                name="django_oai_pmh_harvest_ts_idx",
+            ),
+            GinIndex(fields=["set_specs"], name="django_oai_pmh_harvest_set_idx"),
+        ]
+        ordering = ("identifier",)
+        verbose_name = _("Harvest header")
+        verbose_name_plural = _("Harvest headers")
+
+
 class ResumptionToken(models.Model):
     """ResumptionToken Model."""
 
@@ -110,6 +248,7 @@ class ResumptionToken(models.Model):
     updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Updated at"))
 
     expiration_date = models.DateTimeField(
+        db_index=True,
         verbose_name=_("Expiration date"),
     )
     complete_list_size = models.IntegerField(
@@ -118,6 +257,16 @@ class ResumptionToken(models.Model):
     )
     cursor = models.IntegerField(default=0, verbose_name=_("Cursor"))
     token = models.TextField(unique=True, verbose_name=_("Token"))
+    last_identifier = models.TextField(
+        blank=True,
+        null=True,
+        verbose_name=_("Last identifier"),
+    )
+    last_id = models.BigIntegerField(
+        blank=True,
+        null=True,
+        verbose_name=_("Last ID"),
+    )
 
     from_timestamp = models.DateTimeField(
         blank=True,
@@ -156,6 +305,34 @@ class ResumptionToken(models.Model):
         verbose_name_plural = _("Resumption tokens")
 
 
+class Snapshot(models.Model):
+    """Snapshot Model.
+
+    Pre-rendered ListRecords pages of full harvests, written by the oai_snapshot
+    command to a directory in SNAPSHOT_DIR named by the pk. A snapshot is served
+    once it is completed and until the repository changes, which marks it stale.
+    """
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Created at"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Updated at"))
+
+    completed_at = models.DateTimeField(
+        blank=True, null=True, verbose_name=_("Completed at")
+    )
+    stale = models.BooleanField(default=False, verbose_name=_("Stale"))
+
+    def __str__(self) -> str:
+        """Name."""
+        return str(self.created_at)
+
+    class Meta:
+        """Meta."""
+
+        ordering = ("-created_at",)
+        verbose_name = _("Snapshot")
+        verbose_name_plural = _("Snapshots")
+
+
 class DCRecord(models.Model):
     """DCRecord Model."""
 
@@ -195,16 +372,22 @@ class DCRecord(models.Model):
     @classmethod
     def from_xml(cls: Type[T], data: str, header: Header) -> Tuple[Optional[T], bool]:
         """Create DCRecord from xml string."""
-        defaults: Dict[str, List[str]] = {}
-        for child in etree.XML(data):
-            if not child.text:
+        return cls.objects.update_or_create(
+            header=header, defaults=cls.parse_xml(etree.XML(data))
+        )
+
+    @staticmethod
+    def parse_xml(element) -> Dict[str, List[str]]:
+        """Get the values of the Dublin Core elements in an ``oai_dc:dc`` element."""
+        values: Dict[str, List[str]] = {}
+        for child in element:
+            if not child.text or not isinstance(child.tag, str):
                 continue
-            tag_name = re.sub(r"\{[^\}]+\}", "", child.tag)
-            if tag_name not in defaults:
-                defaults[tag_name] = []
-            defaults[tag_name].append(child.text.strip())
-
-        return cls.objects.update_or_create(header=header, defaults=defaults)
+            tag_name = etree.QName(child).localname
+            if tag_name not in values:
+                values[tag_name] = []
+            values[tag_name].append(child.text.strip())
+        return values
 
     def __str__(self: T) -> str:
         """Name."""
@@ -237,9 +420,14 @@ class XMLRecord(models.Model):
 
     def save(self, *args, **kwargs) -> None:
         """Save."""
-        self.xml_metadata = re.sub(r"^<\?xml[^>]+\?>\s*", "", self.xml_metadata)
+        self.xml_metadata = self.normalize(self.xml_metadata)
         super(XMLRecord, self).save(*args, **kwargs)
 
+    @staticmethod
+    def normalize(xml_metadata: str) -> str:
+        """Remove the XML declaration."""
+        return re.sub(r"^<\?xml[^>]+\?>\s*", "", xml_metadata)
+
     def __str__(self) -> str:
         """Name."""
         return f"{self.metadata_prefix}[{self.header}]"
@@ -250,3 +438,78 @@ class XMLRecord(models.Model):
         ordering = ("header", "metadata_prefix")
         verbose_name = _("XML record")
         verbose_name_plural = _("XML records")
+
+
+class CachedRecord(models.Model):
+    """CachedRecord Model.
+
+    Pre-rendered ``<record>`` XML of a header in a metadata format.
+    """
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Created at"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Updated at"))
+
+    header = models.ForeignKey(
+        Header, models.CASCADE, related_name="cached_records", verbose_name=_("Header")
+    )
+    metadata_format = models.ForeignKey(
+        MetadataFormat,
+        models.CASCADE,
+        related_name="cached_records",
+        verbose_name=_("Metadata format"),
+    )
+    xml = models.TextField(verbose_name=_("XML"))
+
+    def __str__(self) -> str:
+        """Name."""
+        return f"{self.metadata_format}[{self.header}]"
+
+    class Meta:
+        """Meta."""
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=["header", "metadata_format"],
+                name="django_oai_pmh_cachedrecord_unique",
+            )
+        ]
+        ordering = ("header", "metadata_format")
+        verbose_name = _("Cached record")
+        verbose_name_plural = _("Cached records")
+
+
+class Change(models.Model):
+    """Change Model.
+
+    Append-only log of header changes, written by signals if CHANGE_LOG is enabled.
+    Every row holds the timestamp, metadata prefixes and set specs of the header at
+    the time of the change, so harvests with ``from`` only read the rows since then.
+    """
+
+    header = models.ForeignKey(
+        Header, models.CASCADE, related_name="changes", verbose_name=_("Header")
+    )
+    timestamp = models.DateTimeField(verbose_name=_("Timestamp"))
+    metadata_prefixes = ArrayField(
+        models.TextField(), default=list, verbose_name=_("Metadata prefixes")
+    )
+    set_specs = ArrayField(
+        models.TextField(), default=list, verbose_name=_("Set specs")
+    )
+
+    def __str__(self) -> str:
+        """Name."""
+        return f"{self.header}@{self.timestamp}"
+
+    class Meta:
+        """Meta."""
+
+        indexes = [
+            models.Index(
+                fields=["timestamp", "header"],
+                name="django_oai_pmh_change_ts_idx",
+            ),
+        ]
+        ordering = ("pk",)
+        verbose_name = _("Change")
+        verbose_name_plural = _("Changes")
@@ -0,0 +1,134 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""OAI-PMH Django app paginator."""
+
+from django.core.paginator import Page
+from django.db.models import Q
+from django.utils.functional import cached_property
+from math import ceil
+from typing import Optional, Tuple
+
+
+class KeysetPaginator:
+    """Keyset (seek) paginator.
+
+    Instead of jumping to an offset, every page starts right after the last
+    ``(ordering key, pk)`` served by the previous page. Each page is thus a range
+    scan on the ordering index, no matter how deep into the list it is.
+    """
+
+    def __init__(
+        self,
+        object_list,
+        per_page: int,
+        cursor: int = 0,
+        last: Optional[Tuple[str, int]] = None,
+        ordering: str = "identifier",
+        unique: Optional[bool] = None,
+    ):
+        """Init.
+
+        Args:
+         * object_list: queryset to paginate
+         * per_page: number of objects per page
+         * cursor: number of objects already served
+         * last: ``(ordering key, pk)`` of the last object already served
+         * ordering: name of the field used as ordering key
+         * unique: whether the ordering key is unique within object_list, by
+           default whether the field is unique
+        """
+        if unique is None:
+            unique = object_list.model._meta.get_field(ordering).unique
+        self.unique = unique
+        if self.unique:
+            self.object_list = object_list.order_by(ordering)
+        else:
+            self.object_list = object_list.order_by(ordering, "pk")
+        self.per_page = per_page
+        self.cursor = cursor
+        self.last = last
+        self.ordering = ordering
+
+    @cached_property
+    def count(self) -> int:
+        """Total number of objects."""
+        return self.object_list.count()
+
+    @cached_property
+    def num_pages(self) -> int:
+        """Total number of pages."""
+        return ceil(self.count / self.per_page) if self.count else 0
+
+    def page(self) -> "KeysetPage":
+        """Get the page following ``last``."""
+        objs = self.object_list
+        # No OR here, so the database can use the condition on the ordering key as
+        # index range condition instead of filtering the whole index.
+        if self.last is not None and self.unique:
+            objs = objs.filter(**{f"{self.ordering}__gt": self.last[0]})
+        elif self.last is not None:
+            objs = objs.filter(**{f"{self.ordering}__gte": self.last[0]}).exclude(
+                Q(**{self.ordering: self.last[0], "pk__lte": self.last[1]})
+            )
+        keys = list(
+            objs.select_related(None)
+            .prefetch_related(None)
+            .values_list(self.ordering, "pk")[: self.per_page + 1]
+        )
+        return KeysetPage(
+            objs[: self.per_page],
+            keys[: self.per_page],
+            len(keys) > self.per_page,
+            self,
+        )
+
+
+class KeysetPage(Page):
+    """Page of a keyset paginator."""
+
+    def __init__(self, object_list, keys, has_next: bool, paginator: KeysetPaginator):
+        """Init."""
+        super().__init__(
+            object_list, paginator.cursor // paginator.per_page + 1, paginator
+        )
+        self.keys = keys
+        self._has_next = has_next
+
+    @property
+    def last_key(self) -> Optional[Tuple[str, int]]:
+        """``(ordering key, pk)`` of the last object on this page."""
+        return self.keys[-1] if self.keys else None
+
+    def __len__(self) -> int:
+        """Get the number of objects on this page."""
+        return len(self.keys)
+
+    def has_next(self) -> bool:
+        """Check whether there is a next page."""
+        return self._has_next
+
+    def has_previous(self) -> bool:
+        """Check whether there is a previous page."""
+        return self.paginator.cursor > 0
+
+    def start_index(self) -> int:
+        """Get the 1-based index of the first object on this page."""
+        return self.paginator.cursor + 1 if self.keys else 0
+
+    def end_index(self) -> int:
+        """Get the 1-based index of the last object on this page."""
+        return self.paginator.cursor + len(self.keys)
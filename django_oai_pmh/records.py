@@ -0,0 +1,155 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""OAI-PMH Django app records.
+
+Rendering of ``<record>`` XML and the maintenance of the pre-rendered CachedRecords.
+"""
+
+from django.db.models import Prefetch
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+from typing import Iterable
+
+from . import serializers
+from .models import CachedRecord, Header, MetadataFormat, XMLRecord
+from .settings import RECORD_CACHE, SERIALIZER
+
+
+def render_record(header: Header, metadata_prefix: str) -> str:
+    """Render the ``<record>`` XML of header in metadata_prefix."""
+    if SERIALIZER == "fast":
+        return serializers.record_xml(header, metadata_prefix)
+    return get_template("django_oai_pmh/partials/_record.xml").render(
+        {"header": header, "metadata_prefix": metadata_prefix}
+    )
+
+
+def prefetch_records(objs, metadata_prefix):
+    """Batch load everything needed to render the records of objs.
+
+    Loads the DCRecords, sets and the XMLRecords for metadata_prefix of all headers
+    in objs at once, instead of querying them per header while rendering. With
+    RECORD_CACHE only the pre-rendered records are loaded.
+    """
+    if RECORD_CACHE:
+        return objs.prefetch_related(
+            Prefetch(
+                "cached_records",
+                queryset=CachedRecord.objects.filter(
+                    metadata_format__prefix=metadata_prefix
+                )
+                .select_related("metadata_format")
+                .order_by(),
+                to_attr="prefetched_cached_records",
+            )
+        )
+    if SERIALIZER != "fast" or metadata_prefix != "oai_dc":
+        # The fast serializer loads the Dublin Core values of a page itself.
+        objs = objs.select_related("dcrecord")
+    return objs.prefetch_related(
+        "sets",
+        Prefetch(
+            "xmlrecords",
+            queryset=XMLRecord.objects.filter(metadata_prefix__prefix=metadata_prefix)
+            .select_related("metadata_prefix")
+            .order_by(),
+            to_attr="prefetched_xmlrecords",
+        ),
+    )
+
+
+def cached_record(header: Header, metadata_prefix: str) -> str:
+    """Get the cached ``<record>`` XML of header in metadata_prefix.
+
+    If there is none yet, it is rendered and stored.
+    """
+    if hasattr(header, "prefetched_cached_records"):
+        for record in header.prefetched_cached_records:
+            if record.metadata_format.prefix == metadata_prefix:
+                return mark_safe(record.xml)
+    else:
+        record = (
+            CachedRecord.objects.filter(
+                header=header, metadata_format__prefix=metadata_prefix
+            )
+            .only("xml")
+            .first()
+        )
+        if record is not None:
+            return mark_safe(record.xml)
+
+    xml = render_record(header, metadata_prefix)
+    CachedRecord.objects.update_or_create(
+        header=header,
+        metadata_format=MetadataFormat.objects.get(prefix=metadata_prefix),
+        defaults={"xml": xml},
+    )
+    return mark_safe(xml)
+
+
+def update_cached_records(header_pks: Iterable[int]) -> int:
+    """Re-render the CachedRecords of the given headers.
+
+    Records are rendered for every metadata format of a header, cached records of
+    metadata formats a header no longer has are deleted.
+
+    Returns:
+     * number of rendered records
+    """
+    header_pks = list(header_pks)
+    headers = (
+        Header.objects.filter(pk__in=header_pks)
+        .select_related("dcrecord")
+        .prefetch_related(
+            "sets",
+            "metadata_formats",
+            Prefetch(
+                "xmlrecords",
+                queryset=XMLRecord.objects.select_related("metadata_prefix").order_by(),
+                to_attr="prefetched_xmlrecords",
+            ),
+        )
+    )
+
+    records = []
+    for header in headers:
+        for metadata_format in header.metadata_formats.all():
+            records.append(
+                CachedRecord(
+                    header=header,
+                    metadata_format=metadata_format,
+                    xml=render_record(header, metadata_format.prefix),
+                )
+            )
+
+    keep = {(r.header.pk, r.metadata_format.pk) for r in records}
+    stale = [
+        pk
+        for pk, header_id, metadata_format_id in CachedRecord.objects.filter(
+            header_id__in=header_pks
+        ).values_list("pk", "header_id", "metadata_format_id")
+        if (header_id, metadata_format_id) not in keep
+    ]
+    if stale:
+        CachedRecord.objects.filter(pk__in=stale).delete()
+    CachedRecord.objects.bulk_create(
+        records,
+        update_conflicts=True,
+        unique_fields=["header", "metadata_format"],
+        update_fields=["xml", "updated_at"],
+    )
+    return len(records)
@@ -0,0 +1,87 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""OAI-PMH Django app set hierarchy.
+
+Set specs are colon-separated paths, a set contains the headers of all sets below
+it. SetAncestor holds every prefix path of every spec, so the sets below a spec are
+a single lookup on its index. Only a spec with a set of its own contains the sets
+below it, other specs are not listed by ListSets and match no headers.
+"""
+
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db import transaction
+from django.db.models import Exists
+from typing import Iterable, List
+
+from .models import Header, Set, SetAncestor
+
+
+def ancestor_specs(spec: str) -> List[str]:
+    """Get the specs of all sets above spec, and spec itself, top-down."""
+    specs: List[str] = []
+    for part in spec.split(":"):
+        specs.append(f"{specs[-1]}:{part}" if specs else part)
+    return specs
+
+
+def add(set_list: Iterable[Set]):
+    """Add the ancestors of the sets in set_list, existing ones are kept."""
+    SetAncestor.objects.bulk_create(
+        [
+            SetAncestor(set=set, spec=spec, depth=depth)
+            for set in set_list
+            for depth, spec in enumerate(ancestor_specs(set.spec))
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def update(set: Set):
+    """Replace the ancestors of set."""
+    with transaction.atomic():
+        SetAncestor.objects.filter(set=set).delete()
+        add([set])
+
+
+def _ancestors(spec: str):
+    return SetAncestor.objects.filter(
+        Exists(Set.objects.filter(spec=spec)), spec=spec
+    ).order_by()
+
+
+def subsets(spec: str):
+    """Get the pks of the sets with spec and below it."""
+    return _ancestors(spec).values("set_id")
+
+
+def subset_specs(spec: str) -> ArraySubquery:
+    """Get the specs of the sets with spec and below it, as array expression."""
+    return ArraySubquery(_ancestors(spec).values("set__spec"))
+
+
+def has_subsets(spec: str) -> bool:
+    """Check whether there are sets below spec."""
+    return SetAncestor.objects.filter(spec=spec, depth__gt=spec.count(":")).exists()
+
+
+def filter_headers(header_list, spec: str):
+    """Filter header_list on the headers in spec or any set below it."""
+    return header_list.filter(
+        pk__in=Header.sets.through.objects.filter(set_id__in=subsets(spec)).values(
+            "header_id"
+        )
+    )
@@ -18,6 +18,7 @@
 
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
+from typing import Optional
 
 
 USER_SETTINGS = getattr(settings, "OAI_PMH", {})
@@ -36,3 +37,176 @@ else:
 NUM_PER_PAGE = 100
 if "NUM_PER_PAGE" in USER_SETTINGS:
     NUM_PER_PAGE = USER_SETTINGS["NUM_PER_PAGE"]
+
+PAGINATION = "offset"
+if "PAGINATION" in USER_SETTINGS:
+    PAGINATION = USER_SETTINGS["PAGINATION"]
+    if PAGINATION not in ("keyset", "offset"):
+        raise ImproperlyConfigured(
+            f'Invalid value "{PAGINATION}" for PAGINATION, use "keyset" or "offset".'
+        )
+
+RESUMPTION_TOKEN_BACKEND = "database"
+if "RESUMPTION_TOKEN_BACKEND" in USER_SETTINGS:
+    RESUMPTION_TOKEN_BACKEND = USER_SETTINGS["RESUMPTION_TOKEN_BACKEND"]
+    if RESUMPTION_TOKEN_BACKEND not in ("database", "signed"):
+        raise ImproperlyConfigured(
+            f'Invalid value "{RESUMPTION_TOKEN_BACKEND}" for '
+            + 'RESUMPTION_TOKEN_BACKEND, use "database" or "signed".'
+        )
+
+DELETE_EXPIRED_TOKENS_ON_SAVE = True
+if "DELETE_EXPIRED_TOKENS_ON_SAVE" in USER_SETTINGS:
+    DELETE_EXPIRED_TOKENS_ON_SAVE = USER_SETTINGS["DELETE_EXPIRED_TOKENS_ON_SAVE"]
+
+STREAMING = False
+if "STREAMING" in USER_SETTINGS:
+    STREAMING = USER_SETTINGS["STREAMING"]
+
+STREAMING_CHUNK_SIZE = 100
+if "STREAMING_CHUNK_SIZE" in USER_SETTINGS:
+    STREAMING_CHUNK_SIZE = USER_SETTINGS["STREAMING_CHUNK_SIZE"]
+
+ASYNC = False
+if "ASYNC" in USER_SETTINGS:
+    ASYNC = USER_SETTINGS["ASYNC"]
+
+HARVEST_TABLE = False
+if "HARVEST_TABLE" in USER_SETTINGS:
+    HARVEST_TABLE = USER_SETTINGS["HARVEST_TABLE"]
+
+CHANGE_LOG = False
+if "CHANGE_LOG" in USER_SETTINGS:
+    CHANGE_LOG = USER_SETTINGS["CHANGE_LOG"]
+
+COMPRESSION = ["gzip", "deflate"]
+if "COMPRESSION" in USER_SETTINGS:
+    COMPRESSION = list(USER_SETTINGS["COMPRESSION"])
+    if set(COMPRESSION) - {"gzip", "deflate"}:
+        raise ImproperlyConfigured(
+            f'Invalid value "{COMPRESSION}" for COMPRESSION, use a list of "gzip" '
+            + 'and "deflate".'
+        )
+
+# Cached compressed responses are sent with the responseDate of the response that
+# was cached, up to COMPRESSION_CACHE_TIMEOUT seconds old. Off by default.
+COMPRESSION_CACHE_TIMEOUT = 0
+if "COMPRESSION_CACHE_TIMEOUT" in USER_SETTINGS:
+    COMPRESSION_CACHE_TIMEOUT = USER_SETTINGS["COMPRESSION_CACHE_TIMEOUT"]
+
+RATE_LIMIT: Optional[float] = None
+if "RATE_LIMIT" in USER_SETTINGS:
+    RATE_LIMIT = USER_SETTINGS["RATE_LIMIT"]
+    if RATE_LIMIT is not None and RATE_LIMIT <= 0:
+        raise ImproperlyConfigured(
+            f'Invalid value "{RATE_LIMIT}" for RATE_LIMIT, use None or a positive '
+            + "number of requests per second."
+        )
+
+RATE_LIMIT_BURST = 10
+if "RATE_LIMIT_BURST" in USER_SETTINGS:
+    RATE_LIMIT_BURST = USER_SETTINGS["RATE_LIMIT_BURST"]
+    if RATE_LIMIT_BURST < 1:
+        raise ImproperlyConfigured(
+            f'Invalid value "{RATE_LIMIT_BURST}" for RATE_LIMIT_BURST, use a '
+            + "positive number of requests."
+        )
+
+MAX_CONCURRENT_REQUESTS: Optional[int] = None
+if "MAX_CONCURRENT_REQUESTS" in USER_SETTINGS:
+    MAX_CONCURRENT_REQUESTS = USER_SETTINGS["MAX_CONCURRENT_REQUESTS"]
+
+COALESCING = False
+if "COALESCING" in USER_SETTINGS:
+    COALESCING = USER_SETTINGS["COALESCING"]
+
+COALESCING_CACHE = False
+if "COALESCING_CACHE" in USER_SETTINGS:
+    COALESCING_CACHE = USER_SETTINGS["COALESCING_CACHE"]
+
+COALESCING_TIMEOUT = 30
+if "COALESCING_TIMEOUT" in USER_SETTINGS:
+    COALESCING_TIMEOUT = USER_SETTINGS["COALESCING_TIMEOUT"]
+
+SNAPSHOT_DIR = None
+if "SNAPSHOT_DIR" in USER_SETTINGS:
+    SNAPSHOT_DIR = USER_SETTINGS["SNAPSHOT_DIR"]
+
+SNAPSHOT_SENDFILE = None
+if "SNAPSHOT_SENDFILE" in USER_SETTINGS:
+    SNAPSHOT_SENDFILE = USER_SETTINGS["SNAPSHOT_SENDFILE"]
+    if SNAPSHOT_SENDFILE not in (None, "X-Sendfile", "X-Accel-Redirect"):
+        raise ImproperlyConfigured(
+            f'Invalid value "{SNAPSHOT_SENDFILE}" for SNAPSHOT_SENDFILE, use None, '
+            + '"X-Sendfile" or "X-Accel-Redirect".'
+        )
+
+SNAPSHOT_URL = None
+if "SNAPSHOT_URL" in USER_SETTINGS:
+    SNAPSHOT_URL = USER_SETTINGS["SNAPSHOT_URL"]
+if SNAPSHOT_SENDFILE == "X-Accel-Redirect" and not SNAPSHOT_URL:
+    raise ImproperlyConfigured(
+        "SNAPSHOT_URL is required if SNAPSHOT_SENDFILE is X-Accel-Redirect."
+    )
+
+RECORD_CACHE = False
+if "RECORD_CACHE" in USER_SETTINGS:
+    RECORD_CACHE = USER_SETTINGS["RECORD_CACHE"]
+
+SERIALIZER = "template"
+if "SERIALIZER" in USER_SETTINGS:
+    SERIALIZER = USER_SETTINGS["SERIALIZER"]
+    if SERIALIZER not in ("fast", "template"):
+        raise ImproperlyConfigured(
+            f'Invalid value "{SERIALIZER}" for SERIALIZER, use "fast" or "template".'
+        )
+
+COMPLETE_LIST_SIZE = "count"
+if "COMPLETE_LIST_SIZE" in USER_SETTINGS:
+    COMPLETE_LIST_SIZE = USER_SETTINGS["COMPLETE_LIST_SIZE"]
+    if COMPLETE_LIST_SIZE not in ("count", "materialized"):
+        raise ImproperlyConfigured(
+            f'Invalid value "{COMPLETE_LIST_SIZE}" for COMPLETE_LIST_SIZE, use '
+            + '"count" or "materialized".'
+        )
+
+TIMING = False
+if "TIMING" in USER_SETTINGS:
+    TIMING = USER_SETTINGS["TIMING"]
+
+TIMING_CALLBACK = None
+if "TIMING_CALLBACK" in USER_SETTINGS:
+    TIMING_CALLBACK = USER_SETTINGS["TIMING_CALLBACK"]
+
+METRICS = False
+if "METRICS" in USER_SETTINGS:
+    METRICS = USER_SETTINGS["METRICS"]
+
+METRICS_DIR = None
+if "METRICS_DIR" in USER_SETTINGS:
+    METRICS_DIR = USER_SETTINGS["METRICS_DIR"]
+
+METRICS_URL = None
+if "METRICS_URL" in USER_SETTINGS:
+    METRICS_URL = USER_SETTINGS["METRICS_URL"]
+
+EARLIEST_DATESTAMP_CACHE_TIMEOUT = 86400
+if "EARLIEST_DATESTAMP_CACHE_TIMEOUT" in USER_SETTINGS:
+    EARLIEST_DATESTAMP_CACHE_TIMEOUT = USER_SETTINGS["EARLIEST_DATESTAMP_CACHE_TIMEOUT"]
+
+CACHE_CONTROL: dict = {}
+if "CACHE_CONTROL" in USER_SETTINGS:
+    CACHE_CONTROL = USER_SETTINGS["CACHE_CONTROL"]
+    if not isinstance(CACHE_CONTROL, dict):
+        raise ImproperlyConfigured(
+            "CACHE_CONTROL needs to be a dict of Cache-Control directives."
+        )
+
+COMPLETE_LIST_SIZE_ESTIMATE = "planner"
+if "COMPLETE_LIST_SIZE_ESTIMATE" in USER_SETTINGS:
+    COMPLETE_LIST_SIZE_ESTIMATE = USER_SETTINGS["COMPLETE_LIST_SIZE_ESTIMATE"]
+    if COMPLETE_LIST_SIZE_ESTIMATE not in ("count", "planner"):
+        raise ImproperlyConfigured(
+            f'Invalid value "{COMPLETE_LIST_SIZE_ESTIMATE}" for '
+            + 'COMPLETE_LIST_SIZE_ESTIMATE, use "count" or "planner".'
+        )
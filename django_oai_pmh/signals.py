@@ -16,14 +16,284 @@
 # along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
 """OAI-PMH Django app signals."""
 
-from django.db.models.signals import pre_save
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
 from django.dispatch import receiver
 from django.utils import timezone
 
-from .models import ResumptionToken
+from .models import (
+    CachedRecord,
+    DCRecord,
+    HarvestHeader,
+    Header,
+    MetadataFormat,
+    ResumptionToken,
+    Set,
+    XMLRecord,
+)
+from . import changelog, counts, harvest, sets, snapshots
+from .identify import clear_earliest_datestamp
+from .records import update_cached_records
+from .settings import (
+    CHANGE_LOG,
+    COMPLETE_LIST_SIZE,
+    DELETE_EXPIRED_TOKENS_ON_SAVE,
+    HARVEST_TABLE,
+    RECORD_CACHE,
+    SNAPSHOT_DIR,
+)
 
 
 @receiver(pre_save, sender=ResumptionToken)
 def delete_old_resumption_tokens(sender, **kwargs):
-    """Delete expired resumption tokens."""
+    """Delete expired resumption tokens.
+
+    Disable with DELETE_EXPIRED_TOKENS_ON_SAVE and run the oai_prune_tokens command
+    periodically instead.
+    """
+    if not DELETE_EXPIRED_TOKENS_ON_SAVE:
+        return
     ResumptionToken.objects.filter(expiration_date__lte=timezone.now()).delete()
+
+
+@receiver(post_save, sender=Header)
+@receiver(post_delete, sender=Header)
+def clear_earliest_datestamp_of_header(sender, **kwargs):
+    """Clear the cached earliest datestamp when a header changes."""
+    clear_earliest_datestamp()
+
+
+@receiver(pre_delete, sender=Header)
+def count_deleted_header(sender, instance, **kwargs):
+    """Remove a deleted header from the header counts."""
+    if COMPLETE_LIST_SIZE != "materialized":
+        return
+    counts.adjust(
+        [instance.pk],
+        -1,
+        metadata_format_pks=instance.metadata_formats.values_list("pk", flat=True),
+    )
+
+
+@receiver(m2m_changed, sender=Header.metadata_formats.through)
+def count_metadata_formats(sender, instance, action, reverse, pk_set, **kwargs):
+    """Update the header counts of changed metadata formats."""
+    if COMPLETE_LIST_SIZE != "materialized":
+        return
+    delta, pks = _changed_pks(
+        instance, action, pk_set, "identifiers" if reverse else "metadata_formats"
+    )
+    if not pks:
+        return
+    if reverse:
+        counts.adjust(pks, delta, metadata_format_pks=[instance.pk])
+    else:
+        counts.adjust([instance.pk], delta, metadata_format_pks=pks)
+
+
+@receiver(m2m_changed, sender=Header.sets.through)
+def count_sets(sender, instance, action, reverse, pk_set, **kwargs):
+    """Update the header counts of changed sets."""
+    if COMPLETE_LIST_SIZE != "materialized":
+        return
+    delta, pks = _changed_pks(
+        instance, action, pk_set, "headers" if reverse else "sets"
+    )
+    if not pks:
+        return
+    if reverse:
+        counts.adjust(pks, delta, set_pks=[instance.pk])
+    else:
+        counts.adjust([instance.pk], delta, set_pks=pks)
+
+
+def _changed_pks(instance, action, pk_set, related_name):
+    """Get the change and the pks actually added or removed in a m2m_changed signal.
+
+    Removals are handled before they happen, as afterwards it is unknown which of
+    the relations existed.
+    """
+    if action == "post_add":
+        return 1, list(pk_set)
+    elif action in ("pre_remove", "pre_clear"):
+        related = getattr(instance, related_name).all()
+        if action == "pre_remove":
+            related = related.filter(pk__in=pk_set)
+        return -1, list(related.values_list("pk", flat=True))
+    return 0, []
+
+
+@receiver(post_save, sender=Header)
+def update_cached_records_of_header(sender, instance, created, **kwargs):
+    """Re-render the cached records of a saved header."""
+    if RECORD_CACHE and not created:
+        update_cached_records([instance.pk])
+
+
+@receiver(post_save, sender=DCRecord)
+@receiver(post_save, sender=XMLRecord)
+def update_cached_records_of_record(sender, instance, **kwargs):
+    """Re-render the cached records of the header of a saved or deleted record."""
+    if RECORD_CACHE:
+        update_cached_records([instance.header_id])
+
+
+@receiver(m2m_changed, sender=Header.metadata_formats.through)
+@receiver(m2m_changed, sender=Header.sets.through)
+def update_cached_records_of_relation(
+    sender, instance, action, reverse, model, pk_set, **kwargs
+):
+    """Re-render the cached records of headers whose sets or formats changed."""
+    if not RECORD_CACHE:
+        return
+    if action in ("post_add", "post_remove"):
+        update_cached_records(pk_set if reverse else [instance.pk])
+    elif action == "post_clear" and not reverse:
+        update_cached_records([instance.pk])
+    elif action == "pre_clear" and isinstance(instance, MetadataFormat):
+        CachedRecord.objects.filter(metadata_format=instance).delete()
+    elif action == "pre_clear" and isinstance(instance, Set):
+        CachedRecord.objects.filter(header__sets=instance).delete()
+
+
+@receiver(post_save, sender=Set)
+def delete_cached_records_of_set(sender, instance, created, **kwargs):
+    """Delete the cached records of the headers in a changed set.
+
+    They are rendered again when requested or by the oai_warm_records command.
+    """
+    if RECORD_CACHE and not created:
+        CachedRecord.objects.filter(header__sets=instance).delete()
+
+
+@receiver(post_save, sender=Set)
+def update_ancestors_of_set(sender, instance, **kwargs):
+    """Update the ancestors of a saved set, its spec might have changed."""
+    sets.update(instance)
+
+
+@receiver(post_delete, sender=Header)
+@receiver(post_delete, sender=MetadataFormat)
+@receiver(post_delete, sender=Set)
+@receiver(post_save, sender=DCRecord)
+@receiver(post_save, sender=Header)
+@receiver(post_save, sender=MetadataFormat)
+@receiver(post_save, sender=Set)
+@receiver(post_save, sender=XMLRecord)
+@receiver(m2m_changed, sender=Header.metadata_formats.through)
+@receiver(m2m_changed, sender=Header.sets.through)
+def invalidate_snapshots(sender, **kwargs):
+    """Mark the snapshots stale when the repository changes."""
+    if kwargs.get("action", "post_").startswith("post_"):
+        snapshots.invalidate()
+
+
+@receiver(post_save, sender=Header)
+def log_change_of_header(sender, instance, **kwargs):
+    """Log the change of a saved header."""
+    if CHANGE_LOG:
+        changelog.log([instance.pk])
+
+
+@receiver(post_save, sender=DCRecord)
+@receiver(post_save, sender=XMLRecord)
+def log_change_of_record(sender, instance, **kwargs):
+    """Log the change of the header of a saved or deleted record."""
+    if CHANGE_LOG:
+        changelog.log([instance.header_id])
+
+
+@receiver(m2m_changed, sender=Header.metadata_formats.through)
+@receiver(m2m_changed, sender=Header.sets.through)
+def log_change_of_relation(sender, instance, action, reverse, pk_set, **kwargs):
+    """Log the changes of headers whose sets or formats changed.
+
+    Headers removed by clearing a set or format aren't logged, their last change
+    still lists it, which only makes the change log less selective.
+    """
+    if not CHANGE_LOG:
+        return
+    if action in ("post_add", "post_remove"):
+        changelog.log(pk_set if reverse else [instance.pk])
+    elif action == "post_clear" and not reverse:
+        changelog.log([instance.pk])
+
+
+@receiver(post_save, sender=Header)
+def update_harvest_headers_of_header(sender, instance, **kwargs):
+    """Update the harvest headers of a saved header."""
+    if HARVEST_TABLE:
+        harvest.update([instance.pk])
+
+
+@receiver(m2m_changed, sender=Header.metadata_formats.through)
+@receiver(m2m_changed, sender=Header.sets.through)
+def update_harvest_headers_of_relation(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """Update the harvest headers of headers whose sets or formats changed.
+
+    When a set is cleared, its headers are remembered before and updated afterwards.
+    """
+    if not HARVEST_TABLE:
+        return
+    if action in ("post_add", "post_remove"):
+        harvest.update(pk_set if reverse else [instance.pk])
+    elif action == "post_clear" and not reverse:
+        harvest.update([instance.pk])
+    elif action == "pre_clear" and isinstance(instance, MetadataFormat):
+        HarvestHeader.objects.filter(metadata_format=instance).delete()
+    elif action == "pre_clear" and isinstance(instance, Set):
+        instance._harvest_header_pks = list(
+            instance.headers.values_list("pk", flat=True)
+        )
+    elif action == "post_clear" and reverse:
+        harvest.update(getattr(instance, "_harvest_header_pks", []))
+
+
+@receiver(post_save, sender=MetadataFormat)
+def rename_harvest_headers_of_format(sender, instance, created, **kwargs):
+    """Update the metadata prefix of the harvest headers of a changed format."""
+    if HARVEST_TABLE and not created:
+        HarvestHeader.objects.filter(metadata_format=instance).update(
+            metadata_prefix=instance.prefix
+        )
+
+
+@receiver(post_save, sender=Set)
+def update_harvest_headers_of_set(sender, instance, created, **kwargs):
+    """Update the harvest headers of the headers in a changed set."""
+    if HARVEST_TABLE and not created:
+        harvest.update(instance.headers.values_list("pk", flat=True))
+
+
+@receiver(pre_delete, sender=Set)
+def remember_harvest_headers_of_set(sender, instance, **kwargs):
+    """Remember the headers of a set before it is deleted."""
+    if HARVEST_TABLE:
+        instance._harvest_header_pks = list(
+            instance.headers.values_list("pk", flat=True)
+        )
+
+
+@receiver(post_delete, sender=Set)
+def update_harvest_headers_of_deleted_set(sender, instance, **kwargs):
+    """Update the harvest headers of the headers of a deleted set."""
+    if HARVEST_TABLE:
+        harvest.update(getattr(instance, "_harvest_header_pks", []))
+
+
+# Records without post_delete receivers are deleted with a single query, so the
+# receivers for deleted records are only connected if their feature is enabled.
+for model in (DCRecord, XMLRecord):
+    if RECORD_CACHE:
+        post_delete.connect(update_cached_records_of_record, sender=model)
+    if SNAPSHOT_DIR:
+        post_delete.connect(invalidate_snapshots, sender=model)
+    if CHANGE_LOG:
+        post_delete.connect(log_change_of_record, sender=model)
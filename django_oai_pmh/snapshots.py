@@ -0,0 +1,382 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""OAI-PMH Django app snapshots.
+
+A snapshot holds every ListRecords page of the full harvest of each metadata format,
+and of each metadata format and set, as gzip-compressed files:
+``SNAPSHOT_DIR/<snapshot pk>/<list>/<page>.xml.gz``. The ``index.json`` next to
+them lists metadata prefix, set spec, complete list size and number of pages of
+every list. The resumption tokens in the pages point to the next page file, so a
+full harvest is served from the files without touching the database.
+
+Every page file consists of two gzip members, a small head up to the response date
+and the body. When a page is served, only the head is rendered again with the
+current time as response date, the body is sent as it is stored.
+"""
+
+import gzip
+import json
+import os
+import re
+import shutil
+import zlib
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.template.loader import get_template, render_to_string
+from django.utils import dateformat, timezone
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from . import compression, serializers, sets
+from .models import Header, MetadataFormat, SetAncestor, Snapshot
+from .paginator import KeysetPaginator
+from .records import cached_record, prefetch_records
+from .settings import (
+    NUM_PER_PAGE,
+    RECORD_CACHE,
+    SERIALIZER,
+    SNAPSHOT_DIR,
+    SNAPSHOT_SENDFILE,
+    SNAPSHOT_URL,
+)
+from .workers import worker_pool
+
+
+CHUNK_SIZE = 64 * 1024
+RESPONSE_DATE = re.compile(rb"<responseDate>[^<]*</responseDate>")
+TOKEN_RE = re.compile(r"^snapshot-(?P<snapshot>\d+)-(?P<list>\d+)-(?P<page>\d+)$")
+
+
+def create(
+    metadata_prefixes: Optional[List[str]] = None,
+    processes: Optional[int] = None,
+    pages_per_task: int = 100,
+    keep: int = 2,
+) -> Snapshot:
+    """Render a new snapshot to SNAPSHOT_DIR.
+
+    The lists are cut into pages in this process, the pages are rendered in a
+    process pool in tasks of pages_per_task pages. Afterwards all but the newest
+    keep snapshots are deleted, older ones are kept so that harvests that already
+    started on them can finish.
+
+    Args:
+     * metadata_prefixes: metadata formats to snapshot, by default all
+     * processes: number of worker processes, with ``1`` pages are rendered in this
+       process
+     * pages_per_task: number of consecutive pages a worker renders at once
+     * keep: number of snapshots to keep
+
+    Returns:
+     * the completed snapshot
+    """
+    if not SNAPSHOT_DIR:
+        raise ImproperlyConfigured("SNAPSHOT_DIR is not set.")
+
+    snapshot = Snapshot.objects.create()
+    directory = os.path.join(SNAPSHOT_DIR, str(snapshot.pk))
+    os.makedirs(directory)
+
+    formats = MetadataFormat.objects.order_by("prefix")
+    if metadata_prefixes:
+        formats = formats.filter(prefix__in=metadata_prefixes)
+    lists: List[Dict[str, Any]] = []
+    tasks = []
+    for metadata_prefix in formats.values_list("prefix", flat=True):
+        specs = (
+            SetAncestor.objects.filter(
+                set__headers__metadata_formats__prefix=metadata_prefix
+            )
+            .distinct()
+            .order_by("spec")
+            .values_list("spec", flat=True)
+        )
+        for set_spec in [None] + list(specs):
+            keys = _page_keys(metadata_prefix, set_spec)
+            if not keys:
+                continue
+            os.makedirs(os.path.join(directory, str(len(lists))))
+            for first in range(0, len(keys), pages_per_task):
+                tasks.append(
+                    (
+                        snapshot.pk,
+                        len(lists),
+                        metadata_prefix,
+                        set_spec,
+                        first,
+                        keys[first - 1] if first > 0 else None,
+                        min(pages_per_task, len(keys) - first),
+                        keys[-1][2],
+                    )
+                )
+            lists.append(
+                {
+                    "metadata_prefix": metadata_prefix,
+                    "set_spec": set_spec,
+                    "complete_list_size": keys[-1][2],
+                    "pages": len(keys),
+                    "per_page": NUM_PER_PAGE,
+                }
+            )
+
+    if processes == 1:
+        for task in tasks:
+            _render_pages(*task)
+    else:
+        # Workers open their own connections, they must not share the ones of
+        # this process.
+        connections.close_all()
+        with worker_pool(processes) as executor:
+            for _ in executor.map(_render_pages, *zip(*tasks)):
+                pass
+
+    with open(os.path.join(directory, "index.json"), "w") as f:
+        json.dump({"created_at": snapshot.created_at.isoformat(), "lists": lists}, f)
+    Snapshot.objects.filter(pk=snapshot.pk).update(completed_at=timezone.now())
+    snapshot.refresh_from_db()
+
+    start = max(keep - 1, 0)
+    for old in Snapshot.objects.filter(pk__lt=snapshot.pk).order_by("-pk")[start:]:
+        shutil.rmtree(os.path.join(SNAPSHOT_DIR, str(old.pk)), ignore_errors=True)
+        old.delete()
+    return snapshot
+
+
+def current() -> Optional[Snapshot]:
+    """Get the newest completed snapshot, if it isn't stale."""
+    snapshot = (
+        Snapshot.objects.filter(completed_at__isnull=False).order_by("-pk").first()
+    )
+    return None if snapshot is None or snapshot.stale else snapshot
+
+
+def invalidate():
+    """Mark all snapshots stale, if SNAPSHOT_DIR is set.
+
+    Stale snapshots no longer serve first pages, resumption tokens of harvests that
+    already started on them stay valid until the snapshot is deleted.
+    """
+    if SNAPSHOT_DIR:
+        Snapshot.objects.filter(stale=False).update(stale=True)
+
+
+def find(params) -> Optional[Tuple[str, int]]:
+    """Find the page file of a ListRecords request.
+
+    First pages are served from the current snapshot, resumption tokens of a
+    snapshot as long as its files exist. Requests with other arguments aren't
+    served from snapshots.
+
+    Returns:
+     * path of the page file and number of records on it, or None
+    """
+    if params.get("verb") != "ListRecords" or any(
+        len(v) != 1 for k, v in params.lists()
+    ):
+        return None
+
+    if set(params) == {"verb", "resumptionToken"}:
+        match = TOKEN_RE.match(params["resumptionToken"])
+        if match is None:
+            return None
+        snapshot_pk, list_index, number = (int(v) for v in match.groups())
+    elif "metadataPrefix" in params and set(params) <= {
+        "verb",
+        "metadataPrefix",
+        "set",
+    }:
+        snapshot = current()
+        if snapshot is None:
+            return None
+        snapshot_pk, number = snapshot.pk, 0
+        for list_index, info in enumerate(load_index(snapshot_pk)["lists"]):
+            if info["metadata_prefix"] == params["metadataPrefix"] and info[
+                "set_spec"
+            ] == params.get("set"):
+                break
+        else:
+            return None
+    else:
+        return None
+
+    path = _page_path(snapshot_pk, list_index, number)
+    if not os.path.exists(path):
+        return None
+    info = load_index(snapshot_pk)["lists"][list_index]
+    return path, min(
+        info["per_page"], info["complete_list_size"] - number * info["per_page"]
+    )
+
+
+def serve(request, path: str) -> HttpResponse:
+    """Serve a page file, with the current time as response date.
+
+    Clients that accept gzip, if it's in COMPRESSION, get the page gzip-compressed,
+    others get it decompressed. With SNAPSHOT_SENDFILE the web server sends the
+    file to clients that accept gzip as is, its response date is the time the
+    page was rendered.
+    """
+    accepts_gzip = "gzip" in compression.accepted(request)
+    if accepts_gzip and SNAPSHOT_SENDFILE == "X-Sendfile":
+        response = HttpResponse(content_type="text/xml")
+        response.headers["X-Sendfile"] = os.path.abspath(path)
+    elif accepts_gzip and SNAPSHOT_SENDFILE == "X-Accel-Redirect":
+        response = HttpResponse(content_type="text/xml")
+        response.headers["X-Accel-Redirect"] = (
+            str(SNAPSHOT_URL).rstrip("/")
+            + "/"
+            + os.path.relpath(path, str(SNAPSHOT_DIR))
+        )
+    else:
+        response = StreamingHttpResponse(
+            _read_page(path, accepts_gzip), content_type="text/xml"
+        )
+    if accepts_gzip:
+        response.headers["Content-Encoding"] = "gzip"
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return response
+
+
+@lru_cache(maxsize=8)
+def load_index(snapshot_pk: int) -> Dict[str, Any]:
+    """Load the index of a snapshot."""
+    with open(os.path.join(str(SNAPSHOT_DIR), str(snapshot_pk), "index.json")) as f:
+        return json.load(f)
+
+
+def _read_page(path: str, compressed: bool) -> Iterator[bytes]:
+    """Read a page file, with the current time as response date.
+
+    Only the head of the page is decompressed and, if compressed, compressed again.
+    """
+    with open(path, "rb") as f:
+        data = f.read(CHUNK_SIZE)
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        head = decompressor.decompress(data)
+        f.seek(len(data) - len(decompressor.unused_data))
+
+        response_date = dateformat.format(timezone.localtime(), "c")
+        head = RESPONSE_DATE.sub(
+            f"<responseDate>{response_date}</responseDate>".encode("utf8"),
+            head,
+            count=1,
+        )
+        if compressed:
+            yield gzip.compress(head)
+            while chunk := f.read(CHUNK_SIZE):
+                yield chunk
+        else:
+            yield head
+            with gzip.GzipFile(fileobj=f, mode="rb") as body:
+                while chunk := body.read(CHUNK_SIZE):
+                    yield chunk
+
+
+def _page_path(snapshot_pk: int, list_index: int, number: int) -> str:
+    return os.path.join(
+        str(SNAPSHOT_DIR), str(snapshot_pk), str(list_index), f"{number}.xml.gz"
+    )
+
+
+def _headers(metadata_prefix: str, set_spec: Optional[str]):
+    headers = Header.objects.filter(metadata_formats__prefix=metadata_prefix)
+    if set_spec is not None:
+        headers = sets.filter_headers(headers, set_spec)
+    return headers
+
+
+def _page_keys(
+    metadata_prefix: str, set_spec: Optional[str]
+) -> List[Tuple[str, int, int]]:
+    """Get identifier, pk and end index of the last header of every page."""
+    keys = []
+    key = None
+    i = 0
+    for i, key in enumerate(
+        _headers(metadata_prefix, set_spec)
+        .order_by("identifier")
+        .values_list("identifier", "pk")
+        .iterator(chunk_size=10000),
+        start=1,
+    ):
+        if i % NUM_PER_PAGE == 0:
+            keys.append((key[0], key[1], i))
+    if key is not None and i % NUM_PER_PAGE != 0:
+        keys.append((key[0], key[1], i))
+    return keys
+
+
+def _render_pages(
+    snapshot_pk: int,
+    list_index: int,
+    metadata_prefix: str,
+    set_spec: Optional[str],
+    first: int,
+    after: Optional[Tuple[str, int, int]],
+    pages: int,
+    complete_list_size: int,
+):
+    """Render pages first to first + pages of a list, starting after the key after."""
+    objs = prefetch_records(_headers(metadata_prefix, set_spec), metadata_prefix)
+    last = (after[0], after[1]) if after else None
+    cursor = after[2] if after else 0
+    for number in range(first, first + pages):
+        paginator = KeysetPaginator(objs, NUM_PER_PAGE, cursor, last)
+        paginator.count = complete_list_size
+        page = paginator.page()
+
+        head, tail = render_to_string(
+            "django_oai_pmh/stream.xml",
+            {
+                "verb": "ListRecords",
+                "metadata_prefix": metadata_prefix,
+                "set_spec": set_spec,
+                "resumption_token": (
+                    f"snapshot-{snapshot_pk}-{list_index}-{number}" if number else None
+                ),
+            },
+        ).split("<!-- django_oai_pmh:records -->")
+        out = [head]
+        headers = list(page.object_list)
+        if RECORD_CACHE:
+            out.extend(cached_record(header, metadata_prefix) for header in headers)
+        elif SERIALIZER == "fast":
+            serializers.write_records(out, headers, metadata_prefix)
+        else:
+            template = get_template("django_oai_pmh/partials/_record.xml")
+            out.extend(
+                template.render({"header": header, "metadata_prefix": metadata_prefix})
+                for header in headers
+            )
+        if page.has_next():
+            out.append(
+                f'<resumptionToken completeListSize="{complete_list_size}" '
+                + f'cursor="{page.end_index()}">'
+                + f"snapshot-{snapshot_pk}-{list_index}-{number + 1}</resumptionToken>"
+            )
+        out.append(tail)
+
+        content = "".join(out).encode("utf8")
+        end = content.index(b"</responseDate>") + len(b"</responseDate>")
+        with open(_page_path(snapshot_pk, list_index, number), "wb") as f:
+            f.write(gzip.compress(content[:end]))
+            f.write(gzip.compress(content[end:]))
+        last = page.last_key
+        cursor = page.end_index()
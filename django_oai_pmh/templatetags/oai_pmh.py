@@ -21,10 +21,9 @@ from django.template import Library
 from django.utils import timezone
 from django.utils.safestring import mark_safe
 from html import escape
-from os import urandom
 
-from ..models import MetadataFormat, ResumptionToken, Set
-from ..settings import REPOSITORY_NAME, BASE_URL
+from .. import identify, metrics, records, serializers, timing, tokens
+from ..settings import COMPRESSION, REPOSITORY_NAME, BASE_URL
 
 
 register = Library()
@@ -33,15 +32,62 @@ register = Library()
 @register.filter
 def has_xmlrecord(header, metadata_prefix) -> bool:
     """Check whether header has XMLRecord with metadata prefix."""
+    if hasattr(header, "prefetched_xmlrecords"):
+        return _prefetched_xmlrecord(header, metadata_prefix) is not None
     return header.xmlrecords.filter(metadata_prefix__prefix=metadata_prefix).exists()
 
 
+@register.filter
+def set_specs(header):
+    """Get the specs of the sets of a header."""
+    return serializers.set_specs(header)
+
+
 @register.filter
 def xmlrecord(header, metadata_prefix):
     """Check whether header has XMLRecord with metadata prefix."""
-    return mark_safe(
-        header.xmlrecords.get(metadata_prefix__prefix=metadata_prefix).xml_metadata
+    if hasattr(header, "prefetched_xmlrecords"):
+        record = _prefetched_xmlrecord(header, metadata_prefix)
+    else:
+        record = header.xmlrecords.get(metadata_prefix__prefix=metadata_prefix)
+    return mark_safe(record.xml_metadata)
+
+
+def _prefetched_xmlrecord(header, metadata_prefix):
+    for record in header.prefetched_xmlrecords:
+        if record.metadata_prefix.prefix == metadata_prefix:
+            return record
+    return None
+
+
+@register.simple_tag
+def cached_record(header, metadata_prefix):
+    """Get the pre-rendered record XML of header in metadata prefix."""
+    return records.cached_record(header, metadata_prefix)
+
+
+@register.simple_tag
+def record(header, metadata_prefix):
+    """Serialize the record XML of header in metadata prefix."""
+    return mark_safe(serializers.record_xml(header, metadata_prefix))
+
+
+@register.simple_tag
+def record_list(headers, metadata_prefix):
+    """Serialize the record XML of all headers in metadata prefix."""
+    out: list = []
+    serializers.write_records(
+        out, headers, metadata_prefix, "\n        \n            ", "\n        \n    "
     )
+    return mark_safe("".join(out))
+
+
+@register.simple_tag
+def header_list(headers):
+    """Serialize the header XML of all headers."""
+    out: list = []
+    serializers.write_headers(out, headers, "\n        ", "\n    ")
+    return mark_safe("".join(out))
 
 
 @register.simple_tag
@@ -52,12 +98,28 @@ def admin_emails():
     )
 
 
+@register.simple_tag
+def compression():
+    """Format COMPRESSION for compression-tags."""
+    return mark_safe(
+        "\n    ".join(
+            [f"<compression>{encoding}</compression>" for encoding in COMPRESSION]
+        )
+    )
+
+
 @register.simple_tag
 def base_url():
     """Get OAI-PMH base url."""
     return mark_safe(BASE_URL)
 
 
+@register.simple_tag
+def earliest_datestamp():
+    """Get the earliest header timestamp."""
+    return identify.earliest_datestamp()
+
+
 @register.simple_tag
 def list_request_attributes(
     verb=None,
@@ -113,27 +175,22 @@ def resumption_token(
     until_timestamp=None,
 ):
     """Get resumption token."""
-    if paginator.num_pages > 0 and page.has_next():
+    if page.has_next():
         expiration_date = timezone.now() + timezone.timedelta(days=1)
-        token = "".join("%02x" % i for i in urandom(16))
-
-        metadata_format = None
-        if metadata_prefix:
-            metadata_format = MetadataFormat.objects.get(prefix=metadata_prefix)
-        set_spec = None
-        if set_spec:
-            set_spec = Set.objects.get(spec=set_spec)
-
-        ResumptionToken.objects.create(
-            token=token,
-            expiration_date=expiration_date,
-            complete_list_size=paginator.count,
-            cursor=page.end_index(),
-            metadata_prefix=metadata_format,
-            set_spec=set_spec,
-            from_timestamp=from_timestamp,
-            until_timestamp=until_timestamp,
-        )
+        with timing.phase("token"):
+            token = tokens.issue(
+                {
+                    "metadata_prefix": metadata_prefix,
+                    "set_spec": set_spec,
+                    "from_timestamp": from_timestamp,
+                    "until_timestamp": until_timestamp,
+                    "cursor": page.end_index(),
+                    "complete_list_size": paginator.count,
+                    "last_key": getattr(page, "last_key", None),
+                    "expiration_date": expiration_date,
+                }
+            )
+        metrics.resumption_token("issued")
 
         return mark_safe(
             "<resumptionToken expirationDate="
@@ -15,16 +15,68 @@
 # You should have received a copy of the GNU General Public License
 # along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
 
+import asyncio
+import gzip
+import json
+import os
 import re
 import requests
+import tarfile
+import tempfile
+import threading
+import time
+import zlib
 
+from asgiref.sync import async_to_sync, sync_to_async
 from django.contrib.auth.models import AnonymousUser
-from django.test import override_settings, RequestFactory, TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.template.loader import get_template
+from django.test import (
+    AsyncRequestFactory,
+    override_settings,
+    RequestFactory,
+    TestCase,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from io import BytesIO, StringIO
 from lxml import etree
-
-from . import views
-from .models import DCRecord, Header, MetadataFormat, Set, XMLRecord
+from unittest import mock
+
+from . import (
+    benchmark,
+    coalescing,
+    compression,
+    counts,
+    identify,
+    ingest,
+    metrics,
+    records,
+    serializers,
+    sets,
+    signals,
+    snapshots,
+    throttling,
+    timing,
+    tokens,
+    views,
+)
+from .models import (
+    CachedRecord,
+    Change,
+    DCRecord,
+    HarvestHeader,
+    Header,
+    HeaderCount,
+    MetadataFormat,
+    ResumptionToken,
+    Set,
+    XMLRecord,
+)
+from .paginator import KeysetPaginator
 
 
 OAI_DC_RECORD = """<?xml version="1.0"?>
@@ -95,6 +147,37 @@ class DCRecordTestCase(TestCase):
             dc_record.relation,
         )
 
+    @mock.patch.object(ingest, "COMPLETE_LIST_SIZE", "materialized")
+    def test_import_dc(self):
+        dc = OAI_DC_RECORD[OAI_DC_RECORD.index("\n") + 1 :]
+        records = "".join(
+            f"""<record><header><identifier>oai:{i}</identifier>
+<datestamp>2020-01-01T00:00:00Z</datestamp><setSpec>set:{i % 2}</setSpec></header>
+<metadata>{dc}</metadata></record>"""
+            for i in range(5)
+        )
+        with tempfile.NamedTemporaryFile(suffix=".xml") as f:
+            f.write(
+                (
+                    '<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/">'
+                    + f"<ListRecords>{records}</ListRecords></OAI-PMH>"
+                ).encode("utf8")
+            )
+            f.flush()
+
+            out = StringIO()
+            call_command("oai_import_dc", f.name, batch_size=2, stdout=out)
+            self.assertIn("Imported 5 records", out.getvalue())
+            call_command("oai_import_dc", f.name, stdout=out)
+
+        self.assertEqual(5, DCRecord.objects.count())
+        self.assertEqual(
+            DCRecord.objects.get(header__identifier="oai:3").creator, ["Feng, Gary"]
+        )
+        self.assertEqual(3, Header.objects.filter(sets__spec="set:0").count())
+        self.assertEqual(5, counts.get("oai_dc"))
+        self.assertEqual(2, counts.get("oai_dc", "set:1"))
+
 
 class XMLRecordTestCase(TestCase):
     def test_from_xml(self):
@@ -108,10 +191,756 @@ class XMLRecordTestCase(TestCase):
         self.assertIsNotNone(xml_record)
         self.assertIsNotNone(xml_record.pk)
 
+    @mock.patch.object(ingest, "COMPLETE_LIST_SIZE", "materialized")
+    def test_load_xml(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            os.mkdir(os.path.join(tmpdir, "records"))
+            with open(os.path.join(tmpdir, "mapping.csv"), "w") as f:
+                for i in range(6):
+                    with open(os.path.join(tmpdir, "records", f"{i}.xml"), "w") as r:
+                        r.write(OAI_DC_RECORD)
+                    f.write(f"{i}.xml,oai:{i}\n")
+            with tarfile.open(os.path.join(tmpdir, "records.tar.gz"), "w:gz") as tar:
+                tar.add(os.path.join(tmpdir, "records"), arcname="")
+
+            out = StringIO()
+            call_command(
+                "oai_load_xml",
+                os.path.join(tmpdir, "records"),
+                os.path.join(tmpdir, "mapping.csv"),
+                metadata_prefix="oai_dc",
+                batch_size=4,
+                processes=1,
+                stdout=out,
+            )
+            self.assertIn("Loaded 6 records", out.getvalue())
+            call_command(
+                "oai_load_xml",
+                os.path.join(tmpdir, "records.tar.gz"),
+                os.path.join(tmpdir, "mapping.csv"),
+                metadata_prefix="oai_dc",
+                processes=2,
+                stdout=out,
+            )
+
+        self.assertEqual(6, XMLRecord.objects.count())
+        self.assertEqual(
+            OAI_DC_RECORD[OAI_DC_RECORD.index("\n") + 1 :],
+            XMLRecord.objects.get(header__identifier="oai:5").xml_metadata,
+        )
+        self.assertEqual(6, counts.get("oai_dc"))
+
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    def test_reload_xml(self):
+        header = Header.objects.create(identifier="oai:0")
+        header.metadata_formats.add(MetadataFormat.objects.get(prefix="oai_dc"))
+        Header.objects.update(
+            timestamp=timezone.datetime(
+                2020, 1, 1, tzinfo=timezone.get_fixed_timezone(0)
+            )
+        )
+
+        def list_identifiers():
+            request = RequestFactory().get(
+                "/oai2?verb=ListIdentifiers&metadataPrefix=oai_dc"
+                + "&from=2021-01-01T00:00:00Z"
+            )
+            request.user = AnonymousUser()
+            return views.oai2(request).content.decode("utf8")
+
+        self.assertIn('code="noRecordsMatch"', list_identifiers())
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "0.xml"), "w") as f:
+                f.write(OAI_DC_RECORD)
+            with open(os.path.join(tmpdir, "mapping.csv"), "w") as f:
+                f.write("0.xml,oai:0\n")
+            call_command(
+                "oai_load_xml",
+                tmpdir,
+                os.path.join(tmpdir, "mapping.csv"),
+                metadata_prefix="oai_dc",
+                processes=1,
+                stdout=StringIO(),
+            )
+        self.assertIn("<identifier>oai:0</identifier>", list_identifiers())
+
+
+class CachedRecordTestCase(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+        oai_dc = MetadataFormat.objects.get(prefix="oai_dc")
+        self.set = Set.objects.create(spec="set:1", name="1")
+        for i in range(10):
+            header = Header.objects.create(identifier=f"oai:{i}")
+            header.metadata_formats.add(oai_dc)
+            header.sets.add(self.set)
+            DCRecord.from_xml(OAI_DC_RECORD, header)
+
+    def _list_records(self):
+        request = self.factory.get("/oai2?verb=ListRecords&metadataPrefix=oai_dc")
+        request.user = AnonymousUser()
+        response = views.oai2(request)
+        self.assertEqual(response.status_code, 200)
+        return re.sub(
+            r"\s+",
+            " ",
+            re.sub(r"<responseDate>[^<]+", "", response.content.decode("utf8")),
+        )
+
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    def test_list_records(self):
+        expected = self._list_records()
+
+        out = StringIO()
+        call_command("oai_warm_records", processes=1, stdout=out)
+        self.assertIn("Rendered 10 records of 10 headers", out.getvalue())
+        self.assertEqual(10, CachedRecord.objects.count())
+
+        with (
+            mock.patch.object(records, "RECORD_CACHE", True),
+            mock.patch.object(views, "RECORD_CACHE", True),
+        ):
+            self.assertEqual(expected, self._list_records())
+
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    def test_invalidation(self):
+        with mock.patch.object(signals, "RECORD_CACHE", True):
+            header = Header.objects.get(identifier="oai:0")
+            DCRecord.from_xml(OAI_DC_RECORD.replace("Feng, Gary", "Doe, Jane"), header)
+            self.assertIn(
+                "<dc:creator>Doe, Jane</dc:creator>",
+                CachedRecord.objects.get(header=header).xml,
+            )
+
+            other = Set.objects.create(spec="set:2", name="2")
+            header.sets.add(other)
+            self.assertIn(
+                "<setSpec>set:2</setSpec>", CachedRecord.objects.get(header=header).xml
+            )
+
+            header.metadata_formats.clear()
+            self.assertFalse(CachedRecord.objects.filter(header=header).exists())
+
+
+class HeaderCountTestCase(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        patcher = mock.patch.object(signals, "COMPLETE_LIST_SIZE", "materialized")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.oai_dc = MetadataFormat.objects.get(prefix="oai_dc")
+        self.sets = [Set.objects.create(spec=f"set:{i}", name=f"{i}") for i in range(2)]
+        for i in range(150):
+            header = Header.objects.create(identifier=f"oai:{i:03d}")
+            header.metadata_formats.add(self.oai_dc)
+            header.sets.add(self.sets[i % 2])
+
+    def assertCounts(self):
+        self.assertEqual(
+            Header.objects.filter(metadata_formats=self.oai_dc).count(),
+            counts.get("oai_dc"),
+        )
+        for s in self.sets:
+            self.assertEqual(
+                Header.objects.filter(metadata_formats=self.oai_dc, sets=s).count(),
+                counts.get("oai_dc", s.spec),
+            )
+
+    def test_counts(self):
+        self.assertCounts()
+        self.assertEqual(150, counts.get("oai_dc"))
+        self.assertEqual(75, counts.get("oai_dc", "set:0"))
+
+        header = Header.objects.get(identifier="oai:000")
+        header.sets.add(self.sets[1])
+        header.sets.remove(self.sets[0], self.sets[0])
+        header.metadata_formats.remove(self.oai_dc)
+        header.metadata_formats.remove(self.oai_dc)
+        self.assertCounts()
+
+        self.sets[1].headers.clear()
+        self.oai_dc.identifiers.add(header)
+        Header.objects.get(identifier="oai:002").delete()
+        self.assertCounts()
+
+        expected = list(
+            HeaderCount.objects.filter(count__gt=0).values_list(
+                "metadata_format", "set", "count"
+            )
+        )
+        counts.recount()
+        self.assertEqual(
+            sorted(expected, key=str),
+            sorted(
+                HeaderCount.objects.values_list("metadata_format", "set", "count"),
+                key=str,
+            ),
+        )
+
+    def test_counts_disabled(self):
+        with mock.patch.object(signals, "COMPLETE_LIST_SIZE", "count"):
+            HeaderCount.objects.all().delete()
+            header = Header.objects.get(identifier="oai:000")
+            header.sets.add(self.sets[1])
+            header.sets.remove(self.sets[0])
+            header.metadata_formats.remove(self.oai_dc)
+            self.oai_dc.identifiers.add(header)
+            self.sets[1].headers.clear()
+            Header.objects.get(identifier="oai:002").delete()
+        self.assertFalse(HeaderCount.objects.exists())
+
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    def test_list_identifiers(self):
+        with (
+            mock.patch.object(views, "COMPLETE_LIST_SIZE", "materialized"),
+            mock.patch.object(views, "NUM_PER_PAGE", 50),
+        ):
+            request = self.factory.get(
+                "/oai2?verb=ListIdentifiers&metadataPrefix=oai_dc&set=set:0"
+            )
+            request.user = AnonymousUser()
+            with CaptureQueriesContext(connection) as queries:
+                response = views.oai2(request)
+            self.assertFalse(
+                [q for q in queries.captured_queries if "COUNT(" in q["sql"]]
+            )
+            match = re.search(
+                r"<resumptionToken[^>]+completeListSize=\"(?P<size>\d+)\"[^>]*>"
+                + r"(?P<token>[^<]+)</resumptionToken>",
+                response.content.decode("utf8"),
+            )
+            self.assertEqual("75", match.group("size"))
+
+            Header.objects.create(identifier="oai:999").sets.add(self.sets[0])
+            Header.objects.get(identifier="oai:999").metadata_formats.add(self.oai_dc)
+            request = self.factory.get(
+                "/oai2?verb=ListIdentifiers&resumptionToken=" + match.group("token")
+            )
+            request.user = AnonymousUser()
+            with CaptureQueriesContext(connection) as queries:
+                response = views.oai2(request)
+            self.assertFalse(
+                [q for q in queries.captured_queries if "COUNT(" in q["sql"]]
+            )
+            self.assertIsNone(
+                re.search(
+                    r"<error code[^>]+>[^<]+</error>", response.content.decode("utf8")
+                )
+            )
+
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    def test_list_identifiers_estimate(self):
+        with (
+            mock.patch.object(views, "COMPLETE_LIST_SIZE", "materialized"),
+            mock.patch.object(views, "PAGINATION", "keyset"),
+        ):
+            request = self.factory.get(
+                "/oai2?verb=ListIdentifiers&metadataPrefix=oai_dc&from=2000-01-01"
+            )
+            request.user = AnonymousUser()
+            with CaptureQueriesContext(connection) as queries:
+                response = views.oai2(request)
+            self.assertTrue(
+                [q for q in queries.captured_queries if "EXPLAIN" in q["sql"]]
+            )
+            self.assertFalse(
+                [q for q in queries.captured_queries if "COUNT(" in q["sql"]]
+            )
+            self.assertIsNotNone(
+                re.search(
+                    r"<resumptionToken[^>]+completeListSize=\"\d+\"",
+                    response.content.decode("utf8"),
+                )
+            )
+
+
+class ChangeLogTestCase(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+        oai_dc = MetadataFormat.objects.get(prefix="oai_dc")
+        sets = [Set.objects.create(spec=f"set:{i}", name=f"{i}") for i in range(2)]
+        with mock.patch.object(signals, "CHANGE_LOG", True):
+            for i in range(20):
+                header = Header.objects.create(identifier=f"oai:{i:03d}")
+                header.metadata_formats.add(oai_dc)
+                header.sets.add(sets[i % 2])
+                DCRecord.from_xml(OAI_DC_RECORD, header)
+
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    def test_changelog(self):
+        self.assertEqual(80, Change.objects.count())
+        self.assertEqual(
+            (["oai_dc"], ["set:1"]),
+            Change.objects.filter(header__identifier="oai:001")
+            .values_list("metadata_prefixes", "set_specs")
+            .last(),
+        )
+
+        Header.objects.update(
+            timestamp=timezone.datetime(
+                2020, 1, 1, tzinfo=timezone.get_fixed_timezone(0)
+            )
+        )
+        out = StringIO()
+        call_command("oai_changelog", rebuild=True, stdout=out)
+        self.assertIn("Logged 20 changes", out.getvalue())
+        with mock.patch.object(signals, "CHANGE_LOG", True):
+            for header in Header.objects.filter(identifier__lte="oai:004"):
+                header.save()
+        call_command("oai_changelog", stdout=out)
+        self.assertIn("Deleted 5 changes", out.getvalue())
+        self.assertEqual(20, Change.objects.count())
+
+        def content(url):
+            request = self.factory.get(url)
+            request.user = AnonymousUser()
+            return re.sub(
+                r"<responseDate>[^<]+", "", views.oai2(request).content.decode("utf8")
+            )
+
+        self.assertEqual(
+            5,
+            content(
+                "/oai2?verb=ListIdentifiers&metadataPrefix=oai_dc&from=2021-01-01"
+            ).count("<identifier>"),
+        )
+        for url in [
+            "/oai2?verb=ListIdentifiers&metadataPrefix=oai_dc&from=2021-01-01",
+            "/oai2?verb=ListIdentifiers&metadataPrefix=oai_dc&from=2019-01-01",
+            "/oai2?verb=ListRecords&metadataPrefix=oai_dc&from=2021-01-01&set=set:0",
+            "/oai2?verb=ListRecords&metadataPrefix=oai_dc&from=2019-01-01"
+            + "&until=2020-06-01",
+        ]:
+            expected = content(url)
+            with mock.patch.object(views, "CHANGE_LOG", True):
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertEqual(expected, content(url))
+            self.assertTrue(
+                any(
+                    "django_oai_pmh_change" in q["sql"]
+                    for q in queries.captured_queries
+                )
+            )
+
+
+class ResumptionTokenTestCase(TestCase):
+    def test_prune_tokens(self):
+        now = timezone.now()
+        with mock.patch.object(signals, "DELETE_EXPIRED_TOKENS_ON_SAVE", False):
+            for i in range(5):
+                ResumptionToken.objects.create(
+                    token=f"expired{i}", expiration_date=now - timezone.timedelta(1)
+                )
+            ResumptionToken.objects.create(
+                token="valid", expiration_date=now + timezone.timedelta(1)
+            )
+        self.assertEqual(6, ResumptionToken.objects.count())
+
+        out = StringIO()
+        call_command("oai_prune_tokens", batch_size=2, stdout=out)
+        self.assertIn("Deleted 5 expired resumption tokens", out.getvalue())
+        self.assertEqual(
+            ["valid"], list(ResumptionToken.objects.values_list("token", flat=True))
+        )
+
+
+class BenchmarkTestCase(TestCase):
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    def test_benchmark(self):
+        benchmark.seed(headers=250, sets=5, metadata_formats=2)
+        self.assertEqual(250, counts.get("oai_dc"))
+        self.assertEqual(125, counts.get("format1"))
+        self.assertEqual(50, counts.get("oai_dc", "set:3"))
+        self.assertEqual(50, sets.filter_headers(Header.objects.all(), "set:3").count())
+
+        results = benchmark.run(repeat=2)
+        self.assertEqual(
+            [
+                "Identify",
+                "GetRecord",
+                "ListMetadataFormats",
+                "ListSets",
+                "ListIdentifiers first page",
+                "ListIdentifiers set first page",
+                "ListRecords first page",
+                "ListIdentifiers deep page",
+                "ListRecords deep page",
+            ],
+            list(results.keys()),
+        )
+        for result in results.values():
+            self.assertLessEqual(
+                result["latency_ms"]["p50"], result["latency_ms"]["max"]
+            )
+            self.assertGreater(result["bytes"], 0)
+        self.assertGreater(results["ListRecords deep page"]["queries"], 0)
+        self.assertGreater(
+            results["ListIdentifiers set first page"]["bytes"],
+            results["ListSets"]["bytes"],
+        )
+
+        results = benchmark.run_serializers(repeat=2)
+        self.assertEqual(
+            ["headers", "records oai_dc", "records format1"], list(results.keys())
+        )
+        for result in results.values():
+            self.assertGreater(result["template"], 0)
+            self.assertGreater(result["fast"], 0)
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def _request(self, url):
+        request = self.factory.get(url)
+        request.user = AnonymousUser()
+        response = views.oai2(request)
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    def test_metrics(self):
+        oai_dc = MetadataFormat.objects.get(prefix="oai_dc")
+        for i in range(150):
+            header = Header.objects.create(identifier=f"oai:{i:03d}")
+            header.metadata_formats.add(oai_dc)
+
+        with (
+            tempfile.TemporaryDirectory() as tmpdir,
+            mock.patch.object(metrics, "METRICS", True),
+            mock.patch.object(metrics, "METRICS_DIR", tmpdir),
+            mock.patch.object(metrics, "collector", metrics.Collector()),
+        ):
+            self._request("/oai2?verb=ListIdentifiers&metadataPrefix=oai_dc")
+            self._request("/oai2?verb=ListIdentifiers&resumptionToken=invalid")
+            self._request("/oai2?verb=Identify2")
+
+            # Metrics of another process.
+            other = metrics.Collector()
+            other.inc("oai_pmh_records_total", 7, verb="ListIdentifiers")
+            with open(os.path.join(tmpdir, "metrics-1-1.json"), "w") as f:
+                json.dump(other.dump(), f)
+
+            response = views.metrics_view(self.factory.get("/metrics"))
+        content = response.content.decode("utf8")
+        self.assertIn('oai_pmh_records_total{verb="ListIdentifiers"} 107', content)
+        self.assertIn('oai_pmh_resumption_tokens_total{event="issued"} 1', content)
+        self.assertIn('oai_pmh_resumption_tokens_total{event="invalid"} 1', content)
+        self.assertIn('oai_pmh_errors_total{code="badResumptionToken"} 1', content)
+        self.assertIn('oai_pmh_errors_total{code="badVerb"} 1', content)
+        self.assertIn(
+            'oai_pmh_request_duration_seconds_count{verb="ListIdentifiers"} 2',
+            content,
+        )
+        self.assertIn('oai_pmh_request_duration_seconds_count{verb=""} 1', content)
+        self.assertRegex(
+            content,
+            r'oai_pmh_request_duration_seconds_bucket\{verb="ListIdentifiers",'
+            + r'le="\+Inf"\} 2',
+        )
+
+    def test_metrics_files(self):
+        with (
+            tempfile.TemporaryDirectory() as tmpdir,
+            mock.patch.object(metrics, "METRICS_DIR", tmpdir),
+            mock.patch.object(metrics, "collector", metrics.Collector()),
+        ):
+
+            def files():
+                return sorted(
+                    name for name in os.listdir(tmpdir) if metrics.FILE_RE.match(name)
+                )
+
+            def records(name):
+                with open(os.path.join(tmpdir, name)) as f:
+                    return sum(value for _, _, value in json.load(f)["counters"])
+
+            metrics.collector.inc("oai_pmh_records_total", 1, verb="ListRecords")
+            metrics.collector.flush()
+            own = files()[0]
+            metrics.collector.inc("oai_pmh_records_total", 1, verb="ListRecords")
+            metrics.collector.flush()
+            self.assertEqual(1, records(own))
+            self.assertIsNotNone(metrics.collector.timer)
+
+            # Metrics of a process that no longer runs, pids are below 2**22.
+            dead = metrics.Collector()
+            dead.inc("oai_pmh_records_total", 5, verb="ListRecords")
+            with open(os.path.join(tmpdir, f"metrics-{2**22 + 1}-1.json"), "w") as f:
+                json.dump(dead.dump(), f)
+
+            content = metrics.exposition()
+            self.assertIn('oai_pmh_records_total{verb="ListRecords"} 7', content)
+            self.assertEqual([own], files())
+            self.assertEqual(7, records(own))
+            self.assertIsNone(metrics.collector.timer)
+            self.assertIn(
+                'oai_pmh_records_total{verb="ListRecords"} 7', metrics.exposition()
+            )
+
+
+class ThrottlingTestCase(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        cache.clear()
+
+    def _request(self, url, user_agent="harvester"):
+        request = self.factory.get(url, HTTP_USER_AGENT=user_agent)
+        request.user = AnonymousUser()
+        return views.oai2(request)
+
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    def test_rate_limit(self):
+        with (
+            mock.patch.object(throttling, "RATE_LIMIT", 0.5),
+            mock.patch.object(throttling, "RATE_LIMIT_BURST", 3),
+            mock.patch.object(throttling.time, "time", return_value=1000.0) as now,
+        ):
+            for i in range(3):
+                self.assertEqual(self._request("/oai2?verb=Identify").status_code, 200)
+            with self.assertNumQueries(0):
+                response = self._request("/oai2?verb=Identify")
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.headers["Retry-After"], "2")
+            self.assertEqual(
+                self._request("/oai2?verb=Identify", "other").status_code, 200
+            )
+
+            self.assertEqual(throttling.take(None, 0.0, 2, 1), (0.5, 0))
+            self.assertEqual(throttling.take(0.5, 0.0, 2, 1), (None, 0.5))
+            self.assertEqual(throttling.take(0.5, 0.0, 2, 2), (1.0, 0))
+
+            now.return_value = 1002.0
+            self.assertEqual(self._request("/oai2?verb=Identify").status_code, 200)
+            self.assertEqual(self._request("/oai2?verb=Identify").status_code, 503)
+
+            request = self.factory.get("/oai2?verb=Identify", HTTP_USER_AGENT="other")
+            request.user = AnonymousUser()
+            for status_code in [200, 200, 200, 503]:
+                response = async_to_sync(views.aoai2)(request)
+                self.assertEqual(response.status_code, status_code)
+
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    def test_max_concurrent_requests(self):
+        header = Header.objects.create(identifier="oai:1")
+        header.metadata_formats.add(MetadataFormat.objects.get(prefix="oai_dc"))
+
+        with (
+            mock.patch.object(throttling, "MAX_CONCURRENT_REQUESTS", 1),
+            mock.patch.object(views, "STREAMING", True),
+        ):
+            response = self._request("/oai2?verb=ListIdentifiers&metadataPrefix=oai_dc")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(cache.get(throttling.CONCURRENCY_KEY), 1)
+
+            with self.assertNumQueries(0):
+                busy = self._request("/oai2?verb=Identify")
+            self.assertEqual(busy.status_code, 503)
+            self.assertEqual(busy.headers["Retry-After"], "1")
+            self.assertEqual(cache.get(throttling.CONCURRENCY_KEY), 1)
+
+            self.assertIn(b"oai:1", b"".join(response.streaming_content))
+            self.assertEqual(cache.get(throttling.CONCURRENCY_KEY), 0)
+            self.assertEqual(self._request("/oai2?verb=Identify").status_code, 200)
+            self.assertEqual(cache.get(throttling.CONCURRENCY_KEY), 0)
+
+            # The count was reset while a request was running.
+            cache.delete(throttling.CONCURRENCY_KEY)
+            throttling.release()
+            self.assertEqual(cache.get(throttling.CONCURRENCY_KEY), None)
+            cache.set(throttling.CONCURRENCY_KEY, 0)
+            throttling.release()
+            self.assertEqual(cache.get(throttling.CONCURRENCY_KEY), 0)
+
+
+class CoalescingTestCase(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.calls = []
+        self.running = threading.Event()
+        cache.clear()
+
+    def _view(self, request):
+        self.calls.append(request.GET.urlencode())
+        number = len(self.calls)
+        metrics.set_request(request.GET.get("verb"), 0, [])
+        self.running.set()
+        time.sleep(0.2)
+        if "gzip" in compression.accepted(request):
+            response = HttpResponse(
+                gzip.compress(f"<OAI-PMH>{number}</OAI-PMH>".encode())
+            )
+            response.headers["Content-Encoding"] = "gzip"
+            return response
+        return HttpResponse(f"<OAI-PMH>{number}</OAI-PMH>")
+
+    def _run(self, view, requests):
+        responses = {}
+
+        def run(i, request):
+            responses[i] = view(request)
+
+        threads = []
+        for i, request in enumerate(requests):
+            threads.append(threading.Thread(target=run, args=(i, request)))
+            threads[-1].start()
+            if i == 0:
+                self.running.wait(5)
+        for thread in threads:
+            thread.join()
+        return [responses[i] for i in range(len(requests))]
+
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    def test_coalescing(self):
+        view = coalescing.coalesced(self._view)
+        with mock.patch.object(coalescing, "COALESCING", True):
+            responses = self._run(
+                view,
+                [
+                    self.factory.get("/oai2?verb=ListRecords&metadataPrefix=oai_dc"),
+                    self.factory.get("/oai2?metadataPrefix=oai_dc&verb=ListRecords"),
+                    self.factory.post(
+                        "/oai2", {"verb": "ListRecords", "metadataPrefix": "oai_dc"}
+                    ),
+                    self.factory.get("/oai2?verb=ListSets"),
+                    self.factory.get(
+                        "/oai2?verb=ListRecords&metadataPrefix=oai_dc",
+                        HTTP_IF_NONE_MATCH='"etag"',
+                    ),
+                ],
+            )
+            self.assertEqual(len(self.calls), 3)
+            self.assertEqual(
+                [r.content for r in responses[:3]], [b"<OAI-PMH>1</OAI-PMH>"] * 3
+            )
+            self.assertEqual(responses[0]["Content-Type"], responses[1]["Content-Type"])
+
+            # The async view.
+            async def aview(request):
+                self.calls.append(request.GET.urlencode())
+                await asyncio.sleep(0.1)
+                return HttpResponse(f"<OAI-PMH>{len(self.calls)}</OAI-PMH>")
+
+            async def gather():
+                request = self.factory.get("/oai2?verb=Identify")
+                return await asyncio.gather(
+                    *[coalescing.coalesced(aview)(request) for i in range(3)]
+                )
+
+            self.calls = []
+            responses = async_to_sync(gather)()
+            self.assertEqual(len(self.calls), 1)
+            self.assertEqual(
+                [r.content for r in responses], [b"<OAI-PMH>1</OAI-PMH>"] * 3
+            )
+
+            # The view itself.
+            request = self.factory.get("/oai2?verb=Identify")
+            request.user = AnonymousUser()
+            self.assertEqual(views.oai2(request).status_code, 200)
+
+    def test_coalescing_encoding(self):
+        view = metrics.instrument(coalescing.coalesced(self._view))
+        with (
+            mock.patch.object(coalescing, "COALESCING", True),
+            mock.patch.object(metrics, "METRICS", True),
+            mock.patch.object(metrics, "METRICS_DIR", None),
+            mock.patch.object(metrics, "collector", metrics.Collector()),
+        ):
+            responses = self._run(
+                view,
+                [
+                    self.factory.get(
+                        "/oai2?verb=ListSets", HTTP_ACCEPT_ENCODING="gzip"
+                    ),
+                    self.factory.get("/oai2?verb=ListSets"),
+                    self.factory.get(
+                        "/oai2?verb=ListSets", HTTP_ACCEPT_ENCODING="gzip"
+                    ),
+                ],
+            )
+            content = metrics.exposition()
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(responses[0]["Content-Encoding"], "gzip")
+        self.assertEqual(responses[2]["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(responses[2].content), b"<OAI-PMH>1</OAI-PMH>")
+        self.assertNotIn("Content-Encoding", responses[1])
+        self.assertEqual(responses[1].content, b"<OAI-PMH>2</OAI-PMH>")
+        self.assertIn(
+            'oai_pmh_request_duration_seconds_count{verb="ListSets"} 3', content
+        )
+
+    def test_coalescing_cache(self):
+        view = coalescing.coalesced(self._view)
+        request = self.factory.get("/oai2?verb=ListSets")
+        lock_key = coalescing.LOCK_KEY.format(key=coalescing.request_key(request))
+        with (
+            mock.patch.object(coalescing, "COALESCING", True),
+            mock.patch.object(coalescing, "COALESCING_CACHE", True),
+        ):
+            # Another process answers the request.
+            cache.set(lock_key, "other")
+            thread = threading.Thread(target=lambda: setattr(self, "r", view(request)))
+            thread.start()
+            time.sleep(0.1)
+            cache.set(
+                coalescing.RESPONSE_KEY.format(flight="other"),
+                (
+                    b"<OAI-PMH>other</OAI-PMH>",
+                    200,
+                    [("Content-Type", "text/xml")],
+                    None,
+                ),
+            )
+            cache.delete(lock_key)
+            thread.join()
+            self.assertEqual(self.calls, [])
+            self.assertEqual(self.r.content, b"<OAI-PMH>other</OAI-PMH>")
+            self.assertEqual(self.r["Content-Type"], "text/xml")
+
+            # The other process failed.
+            cache.set(lock_key, "failed")
+            thread = threading.Thread(target=lambda: setattr(self, "r", view(request)))
+            thread.start()
+            time.sleep(0.1)
+            cache.delete(lock_key)
+            thread.join()
+            self.assertEqual(self.r.content, b"<OAI-PMH>1</OAI-PMH>")
+
+            # This process answers the request.
+            self.assertEqual(view(request).content, b"<OAI-PMH>2</OAI-PMH>")
+            self.assertIsNone(cache.get(lock_key))
+
 
 class IdentifyTestCase(TestCase):
     def setUp(self):
         self.factory = RequestFactory()
+        identify.clear_earliest_datestamp()
 
     @override_settings(
         ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
@@ -133,6 +962,95 @@ class IdentifyTestCase(TestCase):
         doc = etree.parse(BytesIO(response.content))
         self.assertTrue(xmlschema.validate(doc))
 
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    def test_identify_earliest_datestamp(self):
+        header = Header.objects.create(identifier="oai:1")
+        Header.objects.filter(pk=header.pk).update(
+            timestamp=timezone.datetime(
+                2020, 5, 17, 8, 30, tzinfo=timezone.get_fixed_timezone(0)
+            )
+        )
+        Header.objects.create(identifier="oai:2")
+
+        request = self.factory.get("/oai2?verb=Identify")
+        request.user = AnonymousUser()
+        with self.assertNumQueries(1):
+            response = views.oai2(request)
+        self.assertIn(
+            "<earliestDatestamp>2020-05-17T08:30:00Z</earliestDatestamp>",
+            response.content.decode("utf8"),
+        )
+        with self.assertNumQueries(0):
+            response = views.oai2(request)
+
+        header.refresh_from_db()
+        header.save()
+        response = views.oai2(request)
+        self.assertNotIn("2020-05-17", response.content.decode("utf8"))
+
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    def test_identify_empty(self):
+        request = self.factory.get("/oai2?verb=Identify")
+        request.user = AnonymousUser()
+        etag = views.oai2(request)["ETag"]
+        with self.assertNumQueries(0):
+            self.assertEqual(etag, views.oai2(request)["ETag"])
+
+        request = self.factory.get("/oai2?verb=Identify", HTTP_IF_NONE_MATCH=etag)
+        request.user = AnonymousUser()
+        self.assertEqual(views.oai2(request).status_code, 304)
+
+        Header.objects.create(identifier="oai:1")
+        self.assertEqual(views.oai2(request).status_code, 200)
+
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    @mock.patch.object(compression, "COMPRESSION_CACHE_TIMEOUT", 60)
+    def test_identify_compression(self):
+        cache.clear()
+        Header.objects.create(identifier="oai:1")
+        request = self.factory.get("/oai2?verb=Identify")
+        request.user = AnonymousUser()
+        content = views.oai2(request).content.decode("utf8")
+        self.assertIn("<compression>gzip</compression>", content)
+        self.assertIn("<compression>deflate</compression>", content)
+
+        def date(content):
+            return re.sub(r"<responseDate>[^<]+", "", content)
+
+        request = self.factory.get("/oai2?verb=Identify", HTTP_ACCEPT_ENCODING="gzip")
+        request.user = AnonymousUser()
+        response = views.oai2(request)
+        self.assertEqual("gzip", response.headers["Content-Encoding"])
+        self.assertEqual("Accept-Encoding", response.headers["Vary"])
+        compressed = response.content
+        self.assertEqual(date(content), date(gzip.decompress(compressed).decode()))
+        with mock.patch.object(views, "render") as render:
+            self.assertEqual(compressed, views.oai2(request).content)
+            render.assert_not_called()
+
+        request = self.factory.get(
+            "/oai2?verb=Identify", HTTP_ACCEPT_ENCODING="gzip;q=0.5, deflate"
+        )
+        request.user = AnonymousUser()
+        response = views.oai2(request)
+        self.assertEqual("deflate", response.headers["Content-Encoding"])
+        self.assertEqual(
+            date(content), date(zlib.decompress(response.content).decode())
+        )
+
+        request = self.factory.get(
+            "/oai2?verb=Identify", HTTP_ACCEPT_ENCODING="br, *;q=0"
+        )
+        request.user = AnonymousUser()
+        response = views.oai2(request)
+        self.assertNotIn("Content-Encoding", response.headers)
+
     @override_settings(
         ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
     )
@@ -179,6 +1097,40 @@ class ListMetadataFormatsTestCase(TestCase):
         doc = etree.parse(BytesIO(response.content))
         self.assertTrue(xmlschema.validate(doc))
 
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    def test_list_identifier_etag(self):
+        oai_dc = MetadataFormat.objects.get(prefix="oai_dc")
+        other = MetadataFormat.objects.create(
+            prefix="other",
+            schema="http://example.com/other.xsd",
+            namespace="http://example.com/other/",
+        )
+        MetadataFormat.objects.filter(pk=other.pk).update(updated_at=oai_dc.updated_at)
+        header = Header.objects.create(identifier="oai:1")
+        header.metadata_formats.add(oai_dc)
+
+        request = self.factory.get("/oai2?verb=ListMetadataFormats&identifier=oai:1")
+        request.user = AnonymousUser()
+        response = views.oai2(request)
+        self.assertNotIn("Last-Modified", response)
+
+        request = self.factory.get(
+            "/oai2?verb=ListMetadataFormats&identifier=oai:1",
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        request.user = AnonymousUser()
+        self.assertEqual(views.oai2(request).status_code, 304)
+
+        header.metadata_formats.remove(oai_dc)
+        header.metadata_formats.add(other)
+        response = views.oai2(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            "<metadataPrefix>other</metadataPrefix>", response.content.decode()
+        )
+
     @override_settings(
         ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
     )
@@ -229,6 +1181,97 @@ class ListIdentifiersTestCase(TestCase):
         doc = etree.parse(BytesIO(response.content))
         self.assertTrue(xmlschema.validate(doc))
 
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    async def test_list_harvest_table(self):
+        def setup():
+            oai_dc = MetadataFormat.objects.get(prefix="oai_dc")
+            sets = [
+                Set.objects.create(spec=f"set:{i}", name=f"{2 - i}") for i in range(3)
+            ]
+            for i in range(150):
+                header = Header.objects.create(
+                    identifier=f"oai:{i:03d}", deleted=i % 10 == 0
+                )
+                header.metadata_formats.add(oai_dc)
+                header.sets.add(sets[i % 3], sets[(i + 1) % 3])
+            out = StringIO()
+            call_command("oai_rebuild_harvest", stdout=out)
+            return out.getvalue()
+
+        self.assertIn("Wrote 150 harvest headers", await sync_to_async(setup)())
+
+        async def harvest(view, url):
+            pages = []
+            while url:
+                request = self.factory.get(url)
+                request.user = AnonymousUser()
+                if view is views.oai2:
+                    response = await sync_to_async(view)(request)
+                else:
+                    response = await view(request)
+                pages.append(
+                    re.sub(r"<responseDate>[^<]+", "", response.content.decode("utf8"))
+                )
+                match = re.search(r">(?P<token>[^<]+)</resumptionToken>", pages[-1])
+                url = (
+                    f"/oai2?verb=ListIdentifiers&resumptionToken={match['token']}"
+                    if match
+                    else None
+                )
+                pages[-1] = re.sub(
+                    r'<resumptionToken[^>]+>[^<]+<|resumptionToken="[^"]+"',
+                    "",
+                    pages[-1],
+                )
+            return pages
+
+        for url in [
+            "/oai2?verb=ListIdentifiers&metadataPrefix=oai_dc",
+            "/oai2?verb=ListIdentifiers&metadataPrefix=oai_dc&set=set:1",
+            "/oai2?verb=ListIdentifiers&metadataPrefix=oai_dc&from=2000-01-01",
+            "/oai2?verb=ListIdentifiers&metadataPrefix=oai_dc&set=set:3",
+        ]:
+            expected = await harvest(views.oai2, url)
+            for pagination in ["offset", "keyset"]:
+                with (
+                    mock.patch.object(views, "HARVEST_TABLE", True),
+                    mock.patch.object(views, "PAGINATION", pagination),
+                ):
+                    self.assertEqual(expected, await harvest(views.oai2, url))
+                    self.assertEqual(expected, await harvest(views.aoai2, url))
+
+        def update():
+            set_1 = Set.objects.get(spec="set:1")
+            set_1.name = "z"
+            set_1.save()
+            Header.objects.get(identifier="oai:001").sets.remove(set_1)
+            Set.objects.get(spec="set:0").headers.clear()
+            Set.objects.get(spec="set:2").delete()
+            Header.objects.get(identifier="oai:002").save()
+            MetadataFormat.objects.create(
+                prefix="marc",
+                schema="http://example.com",
+                namespace="http://example.com",
+            ).identifiers.add(*Header.objects.filter(identifier__lte="oai:009"))
+
+        def rows():
+            return list(
+                HarvestHeader.objects.order_by(
+                    "metadata_prefix", "identifier"
+                ).values_list(
+                    "metadata_prefix", "identifier", "timestamp", "deleted", "set_specs"
+                )
+            )
+
+        with mock.patch.object(signals, "HARVEST_TABLE", True):
+            await sync_to_async(update)()
+        maintained = await sync_to_async(rows)()
+        self.assertEqual(160, len(maintained))
+        await sync_to_async(call_command)("oai_rebuild_harvest", stdout=StringIO())
+        self.assertEqual(await sync_to_async(rows)(), maintained)
+
     @override_settings(
         ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
     )
@@ -320,6 +1363,486 @@ class ListIdentifiersTestCase(TestCase):
         doc = etree.parse(BytesIO(response.content))
         self.assertTrue(xmlschema.validate(doc))
 
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    def test_list_with_keyset_pagination(self):
+        oai_dc = MetadataFormat.objects.get(prefix="oai_dc")
+        for i in range(250):
+            header = Header.objects.create(identifier=f"oai:{i:03d}")
+            header.metadata_formats.add(oai_dc)
+
+        identifiers = []
+        url = "/oai2?verb=ListIdentifiers&metadataPrefix=oai_dc"
+        with mock.patch.object(views, "PAGINATION", "keyset"):
+            while url:
+                request = self.factory.get(url)
+                request.user = AnonymousUser()
+                response = views.oai2(request)
+                self.assertEqual(response.status_code, 200)
+                content = response.content.decode("utf8")
+                self.assertIsNone(re.search(r"<error code[^>]+>[^<]+</error>", content))
+                identifiers += re.findall(r"<identifier>([^<]+)</identifier>", content)
+
+                url = None
+                match = re.search(
+                    r"<resumptionToken[^>]+>(?P<token>[^<]+)</resumptionToken>",
+                    content,
+                )
+                if match:
+                    url = "/oai2?verb=ListIdentifiers&resumptionToken=" + match.group(
+                        "token"
+                    )
+        self.assertEqual([f"oai:{i:03d}" for i in range(250)], identifiers)
+
+    def test_keyset_paginator_non_unique_ordering(self):
+        for i in range(10):
+            Header.objects.create(identifier=f"oai:{i}", deleted=i % 2 == 0)
+
+        pks = []
+        paginator = KeysetPaginator(Header.objects.all(), 3, ordering="deleted")
+        page = paginator.page()
+        pks += [header.pk for header in page]
+        while page.has_next():
+            paginator = KeysetPaginator(
+                Header.objects.all(),
+                3,
+                page.end_index(),
+                page.last_key,
+                ordering="deleted",
+            )
+            page = paginator.page()
+            pks += [header.pk for header in page]
+        self.assertEqual(
+            list(Header.objects.order_by("deleted", "pk").values_list("pk", flat=True)),
+            pks,
+        )
+
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    def test_list_with_timing(self):
+        oai_dc = MetadataFormat.objects.get(prefix="oai_dc")
+        for i in range(150):
+            header = Header.objects.create(identifier=f"oai:{i:03d}")
+            header.metadata_formats.add(oai_dc)
+
+        callback = mock.Mock()
+        request = self.factory.get("/oai2?verb=ListIdentifiers&metadataPrefix=oai_dc")
+        request.user = AnonymousUser()
+        with (
+            mock.patch.object(timing, "TIMING", True),
+            mock.patch.object(timing, "TIMING_CALLBACK", callback),
+            CaptureQueriesContext(connection) as queries,
+        ):
+            response = views.oai2(request)
+        self.assertEqual(response.status_code, 200)
+
+        metrics = dict(
+            m.split(";", 1) for m in response.headers["Server-Timing"].split(", ")
+        )
+        self.assertEqual(
+            [
+                "parse",
+                "build",
+                "count",
+                "fetch",
+                "render",
+                "token",
+                "db",
+                "total",
+            ],
+            list(metrics.keys()),
+        )
+        self.assertIn(f'desc="{len(queries)} queries"', metrics["db"])
+        callback.assert_called_once()
+        timer = callback.call_args.args[2]
+        self.assertEqual(len(queries), timer.queries)
+        self.assertGreater(timer.as_dict()["token"], 0)
+
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    def test_list_with_signed_resumption_token(self):
+        oai_dc = MetadataFormat.objects.get(prefix="oai_dc")
+        for i in range(150):
+            header = Header.objects.create(identifier=f"oai:{i:03d}")
+            header.metadata_formats.add(oai_dc)
+
+        with mock.patch.object(tokens, "RESUMPTION_TOKEN_BACKEND", "signed"):
+            request = self.factory.get(
+                "/oai2?verb=ListIdentifiers&metadataPrefix=oai_dc"
+            )
+            request.user = AnonymousUser()
+            response = views.oai2(request)
+            self.assertEqual(response.status_code, 200)
+            match = re.search(
+                r"<resumptionToken[^>]+>(?P<token>[^<]+)</resumptionToken>",
+                response.content.decode("utf8"),
+            )
+            self.assertIsNotNone(match)
+            token = match.group("token")
+            self.assertEqual(0, ResumptionToken.objects.count())
+
+            request = self.factory.get(
+                f"/oai2?verb=ListIdentifiers&resumptionToken={token}"
+            )
+            request.user = AnonymousUser()
+            response = views.oai2(request)
+            self.assertEqual(response.status_code, 200)
+            content = response.content.decode("utf8")
+            self.assertIsNone(re.search(r"<error code[^>]+>[^<]+</error>", content))
+            self.assertIn("<identifier>oai:100</identifier>", content)
+            self.assertIn("<identifier>oai:149</identifier>", content)
+
+            request = self.factory.get(
+                f"/oai2?verb=ListIdentifiers&resumptionToken={token}x"
+            )
+            request.user = AnonymousUser()
+            response = views.oai2(request)
+            self.assertIsNotNone(
+                re.search(
+                    r"<error code=\"badResumptionToken\">[^<]+</error>",
+                    response.content.decode("utf8"),
+                )
+            )
+
+
+class ListRecordsTestCase(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+        oai_dc = MetadataFormat.objects.get(prefix="oai_dc")
+        sets = [Set.objects.create(spec=f"set:{i}", name=f"{i}") for i in range(3)]
+        for i in range(150):
+            header = Header.objects.create(identifier=f"oai:{i:03d}")
+            header.metadata_formats.add(oai_dc)
+            header.sets.add(sets[i % 3], sets[(i + 1) % 3])
+            if i % 2 == 0:
+                DCRecord.from_xml(OAI_DC_RECORD, header)
+            else:
+                XMLRecord.objects.create(
+                    xml_metadata=OAI_DC_RECORD, header=header, metadata_prefix=oai_dc
+                )
+
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    def test_list(self):
+        request = self.factory.get("/oai2?verb=ListRecords&metadataPrefix=oai_dc")
+        request.user = AnonymousUser()
+        response = views.oai2(request)
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode("utf8")
+        self.assertIsNone(re.search(r"<error code[^>]+>[^<]+</error>", content))
+        self.assertEqual(100, content.count("<record>"))
+        self.assertEqual(200, content.count("<setSpec>"))
+        self.assertEqual(100, content.count("<oai_dc:dc"))
+        self.assertEqual(100, content.count("<dc:creator>Feng, Gary</dc:creator>"))
+
+        r = requests.get("http://www.openarchives.org/OAI/2.0/OAI-PMH.xsd")
+        self.assertEqual(r.status_code, 200)
+        xmlschema = etree.XMLSchema(etree.parse(StringIO(r.text)))
+        doc = etree.parse(BytesIO(response.content))
+        self.assertTrue(xmlschema.validate(doc))
+
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    def test_list_streaming(self):
+        request = self.factory.get("/oai2?verb=ListRecords&metadataPrefix=oai_dc")
+        request.user = AnonymousUser()
+        response = views.oai2(request)
+        expected = etree.fromstring(response.content)
+
+        with mock.patch.object(views, "STREAMING", True):
+            response = views.oai2(request)
+        self.assertTrue(response.streaming)
+        content = b"".join(response.streaming_content)
+        doc = etree.fromstring(content)
+        ns = {"oai": "http://www.openarchives.org/OAI/2.0/"}
+        self.assertEqual(
+            [
+                etree.tostring(e)
+                for e in expected.iterfind(".//oai:identifier", namespaces=ns)
+            ],
+            [
+                etree.tostring(e)
+                for e in doc.iterfind(".//oai:identifier", namespaces=ns)
+            ],
+        )
+        self.assertEqual(100, len(doc.findall(".//oai:record", namespaces=ns)))
+
+        request = self.factory.get(
+            "/oai2?verb=ListRecords&metadataPrefix=oai_dc",
+            HTTP_ACCEPT_ENCODING="gzip",
+        )
+        request.user = AnonymousUser()
+        with mock.patch.object(views, "STREAMING", True):
+            response = views.oai2(request)
+        self.assertTrue(response.streaming)
+        self.assertEqual("gzip", response.headers["Content-Encoding"])
+        doc = etree.fromstring(gzip.decompress(b"".join(response.streaming_content)))
+        self.assertEqual(100, len(doc.findall(".//oai:record", namespaces=ns)))
+        self.assertIsNotNone(doc.find(".//oai:resumptionToken", namespaces=ns))
+
+        r = requests.get("http://www.openarchives.org/OAI/2.0/OAI-PMH.xsd")
+        self.assertEqual(r.status_code, 200)
+        xmlschema = etree.XMLSchema(etree.parse(StringIO(r.text)))
+        self.assertTrue(xmlschema.validate(etree.parse(BytesIO(content))))
+
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    def test_list_fast_serializer(self):
+        Header.objects.filter(identifier="oai:004").update(deleted=True)
+        DCRecord.objects.filter(header__identifier="oai:002").update(
+            title=['<Tom & Jerry\'s "Cat">'], subject=None, rights=[]
+        )
+        DCRecord.objects.filter(header__identifier="oai:006").delete()
+        Set.objects.filter(spec="set:1").update(spec="set:<1&>")
+
+        def content(url):
+            request = self.factory.get(url)
+            request.user = AnonymousUser()
+            response = views.oai2(request)
+            self.assertEqual(response.status_code, 200)
+            if response.streaming:
+                content = b"".join(response.streaming_content).decode("utf8")
+            else:
+                content = response.content.decode("utf8")
+            self.assertIsNone(re.search(r"<error code[^>]+>[^<]+</error>", content))
+            return re.sub(r"<(responseDate|resumptionToken).+", "", content)
+
+        for url in [
+            "/oai2?verb=ListRecords&metadataPrefix=oai_dc",
+            "/oai2?verb=ListIdentifiers&metadataPrefix=oai_dc",
+            "/oai2?verb=GetRecord&identifier=oai:002&metadataPrefix=oai_dc",
+            "/oai2?verb=GetRecord&identifier=oai:003&metadataPrefix=oai_dc",
+        ]:
+            for streaming in [False, True]:
+                with mock.patch.object(views, "STREAMING", streaming):
+                    expected = content(url)
+                    with (
+                        mock.patch.object(records, "SERIALIZER", "fast"),
+                        mock.patch.object(views, "SERIALIZER", "fast"),
+                    ):
+                        self.assertEqual(expected, content(url))
+
+        template = get_template("django_oai_pmh/partials/_record.xml")
+        for header in Header.objects.filter(identifier__lte="oai:010"):
+            self.assertEqual(
+                template.render({"header": header, "metadata_prefix": "oai_dc"}),
+                serializers.record_xml(header, "oai_dc"),
+            )
+
+        request = self.factory.get("/oai2?verb=ListRecords&metadataPrefix=oai_dc")
+        request.user = AnonymousUser()
+        with (
+            mock.patch.object(records, "SERIALIZER", "fast"),
+            mock.patch.object(views, "SERIALIZER", "fast"),
+        ):
+            with self.assertNumQueries(10):
+                response = views.oai2(request)
+        self.assertEqual(100, response.content.decode("utf8").count("<record>"))
+
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    async def test_list_async(self):
+        factory = AsyncRequestFactory()
+
+        async def content(view, url):
+            request = factory.get(url)
+            request.user = AnonymousUser()
+            if view is views.oai2:
+                response = await sync_to_async(view)(request)
+            else:
+                response = await view(request)
+            self.assertEqual(response.status_code, 200)
+            return re.sub(
+                r"<(responseDate|resumptionToken).+", "", response.content.decode()
+            )
+
+        request = factory.get("/oai2?verb=ListRecords&metadataPrefix=oai_dc")
+        request.user = AnonymousUser()
+        response = await views.aoai2(request)
+        token = re.search(
+            r"<resumptionToken[^>]+>(?P<token>[^<]+)</resumptionToken>",
+            response.content.decode(),
+        ).group("token")
+        for pagination in ["offset", "keyset"]:
+            with mock.patch.object(views, "PAGINATION", pagination):
+                for url in [
+                    "/oai2?verb=ListRecords&metadataPrefix=oai_dc",
+                    "/oai2?verb=ListRecords&metadataPrefix=oai_dc&set=set:1",
+                    "/oai2?verb=ListRecords&metadataPrefix=oai_dc&from=2000-01-01",
+                    f"/oai2?verb=ListRecords&resumptionToken={token}",
+                    "/oai2?verb=ListRecords&resumptionToken=invalid",
+                    "/oai2?verb=ListRecords&metadataPrefix=marc",
+                    "/oai2?verb=ListIdentifiers&metadataPrefix=oai_dc",
+                    "/oai2?verb=ListIdentifiers&metadataPrefix=oai_dc&until=2000-01-01",
+                    "/oai2?verb=GetRecord&identifier=oai:002&metadataPrefix=oai_dc",
+                    "/oai2?verb=GetRecord&identifier=oai:003&metadataPrefix=oai_dc",
+                    "/oai2?verb=GetRecord&identifier=oai:xyz&metadataPrefix=oai_dc",
+                    "/oai2?verb=Identify",
+                ]:
+                    self.assertEqual(
+                        await content(views.oai2, url),
+                        await content(views.aoai2, url),
+                    )
+
+        with mock.patch.object(views, "_oai2", wraps=views._oai2) as sync_view:
+            await content(views.aoai2, "/oai2?verb=ListRecords&metadataPrefix=oai_dc")
+            await content(
+                views.aoai2, f"/oai2?verb=ListRecords&resumptionToken={token}"
+            )
+            sync_view.assert_not_called()
+            await content(views.aoai2, "/oai2?verb=Identify")
+            sync_view.assert_called_once()
+
+        request = factory.get("/oai2?verb=ListRecords&metadataPrefix=oai_dc")
+        request.user = AnonymousUser()
+        with mock.patch.object(timing, "TIMING", True):
+            response = await views.aoai2(request)
+        self.assertRegex(response.headers["Server-Timing"], r'desc="[1-9]\d* queries"')
+
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    def test_list_snapshot(self):
+        def harvest(url, **headers):
+            pages = []
+            while url:
+                request = self.factory.get(url, **headers)
+                request.user = AnonymousUser()
+                response = views.oai2(request)
+                self.assertEqual(response.status_code, 200)
+                if response.streaming:
+                    content = b"".join(response.streaming_content)
+                else:
+                    content = response.content
+                pages.append((response, content.decode("utf8")))
+                match = re.search(
+                    r"<resumptionToken[^>]*>(?P<token>[^<]+)</resumptionToken>",
+                    pages[-1][1],
+                )
+                url = (
+                    f"/oai2?verb=ListRecords&resumptionToken={match.group('token')}"
+                    if match
+                    else None
+                )
+            return pages
+
+        def records(pages):
+            return [
+                r
+                for _, content in pages
+                for r in re.findall(r"<record>.*?</record>", content, re.DOTALL)
+            ]
+
+        url = "/oai2?verb=ListRecords&metadataPrefix=oai_dc"
+        expected = records(harvest(url))
+        expected_set = records(harvest(f"{url}&set=set:1"))
+
+        with tempfile.TemporaryDirectory() as snapshot_dir:
+            with (
+                mock.patch.object(snapshots, "SNAPSHOT_DIR", snapshot_dir),
+                mock.patch.object(views, "SNAPSHOT_DIR", snapshot_dir),
+            ):
+                out = StringIO()
+                call_command("oai_snapshot", processes=1, stdout=out)
+                self.assertIn("with 5 pages of 4 lists", out.getvalue())
+
+                pages = harvest(url)
+                self.assertEqual(2, len(pages))
+                self.assertTrue(all(r.streaming for r, _ in pages))
+                self.assertRegex(
+                    pages[0][1],
+                    r'completeListSize="150" cursor="100">snapshot-\d+-0-1<',
+                )
+                self.assertEqual(expected, records(pages))
+                self.assertEqual(expected_set, records(harvest(f"{url}&set=set:1")))
+
+                token = re.search(r">(snapshot-[^<]+)<", pages[0][1]).group(1)
+                request = self.factory.get(
+                    f"/oai2?verb=ListRecords&resumptionToken={token}",
+                    HTTP_ACCEPT_ENCODING="gzip, deflate",
+                )
+                request.user = AnonymousUser()
+                response_date = timezone.datetime(
+                    2030, 1, 2, 3, 4, 5, tzinfo=timezone.get_fixed_timezone(0)
+                )
+                with (
+                    self.assertNumQueries(0),
+                    mock.patch.object(
+                        snapshots.timezone, "localtime", return_value=response_date
+                    ),
+                ):
+                    response = views.oai2(request)
+                    body = b"".join(response.streaming_content)
+                    content = gzip.decompress(body).decode()
+                self.assertEqual("gzip", response.headers["Content-Encoding"])
+
+                def tail(data):
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                    decompressor.decompress(data)
+                    return decompressor.unused_data
+
+                path, _ = snapshots.find(request.GET)
+                with open(path, "rb") as f:
+                    self.assertEqual(tail(f.read()), tail(body))
+                self.assertIn(
+                    "<responseDate>2030-01-02T03:04:05+00:00</responseDate>", content
+                )
+                self.assertEqual(
+                    re.sub(r"<responseDate>[^<]+", "", pages[1][1]),
+                    re.sub(r"<responseDate>[^<]+", "", content),
+                )
+
+                with (
+                    mock.patch.object(
+                        snapshots, "SNAPSHOT_SENDFILE", "X-Accel-Redirect"
+                    ),
+                    mock.patch.object(snapshots, "SNAPSHOT_URL", "/snapshots/"),
+                ):
+                    response = views.oai2(request)
+                self.assertRegex(
+                    response.headers["X-Accel-Redirect"], r"^/snapshots/\d+/0/1.xml.gz$"
+                )
+
+                header = Header.objects.get(identifier="oai:000")
+                header.save()
+                self.assertIsNone(snapshots.current())
+                pages = harvest(url)
+                self.assertNotIn("snapshot-", pages[0][1])
+                self.assertFalse(pages[0][0].streaming)
+                self.assertEqual(len(expected), len(records(pages)))
+                self.assertEqual(
+                    1, len(harvest(f"/oai2?verb=ListRecords&resumptionToken={token}"))
+                )
+
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    def test_list_num_queries(self):
+        request = self.factory.get("/oai2?verb=ListRecords&metadataPrefix=oai_dc")
+        request.user = AnonymousUser()
+        with self.assertNumQueries(9):
+            response = views.oai2(request)
+        self.assertEqual(response.status_code, 200)
+        token = re.search(
+            r"<resumptionToken[^>]+>(?P<token>[^<]+)</resumptionToken>",
+            response.content.decode("utf8"),
+        ).group("token")
+
+        request = self.factory.get(f"/oai2?verb=ListRecords&resumptionToken={token}")
+        request.user = AnonymousUser()
+        with self.assertNumQueries(5):
+            response = views.oai2(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(50, response.content.decode("utf8").count("<record>"))
+
 
 class ListSetTestCase(TestCase):
     def setUp(self):
@@ -395,6 +1918,86 @@ class ListSetTestCase(TestCase):
         doc = etree.parse(BytesIO(response.content))
         self.assertTrue(xmlschema.validate(doc))
 
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    def test_list_hierarchy(self):
+        oai_dc = MetadataFormat.objects.get(prefix="oai_dc")
+        sets = {
+            spec: Set.objects.create(spec=spec, name=spec)
+            for spec in ["a", "a:b", "a:b:c", "ab", "b:a"]
+        }
+        for i in range(150):
+            header = Header.objects.create(identifier=f"oai:{i:03d}")
+            header.metadata_formats.add(oai_dc)
+            header.sets.add(sets[["a", "a:b", "a:b:c", "ab", "b:a"][i % 5]])
+            if i % 5 == 0:
+                header.sets.add(sets["a:b"])
+        call_command("oai_rebuild_harvest", stdout=StringIO())
+
+        def harvest(url):
+            identifiers = []
+            while url:
+                request = self.factory.get(url)
+                request.user = AnonymousUser()
+                content = views.oai2(request).content.decode("utf8")
+                identifiers += re.findall(r"<identifier>([^<]+)</identifier>", content)
+                match = re.search(r">(?P<token>[^<]+)</resumptionToken>", content)
+                url = (
+                    f"/oai2?verb=ListIdentifiers&resumptionToken={match['token']}"
+                    if match
+                    else None
+                )
+            return identifiers
+
+        expected = {
+            "a": [f"oai:{i:03d}" for i in range(150) if i % 5 < 3],
+            "a:b": [f"oai:{i:03d}" for i in range(150) if i % 5 < 3],
+            "a:b:c": [f"oai:{i:03d}" for i in range(150) if i % 5 == 2],
+            "b": [],
+        }
+        for harvest_table in [False, True]:
+            for pagination in ["offset", "keyset"]:
+                with (
+                    mock.patch.object(views, "HARVEST_TABLE", harvest_table),
+                    mock.patch.object(views, "PAGINATION", pagination),
+                ):
+                    for spec, identifiers in expected.items():
+                        self.assertEqual(
+                            harvest(
+                                "/oai2?verb=ListIdentifiers&metadataPrefix=oai_dc"
+                                + f"&set={spec}"
+                            ),
+                            identifiers,
+                        )
+
+        sets["a:b:c"].spec = "b:c"
+        sets["a:b:c"].save()
+        self.assertEqual(
+            harvest("/oai2?verb=ListIdentifiers&metadataPrefix=oai_dc&set=a"),
+            [f"oai:{i:03d}" for i in range(150) if i % 5 < 2],
+        )
+
+        for i in range(200):
+            Set.objects.create(spec=f"c:{i}", name=f"{200 - i}")
+        specs = []
+        url = "/oai2?verb=ListSets"
+        with mock.patch.object(views, "PAGINATION", "keyset"):
+            while url:
+                request = self.factory.get(url)
+                request.user = AnonymousUser()
+                content = views.oai2(request).content.decode("utf8")
+                specs += re.findall(r"<setSpec>([^<]+)</setSpec>", content)
+                match = re.search(r">(?P<token>[^<]+)</resumptionToken>", content)
+                url = (
+                    f"/oai2?verb=ListSets&resumptionToken={match['token']}"
+                    if match
+                    else None
+                )
+        self.assertEqual(
+            specs, list(Set.objects.order_by("spec").values_list("spec", flat=True))
+        )
+
     @override_settings(
         ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
     )
@@ -488,3 +2091,94 @@ class GetRecordTestCase(TestCase):
             OAI_DC_RECORD[OAI_DC_RECORD.index("\n") + 1 :]
             in response.content.decode("utf8")
         )
+
+    @mock.patch.object(compression, "COMPRESSION_CACHE_TIMEOUT", 60)
+    async def test_get_record_async_compression(self):
+        with override_settings(
+            ADMINS=[("jnphilipp", "nathanael@philipp.land")],
+            ALLOWED_HOSTS=("test.com"),
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+                    "LOCATION": "django_oai_pmh_test_cache",
+                }
+            },
+        ):
+            await sync_to_async(call_command)("createcachetable")
+            for url in [
+                "/oai2?verb=GetRecord&identifier=test:1&metadataPrefix=oai_dc",
+                "/oai2?verb=Identify",
+            ]:
+                request = self.factory.get(url, HTTP_ACCEPT_ENCODING="gzip")
+                request.user = AnonymousUser()
+                response = await views.aoai2(request)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.headers["Content-Encoding"], "gzip")
+                self.assertEqual(
+                    await cache.aget(
+                        compression.CACHE_KEY.format(
+                            encoding="gzip", etag=response.headers["ETag"]
+                        )
+                    ),
+                    response.content,
+                )
+
+                cached = await views.aoai2(request)
+                self.assertEqual(cached.headers["Content-Encoding"], "gzip")
+                self.assertEqual(cached.headers["ETag"], response.headers["ETag"])
+                self.assertEqual(cached.content, response.content)
+
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    def test_get_record_num_queries(self):
+        request = self.factory.get(
+            "/oai2?verb=GetRecord&identifier=test:2&metadataPrefix=oai_dc"
+        )
+        request.user = AnonymousUser()
+        with self.assertNumQueries(5):
+            response = views.oai2(request)
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(
+        ADMINS=[("jnphilipp", "nathanael@philipp.land")], ALLOWED_HOSTS=("test.com")
+    )
+    def test_get_record_conditional(self):
+        url = "/oai2?verb=GetRecord&identifier=test:1&metadataPrefix=oai_dc"
+        request = self.factory.get(url)
+        request.user = AnonymousUser()
+        with mock.patch.object(views, "CACHE_CONTROL", {"max_age": 3600}):
+            response = views.oai2(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual("max-age=3600", response.headers["Cache-Control"])
+        etag = response.headers["ETag"]
+        last_modified = response.headers["Last-Modified"]
+
+        request = self.factory.get(url, headers={"If-None-Match": etag})
+        request.user = AnonymousUser()
+        with self.assertNumQueries(1):
+            response = views.oai2(request)
+        self.assertEqual(response.status_code, 304)
+
+        request = self.factory.get(url, headers={"If-Modified-Since": last_modified})
+        request.user = AnonymousUser()
+        response = views.oai2(request)
+        self.assertEqual(response.status_code, 304)
+
+        self.header1.timestamp = timezone.now() + timezone.timedelta(seconds=1)
+        Header.objects.filter(pk=self.header1.pk).update(
+            timestamp=self.header1.timestamp
+        )
+        request = self.factory.get(url, headers={"If-None-Match": etag})
+        request.user = AnonymousUser()
+        response = views.oai2(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(etag, response.headers["ETag"])
+
+        request = self.factory.get(
+            "/oai2?verb=GetRecord&identifier=test:3&metadataPrefix=oai_dc"
+        )
+        request.user = AnonymousUser()
+        response = views.oai2(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response.headers)
@@ -0,0 +1,225 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""OAI-PMH Django app rate limiting and load shedding.
+
+Every client, by IP address and User-Agent, has a token bucket of RATE_LIMIT_BURST
+requests that refills with RATE_LIMIT requests per second. At most
+MAX_CONCURRENT_REQUESTS requests are answered at the same time, by all processes
+together. Requests over either limit are answered with ``503 Service Unavailable``
+and a ``Retry-After`` header, as the OAI-PMH protocol recommends, before any query
+is run.
+
+The state is kept in the cache, so a shared cache backend limits a whole cluster.
+A bucket is stored as the time at which it is full again. Reading and writing it
+is not atomic, concurrent requests of one client may thus slightly exceed the
+burst. The number of running requests is kept with ``incr`` and ``decr``. It is
+reset every CONCURRENCY_TIMEOUT seconds, so requests of killed processes are not
+counted forever.
+"""
+
+import hashlib
+import math
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.core.cache import cache
+from django.http import HttpResponse
+from functools import wraps
+from typing import Iterator, Optional, Tuple
+
+from .settings import MAX_CONCURRENT_REQUESTS, RATE_LIMIT, RATE_LIMIT_BURST
+
+
+BUCKET_KEY = "django_oai_pmh:throttling:bucket:{client}"
+CONCURRENCY_KEY = "django_oai_pmh:throttling:concurrency"
+CONCURRENCY_TIMEOUT = 60
+# Seconds after which to retry if too many requests are running.
+BUSY_RETRY_AFTER = 1
+
+
+def client(request) -> str:
+    """Get the key of the client of request, from IP address and User-Agent."""
+    return hashlib.sha1(
+        "\n".join(
+            [request.META.get("REMOTE_ADDR", ""), request.headers.get("User-Agent", "")]
+        ).encode("utf8")
+    ).hexdigest()
+
+
+def take(
+    bucket: Optional[float], now: float, rate: float, burst: int
+) -> Tuple[Optional[float], float]:
+    """Take a token from bucket of size burst, that refills with rate tokens/sec.
+
+    Returns the new bucket, the time it is full again, and zero if a token was
+    left, or None and the seconds until the next token otherwise.
+    """
+    interval = 1 / rate
+    full = max(bucket or now, now) + interval
+    wait = full - now - burst * interval
+    if wait > 0:
+        return None, wait
+    return full, 0
+
+
+def throttle(request) -> Optional[HttpResponse]:
+    """Take a token from the bucket of the client of request.
+
+    Returns the 503 response if the bucket is empty.
+    """
+    if not RATE_LIMIT:
+        return None
+    key = BUCKET_KEY.format(client=client(request))
+    now = time.time()
+    bucket, wait = take(cache.get(key), now, RATE_LIMIT, RATE_LIMIT_BURST)
+    if bucket is None:
+        return unavailable(wait)
+    cache.set(key, bucket, math.ceil(bucket - now))
+    return None
+
+
+async def athrottle(request) -> Optional[HttpResponse]:
+    """Take a token from the bucket of the client of request, see throttle."""
+    if not RATE_LIMIT:
+        return None
+    key = BUCKET_KEY.format(client=client(request))
+    now = time.time()
+    bucket, wait = take(await cache.aget(key), now, RATE_LIMIT, RATE_LIMIT_BURST)
+    if bucket is None:
+        return unavailable(wait)
+    await cache.aset(key, bucket, math.ceil(bucket - now))
+    return None
+
+
+def acquire() -> bool:
+    """Count a running request, if fewer than MAX_CONCURRENT_REQUESTS are running."""
+    if not MAX_CONCURRENT_REQUESTS:
+        return True
+    cache.add(CONCURRENCY_KEY, 0, CONCURRENCY_TIMEOUT)
+    try:
+        running = cache.incr(CONCURRENCY_KEY)
+    except ValueError:
+        running = 1
+        cache.set(CONCURRENCY_KEY, running, CONCURRENCY_TIMEOUT)
+    if running > MAX_CONCURRENT_REQUESTS:
+        release()
+        return False
+    return True
+
+
+async def aacquire() -> bool:
+    """Count a running request, see acquire."""
+    if not MAX_CONCURRENT_REQUESTS:
+        return True
+    await cache.aadd(CONCURRENCY_KEY, 0, CONCURRENCY_TIMEOUT)
+    try:
+        running = await cache.aincr(CONCURRENCY_KEY)
+    except ValueError:
+        running = 1
+        await cache.aset(CONCURRENCY_KEY, running, CONCURRENCY_TIMEOUT)
+    if running > MAX_CONCURRENT_REQUESTS:
+        await arelease()
+        return False
+    return True
+
+
+def release():
+    """Stop counting a running request."""
+    if MAX_CONCURRENT_REQUESTS:
+        try:
+            # Below zero if the count was reset while the request was running.
+            if cache.decr(CONCURRENCY_KEY) < 0:
+                cache.incr(CONCURRENCY_KEY)
+        except ValueError:
+            pass
+
+
+async def arelease():
+    """Stop counting a running request."""
+    if MAX_CONCURRENT_REQUESTS:
+        try:
+            # Below zero if the count was reset while the request was running.
+            if await cache.adecr(CONCURRENCY_KEY) < 0:
+                await cache.aincr(CONCURRENCY_KEY)
+        except ValueError:
+            pass
+
+
+def unavailable(retry_after: float) -> HttpResponse:
+    """Get the 503 response, retry after retry_after seconds."""
+    response = HttpResponse(
+        "Too many requests, retry later.\n",
+        content_type="text/plain",
+        status=503,
+    )
+    response.headers["Retry-After"] = str(max(math.ceil(retry_after), 1))
+    return response
+
+
+def limited(view):
+    """Limit the requests of view by client and by concurrency.
+
+    Streaming responses count as running until they are sent.
+    """
+    if iscoroutinefunction(view):
+
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            response = await athrottle(request)
+            if response is not None:
+                return response
+            if not await aacquire():
+                return unavailable(BUSY_RETRY_AFTER)
+            try:
+                response = await view(request, *args, **kwargs)
+            except BaseException:
+                await arelease()
+                raise
+            if response.streaming:
+                response.streaming_content = _stream(response.streaming_content)
+            else:
+                await arelease()
+            return response
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = throttle(request)
+        if response is not None:
+            return response
+        if not acquire():
+            return unavailable(BUSY_RETRY_AFTER)
+        try:
+            response = view(request, *args, **kwargs)
+        except BaseException:
+            release()
+            raise
+        if response.streaming:
+            response.streaming_content = _stream(response.streaming_content)
+        else:
+            release()
+        return response
+
+    return wrapper
+
+
+def _stream(streaming_content) -> Iterator[bytes]:
+    try:
+        yield from streaming_content
+    finally:
+        release()
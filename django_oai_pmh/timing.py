@@ -0,0 +1,176 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""OAI-PMH Django app request timing.
+
+Records the time spent per phase of a request and the number and time of database
+queries. Enabled by the TIMING setting, the timings are sent as ``Server-Timing``
+header, logged to the ``django_oai_pmh.timing`` logger and passed to the
+TIMING_CALLBACK.
+"""
+
+import logging
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.module_loading import import_string
+from functools import wraps
+from time import perf_counter
+from typing import Dict, Optional
+
+from .settings import TIMING, TIMING_CALLBACK
+
+
+PHASES = ("parse", "build", "count", "fetch", "render", "token")
+"""Phases of a request.
+
+* parse: argument parsing and loading of resumption tokens
+* build: everything not in another phase, mostly building querysets and checking
+  arguments against the database
+* count: counting the complete list size
+* fetch: fetching the records of a page
+* render: template rendering, includes token
+* token: issuing a resumption token
+"""
+
+logger = logging.getLogger(__name__)
+_timer: ContextVar[Optional["Timer"]] = ContextVar("_timer", default=None)
+
+
+class Timer:
+    """Timings of a request."""
+
+    def __init__(self) -> None:
+        """Init."""
+        self.phases: Dict[str, float] = {}
+        self.queries = 0
+        self.query_time = 0.0
+        self.total = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Count and time a database query, used as execute wrapper."""
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.query_time += perf_counter() - start
+
+    def as_dict(self) -> Dict[str, float]:
+        """Get the durations in ms."""
+        phases = {p: self.phases.get(p, 0.0) for p in PHASES}
+        phases["build"] = max(
+            self.total - sum(v for k, v in phases.items() if k != "token"), 0.0
+        )
+        durations = {k: v * 1000 for k, v in phases.items()}
+        durations["db"] = self.query_time * 1000
+        durations["total"] = self.total * 1000
+        return durations
+
+    def server_timing(self) -> str:
+        """Format as ``Server-Timing`` header value."""
+        metrics = []
+        for name, duration in self.as_dict().items():
+            metric = f"{name};dur={duration:.3f}"
+            if name == "db":
+                metric += f';desc="{self.queries} queries"'
+            metrics.append(metric)
+        return ", ".join(metrics)
+
+
+@contextmanager
+def phase(name: str):
+    """Add the time spent in the block to phase name of the current request."""
+    timer = _timer.get()
+    if timer is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timer.phases[name] = timer.phases.get(name, 0.0) + perf_counter() - start
+
+
+def instrument(view):
+    """Time requests of view, if TIMING is enabled.
+
+    Streaming responses are only timed until the response is returned. Queries are
+    counted on the default database. TIMING_CALLBACK, a callable or its dotted path,
+    is called with the request, the response and the Timer.
+    """
+    if iscoroutinefunction(view):
+
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if not TIMING:
+                return await view(request, *args, **kwargs)
+
+            timer = Timer()
+            token = _timer.set(timer)
+            start = perf_counter()
+            # Queries run in the thread of sync_to_async, on its connection.
+            connection = await sync_to_async(connections.__getitem__)(DEFAULT_DB_ALIAS)
+            try:
+                with connection.execute_wrapper(timer):
+                    response = await view(request, *args, **kwargs)
+            finally:
+                timer.total = perf_counter() - start
+                _timer.reset(token)
+            return _finish(request, response, timer)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not TIMING:
+            return view(request, *args, **kwargs)
+
+        timer = Timer()
+        token = _timer.set(timer)
+        start = perf_counter()
+        try:
+            with connections[DEFAULT_DB_ALIAS].execute_wrapper(timer):
+                response = view(request, *args, **kwargs)
+        finally:
+            timer.total = perf_counter() - start
+            _timer.reset(token)
+        return _finish(request, response, timer)
+
+    return wrapper
+
+
+def _finish(request, response, timer: Timer):
+    """Add the Server-Timing header to response, log and call TIMING_CALLBACK."""
+    response.headers["Server-Timing"] = timer.server_timing()
+    logger.debug(
+        "%s %s: %s",
+        request.method,
+        request.get_full_path(),
+        timer.server_timing(),
+    )
+    callback = _callback()
+    if callback is not None:
+        callback(request, response, timer)
+    return response
+
+
+def _callback():
+    if isinstance(TIMING_CALLBACK, str):
+        return import_string(TIMING_CALLBACK)
+    return TIMING_CALLBACK
@@ -0,0 +1,190 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""OAI-PMH Django app resumption tokens.
+
+A resumption token backend stores the state of a list request and returns a token
+for it, which is later used to load that state again. The state is a dict with the
+keys ``metadata_prefix``, ``set_spec``, ``from_timestamp``, ``until_timestamp``,
+``cursor``, ``complete_list_size``, ``last_key`` and ``expiration_date``.
+"""
+
+from datetime import datetime, timezone as dt_timezone
+from django.core import signing
+from django.utils import timezone
+from os import urandom
+from typing import Any, Dict, Optional
+
+from .models import MetadataFormat, ResumptionToken, Set
+from .settings import RESUMPTION_TOKEN_BACKEND
+
+
+class BadResumptionToken(Exception):
+    """The resumption token is invalid."""
+
+
+class ExpiredResumptionToken(BadResumptionToken):
+    """The resumption token is expired."""
+
+
+class DatabaseBackend:
+    """Store resumption tokens in the database as ResumptionToken."""
+
+    def issue(self, state: Dict[str, Any]) -> str:
+        """Save state and return token."""
+        token = "".join("%02x" % i for i in urandom(16))
+
+        metadata_format = None
+        if state["metadata_prefix"]:
+            metadata_format = MetadataFormat.objects.get(
+                prefix=state["metadata_prefix"]
+            )
+        set_obj = None
+        if state["set_spec"]:
+            set_obj = Set.objects.get(spec=state["set_spec"])
+
+        ResumptionToken.objects.create(
+            token=token,
+            expiration_date=state["expiration_date"],
+            complete_list_size=state["complete_list_size"],
+            cursor=state["cursor"],
+            metadata_prefix=metadata_format,
+            set_spec=set_obj,
+            from_timestamp=state["from_timestamp"],
+            until_timestamp=state["until_timestamp"],
+            last_identifier=state["last_key"][0] if state["last_key"] else None,
+            last_id=state["last_key"][1] if state["last_key"] else None,
+        )
+        return token
+
+    def load(self, token: str) -> Dict[str, Any]:
+        """Load state of token."""
+        try:
+            rt = ResumptionToken.objects.select_related(
+                "metadata_prefix", "set_spec"
+            ).get(token=token)
+        except ResumptionToken.DoesNotExist:
+            raise BadResumptionToken(token)
+        if timezone.now() > rt.expiration_date:
+            raise ExpiredResumptionToken(token)
+
+        return {
+            "metadata_prefix": (
+                rt.metadata_prefix.prefix if rt.metadata_prefix else None
+            ),
+            "set_spec": rt.set_spec.spec if rt.set_spec else None,
+            "from_timestamp": rt.from_timestamp,
+            "until_timestamp": rt.until_timestamp,
+            "cursor": rt.cursor,
+            "complete_list_size": rt.complete_list_size,
+            "last_key": (
+                (rt.last_identifier, rt.last_id)
+                if rt.last_identifier is not None
+                else None
+            ),
+            "expiration_date": rt.expiration_date,
+        }
+
+
+class SignedBackend:
+    """Pack the state into the token itself, signed with ``SECRET_KEY``.
+
+    Nothing is written to the database, so harvests can be served from read
+    replicas.
+    """
+
+    salt = "django_oai_pmh.tokens.SignedBackend"
+
+    def issue(self, state: Dict[str, Any]) -> str:
+        """Sign state and return it as token."""
+        return signing.dumps(
+            [
+                state["metadata_prefix"],
+                state["set_spec"],
+                self._timestamp(state["from_timestamp"]),
+                self._timestamp(state["until_timestamp"]),
+                state["cursor"],
+                state["complete_list_size"],
+                list(state["last_key"]) if state["last_key"] else None,
+                self._timestamp(state["expiration_date"]),
+            ],
+            salt=self.salt,
+            compress=True,
+        )
+
+    def load(self, token: str) -> Dict[str, Any]:
+        """Check signature of token and return its state."""
+        try:
+            (
+                metadata_prefix,
+                set_spec,
+                from_timestamp,
+                until_timestamp,
+                cursor,
+                complete_list_size,
+                last_key,
+                expiration_date,
+            ) = signing.loads(token, salt=self.salt)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise BadResumptionToken(token)
+
+        state = {
+            "metadata_prefix": metadata_prefix,
+            "set_spec": set_spec,
+            "from_timestamp": self._datetime(from_timestamp),
+            "until_timestamp": self._datetime(until_timestamp),
+            "cursor": cursor,
+            "complete_list_size": complete_list_size,
+            "last_key": tuple(last_key) if last_key else None,
+            "expiration_date": self._datetime(expiration_date),
+        }
+        if timezone.now() > state["expiration_date"]:
+            raise ExpiredResumptionToken(token)
+        return state
+
+    def _datetime(self, timestamp: Optional[int]) -> Optional[datetime]:
+        if timestamp is None:
+            return None
+        return datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+
+    def _timestamp(self, dt: Optional[datetime]) -> Optional[int]:
+        return None if dt is None else int(dt.timestamp())
+
+
+BACKENDS = {
+    "database": DatabaseBackend,
+    "signed": SignedBackend,
+}
+
+
+def get_backend():
+    """Get the resumption token backend configured in RESUMPTION_TOKEN_BACKEND."""
+    return BACKENDS[RESUMPTION_TOKEN_BACKEND]()
+
+
+def issue(state: Dict[str, Any]) -> str:
+    """Issue a resumption token for state."""
+    return get_backend().issue(state)
+
+
+def load(token: str) -> Dict[str, Any]:
+    """Load the state of a resumption token.
+
+    Raises:
+     * BadResumptionToken: if the token is unknown or invalid
+     * ExpiredResumptionToken: if the token is expired
+    """
+    return get_backend().load(token)
@@ -19,9 +19,12 @@
 from django.urls import path
 
 from . import views
+from .settings import ASYNC, METRICS_URL
 
 
 app_name = "oai2"
 urlpatterns = [
-    path("", views.oai2, name="oai2"),
+    path("", views.aoai2 if ASYNC else views.oai2, name="oai2"),
 ]
+if METRICS_URL:
+    urlpatterns.append(path(METRICS_URL, views.metrics_view, name="metrics"))
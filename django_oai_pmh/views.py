@@ -16,23 +16,147 @@
 # along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
 """OAI-PMH Django app views."""
 
+import asyncio
+
+from asgiref.sync import sync_to_async
 from datetime import datetime
 from django.core.paginator import Paginator, EmptyPage
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
-from django.utils import timezone
+from django.template.loader import get_template, render_to_string
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from django.views.decorators.csrf import csrf_exempt
+from itertools import islice
+from typing import Dict, List
 
-from .models import Header, MetadataFormat, Set, ResumptionToken
-from .settings import NUM_PER_PAGE
+from . import (
+    changelog,
+    coalescing,
+    compression,
+    conditional,
+    counts,
+    metrics,
+    serializers,
+    sets,
+    snapshots,
+    throttling,
+    timing,
+    tokens,
+)
+from .models import HarvestHeader, Header, MetadataFormat, Set
+from .records import cached_record, prefetch_records
+from .paginator import KeysetPaginator
+from .settings import (
+    CACHE_CONTROL,
+    CHANGE_LOG,
+    COMPLETE_LIST_SIZE,
+    COMPLETE_LIST_SIZE_ESTIMATE,
+    HARVEST_TABLE,
+    NUM_PER_PAGE,
+    PAGINATION,
+    RECORD_CACHE,
+    SERIALIZER,
+    SNAPSHOT_DIR,
+    STREAMING,
+    STREAMING_CHUNK_SIZE,
+)
+from .templatetags.oai_pmh import resumption_token as resumption_token_tag
 
 
 @csrf_exempt
+@metrics.instrument
+@timing.instrument
+@compression.compressed
+@throttling.limited
+@coalescing.coalesced
 def oai2(request):
     """Handels all OAI-PMH v2 requets.
 
     For details see https://www.openarchives.org/OAI/openarchivesprotocol.html
     """
+    return _oai2(request)
+
+
+@metrics.instrument
+@timing.instrument
+@compression.compressed
+@throttling.limited
+@coalescing.coalesced
+async def aoai2(request):
+    """Handle OAI-PMH v2 requests asynchronously.
+
+    Well-formed GetRecord, ListIdentifiers and ListRecords requests are answered
+    with the async ORM, their independent checks run concurrently. All other
+    requests, requests that result in an error, except for bad resumption tokens,
+    and streaming responses are answered by ``oai2`` in a thread.
+    """
+    params = request.POST.copy() if request.method == "POST" else request.GET.copy()
+    if SNAPSHOT_DIR:
+        response = await sync_to_async(_snapshot_response)(request, params)
+        if response is not None:
+            return response
+    verb = params.getlist("verb")[-1] if "verb" in params else None
+    if any(len(v) != 1 for k, v in params.lists() if k != "verb"):
+        verb = None
+
+    context = None
+    if verb == "GetRecord":
+        context = await _aget_record(request, params)
+    elif verb in ("ListIdentifiers", "ListRecords") and not STREAMING:
+        context = await _alist_headers(params, verb)
+    if context is None:
+        return await sync_to_async(_oai2)(request)
+    if isinstance(context, HttpResponse):
+        return context
+
+    errors = context["errors"]
+    headers = context.get("headers")
+    if not errors and headers is not None:
+        with timing.phase("fetch"):
+            headers.object_list = [h async for h in headers.object_list]
+        with timing.phase("count"):
+            await sync_to_async(lambda: context["paginator"].count)()
+        records = len(headers)
+    else:
+        records = 1 if not errors else 0
+    metrics.set_request(verb, records, errors)
+
+    with timing.phase("render"):
+        response = await sync_to_async(render)(
+            request,
+            context["template"] if not errors else "django_oai_pmh/error.xml",
+            context,
+            content_type="text/xml",
+        )
+    if not errors:
+        _set_validators(response, context["etag"], context["last_modified"])
+    return response
+
+
+aoai2.csrf_exempt = True  # type: ignore[attr-defined]
+
+
+def _oai2(request):
     params = request.POST.copy() if request.method == "POST" else request.GET.copy()
+    if SNAPSHOT_DIR:
+        response = _snapshot_response(request, params)
+        if response is not None:
+            return response
+
+    etag, last_modified = None, None
+    if request.method in ("GET", "HEAD"):
+        etag, last_modified = conditional.get_validators(params)
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=int(last_modified.timestamp()) if last_modified else None,
+        )
+        if response is not None:
+            return _set_validators(response, etag, last_modified)
+        response = _cached_response(request, params, etag, last_modified)
+        if response is not None:
+            return response
 
     errors = []
     verb = None
@@ -42,6 +166,9 @@ def oai2(request):
     from_timestamp = None
     until_timestamp = None
     resumption_token = None
+    paginator = None
+    record_cache = RECORD_CACHE
+    serializer = SERIALIZER
 
     if "verb" in params:
         verb = params.pop("verb")[-1]
@@ -61,7 +188,10 @@ def oai2(request):
                     if "identifier" in params:
                         identifier = params.pop("identifier")[-1]
                         try:
-                            header = Header.objects.get(identifier=identifier)
+                            with timing.phase("fetch"):
+                                header = prefetch_records(
+                                    Header.objects.all(), metadata_prefix
+                                ).get(identifier=identifier)
                         except Header.DoesNotExist:
                             errors.append(_error("idDoesNotExist", identifier))
                     else:
@@ -81,7 +211,7 @@ def oai2(request):
             template = "django_oai_pmh/listidentifiers.xml"
 
             if "resumptionToken" in params:
-                header_list = Header.objects.all()
+                header_list = _identifier_list()
                 (
                     paginator,
                     headers,
@@ -102,34 +232,42 @@ def oai2(request):
                             _error("cannotDisseminateFormat", metadata_prefix)
                         )
                     else:
-                        header_list = Header.objects.filter(
-                            metadata_formats__prefix=metadata_prefix
+                        header_list = _filter_headers(
+                            _identifier_list(), metadata_prefix
                         )
 
                         if "set" in params:
-                            if Set.objects.all().count() == 0:
+                            if not Set.objects.exists():
                                 errors.append(_error("noSetHierarchy"))
                             else:
                                 set_spec = params.pop("set")[-1]
-                                header_list = header_list.filter(sets__spec=set_spec)
+                                header_list = _filter_headers(
+                                    header_list, set_spec=set_spec
+                                )
 
                         from_timestamp, until_timestamp = _check_timestamps(
                             params, errors
                         )
-                        if from_timestamp:
-                            header_list = header_list.filter(
-                                timestamp__gte=from_timestamp
-                            )
-                        if until_timestamp:
-                            header_list = header_list.filter(
-                                timestamp__lte=until_timestamp
-                            )
+                        header_list = _filter_timestamps(
+                            header_list,
+                            from_timestamp,
+                            until_timestamp,
+                            metadata_prefix,
+                            set_spec,
+                        )
 
-                        if header_list.count() == 0 and not errors:
+                        if not errors and not header_list.exists():
                             errors.append(_error("noRecordsMatch"))
                         else:
-                            paginator = Paginator(header_list, NUM_PER_PAGE)
-                            headers = paginator.page(1)
+                            paginator, headers = _paginate_headers(
+                                header_list,
+                                count=_complete_list_size(
+                                    header_list,
+                                    metadata_prefix,
+                                    set_spec,
+                                    from_timestamp or until_timestamp,
+                                ),
+                            )
                 else:
                     errors.append(
                         _error("badArgument_single", ";".join(metadata_prefix))
@@ -169,7 +307,7 @@ def oai2(request):
                     metadata_prefix,
                     from_timestamp,
                     until_timestamp,
-                ) = _do_resumption_token(params, errors, header_list)
+                ) = _do_resumption_token(params, errors, header_list, records=True)
             elif "metadataPrefix" in params:
                 metadata_prefix = params.pop("metadataPrefix")
                 if len(metadata_prefix) == 1:
@@ -186,28 +324,36 @@ def oai2(request):
                         )
 
                         if "set" in params:
-                            if Set.objects.all().count() == 0:
+                            if not Set.objects.exists():
                                 errors.append(_error("noSetHierarchy"))
                             else:
                                 set_spec = params.pop("set")[-1]
-                                header_list = header_list.filter(sets__spec=set_spec)
+                                header_list = _filter_headers(
+                                    header_list, set_spec=set_spec
+                                )
                         from_timestamp, until_timestamp = _check_timestamps(
                             params, errors
                         )
-                        if from_timestamp:
-                            header_list = header_list.filter(
-                                timestamp__gte=from_timestamp
-                            )
-                        if until_timestamp:
-                            header_list = header_list.filter(
-                                timestamp__lte=until_timestamp
-                            )
+                        header_list = _filter_timestamps(
+                            header_list,
+                            from_timestamp,
+                            until_timestamp,
+                            metadata_prefix,
+                            set_spec,
+                        )
 
-                        if header_list.count() == 0 and not errors:
+                        if not errors and not header_list.exists():
                             errors.append(_error("noRecordsMatch"))
                         else:
-                            paginator = Paginator(header_list, NUM_PER_PAGE)
-                            headers = paginator.page(1)
+                            paginator, headers = _paginate_headers(
+                                prefetch_records(header_list, metadata_prefix),
+                                count=_complete_list_size(
+                                    header_list,
+                                    metadata_prefix,
+                                    set_spec,
+                                    from_timestamp or until_timestamp,
+                                ),
+                            )
                 else:
                     errors.append(
                         _error("badArgument_single", ";".join(metadata_prefix))
@@ -236,14 +382,360 @@ def oai2(request):
     else:
         errors.append(_error("badVerb"))
 
-    return render(
-        request,
-        template if not errors else "django_oai_pmh/error.xml",
-        locals(),
-        content_type="text/xml",
+    if paginator is not None and not errors:
+        with timing.phase("count"):
+            paginator.count
+
+    records = 0
+    if not errors and verb == "GetRecord":
+        records = 1
+    elif not errors and verb in ("ListIdentifiers", "ListRecords"):
+        records = headers.end_index() - headers.start_index() + 1
+    metrics.set_request(verb, records, errors)
+
+    if (
+        STREAMING
+        and not errors
+        and verb in ("ListIdentifiers", "ListRecords")
+        and paginator is not None
+    ):
+        return StreamingHttpResponse(
+            _stream(request, locals()), content_type="text/xml"
+        )
+    if paginator is not None and not errors:
+        with timing.phase("fetch"):
+            len((sets if verb == "ListSets" else headers).object_list)
+
+    with timing.phase("render"):
+        response = render(
+            request,
+            template if not errors else "django_oai_pmh/error.xml",
+            locals(),
+            content_type="text/xml",
+        )
+    if not errors:
+        _set_validators(response, etag, last_modified)
+    return response
+
+
+async def _aget_record(request, params):
+    """Get the context of a GetRecord request.
+
+    Returns None if the request has to be answered by ``oai2``, or the response if
+    it's not modified.
+    """
+    if set(params) != {"verb", "identifier", "metadataPrefix"}:
+        return None
+    etag, last_modified = None, None
+    if request.method in ("GET", "HEAD"):
+        etag, last_modified = await sync_to_async(conditional.get_validators)(params)
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=int(last_modified.timestamp()) if last_modified else None,
+        )
+        if response is not None:
+            return _set_validators(response, etag, last_modified)
+        response = await _acached_response(request, params, etag, last_modified)
+        if response is not None:
+            return response
+
+    metadata_prefix = params["metadataPrefix"]
+    with timing.phase("fetch"):
+        exists, header = await asyncio.gather(
+            MetadataFormat.objects.filter(prefix=metadata_prefix).aexists(),
+            prefetch_records(Header.objects.all(), metadata_prefix)
+            .filter(identifier=params["identifier"])
+            .afirst(),
+        )
+    if not exists or header is None:
+        return None
+    return _context(
+        "django_oai_pmh/getrecord.xml",
+        verb="GetRecord",
+        identifier=params["identifier"],
+        metadata_prefix=metadata_prefix,
+        header=header,
+        etag=etag,
+        last_modified=last_modified,
+    )
+
+
+async def _alist_headers(params, verb):
+    """Get the context of a ListIdentifiers or ListRecords request.
+
+    Returns None if the request has to be answered by ``oai2``.
+    """
+    template = f"django_oai_pmh/{verb.lower()}.xml"
+    if set(params) == {"verb", "resumptionToken"}:
+        params.pop("verb")
+        errors: List[Dict[str, str]] = []
+        (
+            paginator,
+            headers,
+            resumption_token,
+            set_spec,
+            metadata_prefix,
+            from_timestamp,
+            until_timestamp,
+        ) = await sync_to_async(_do_resumption_token)(
+            params,
+            errors,
+            Header.objects.all() if verb == "ListRecords" else _identifier_list(),
+            records=verb == "ListRecords",
+        )
+        return _context(
+            template,
+            errors=errors,
+            verb=verb,
+            metadata_prefix=metadata_prefix,
+            set_spec=set_spec,
+            from_timestamp=from_timestamp,
+            until_timestamp=until_timestamp,
+            resumption_token=resumption_token,
+            paginator=paginator,
+            headers=headers,
+        )
+    if "metadataPrefix" not in params or not set(params) <= {
+        "verb",
+        "metadataPrefix",
+        "set",
+        "from",
+        "until",
+    }:
+        return None
+
+    errors = []
+    from_timestamp, until_timestamp = _check_timestamps(params, errors)
+    if errors:
+        return None
+    metadata_prefix = params["metadataPrefix"]
+    set_spec = params.get("set")
+    header_list = _filter_headers(
+        _identifier_list() if verb == "ListIdentifiers" else Header.objects.all(),
+        metadata_prefix,
+        set_spec,
+    )
+    header_list = _filter_timestamps(
+        header_list, from_timestamp, until_timestamp, metadata_prefix, set_spec
+    )
+
+    checks = [
+        MetadataFormat.objects.filter(prefix=metadata_prefix).aexists(),
+        header_list.aexists(),
+    ]
+    if set_spec is not None:
+        checks.append(Set.objects.aexists())
+    if not all(await asyncio.gather(*checks)):
+        return None
+
+    if verb == "ListRecords":
+        objs = prefetch_records(header_list, metadata_prefix)
+    else:
+        objs = header_list
+    count = sync_to_async(_complete_list_size)(
+        header_list, metadata_prefix, set_spec, from_timestamp or until_timestamp
+    )
+    if PAGINATION == "keyset":
+        # The first keyset page doesn't depend on the complete list size.
+        complete_list_size, (paginator, headers) = await asyncio.gather(
+            count, sync_to_async(_paginate_headers)(objs)
+        )
+        if complete_list_size is not None:
+            paginator.count = complete_list_size
+    else:
+        paginator, headers = await sync_to_async(_paginate_headers)(
+            objs, count=await count
+        )
+    return _context(
+        template,
+        verb=verb,
+        metadata_prefix=metadata_prefix,
+        set_spec=set_spec,
+        from_timestamp=from_timestamp,
+        until_timestamp=until_timestamp,
+        paginator=paginator,
+        headers=headers,
+    )
+
+
+def _context(template, **kwargs):
+    """Get the template context of a response of ``aoai2``."""
+    context = {
+        "template": template,
+        "errors": [],
+        "verb": None,
+        "identifier": None,
+        "metadata_prefix": None,
+        "set_spec": None,
+        "from_timestamp": None,
+        "until_timestamp": None,
+        "resumption_token": None,
+        "paginator": None,
+        "record_cache": RECORD_CACHE,
+        "serializer": SERIALIZER,
+        "etag": None,
+        "last_modified": None,
+    }
+    context.update(kwargs)
+    return context
+
+
+def metrics_view(request):
+    """Serve the metrics in the Prometheus text format."""
+    return HttpResponse(
+        metrics.exposition(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+def _stream(request, context):
+    """Stream a ListIdentifiers or ListRecords response.
+
+    Writes the envelope, then every header or record as it is fetched from a
+    server-side cursor and finally the resumption token, so memory stays flat
+    regardless of the page size.
+    """
+    head, tail = render_to_string("django_oai_pmh/stream.xml", context, request).split(
+        "<!-- django_oai_pmh:records -->"
+    )
+    yield head
+
+    headers = context["headers"]
+    iterator = headers.object_list.iterator(chunk_size=STREAMING_CHUNK_SIZE)
+    if RECORD_CACHE and context["verb"] == "ListRecords":
+        for header in iterator:
+            yield cached_record(header, context["metadata_prefix"])
+    elif SERIALIZER == "fast":
+        # Serialized in chunks, so the Dublin Core values are loaded per chunk.
+        while True:
+            chunk = list(islice(iterator, STREAMING_CHUNK_SIZE))
+            if not chunk:
+                break
+            out: List[str] = []
+            if context["verb"] == "ListRecords":
+                serializers.write_records(out, chunk, context["metadata_prefix"])
+            else:
+                serializers.write_headers(out, chunk)
+            yield "".join(out)
+    else:
+        if context["verb"] == "ListRecords":
+            template = get_template("django_oai_pmh/partials/_record.xml")
+        else:
+            template = get_template("django_oai_pmh/partials/_header.xml")
+        for header in iterator:
+            yield template.render(
+                {"header": header, "metadata_prefix": context["metadata_prefix"]},
+                request,
+            )
+
+    yield resumption_token_tag(
+        context["paginator"],
+        headers,
+        context["metadata_prefix"],
+        context["set_spec"],
+        context["from_timestamp"],
+        context["until_timestamp"],
+    )
+    yield tail
+
+
+def _identifier_list():
+    """Get the headers to list in ListIdentifiers.
+
+    With HARVEST_TABLE these are HarvestHeaders, otherwise Headers with their sets.
+    """
+    if HARVEST_TABLE:
+        return HarvestHeader.objects.all()
+    return Header.objects.prefetch_related("sets")
+
+
+def _filter_headers(header_list, metadata_prefix=None, set_spec=None):
+    """Filter Headers or HarvestHeaders on metadata prefix and set.
+
+    The set includes all sets below it.
+    """
+    if header_list.model is HarvestHeader:
+        if metadata_prefix:
+            header_list = header_list.filter(metadata_prefix=metadata_prefix)
+        if set_spec:
+            header_list = header_list.filter(
+                set_specs__overlap=sets.subset_specs(set_spec)
+            )
+        return header_list
+    if metadata_prefix:
+        header_list = header_list.filter(metadata_formats__prefix=metadata_prefix)
+    if set_spec:
+        header_list = sets.filter_headers(header_list, set_spec)
+    return header_list
+
+
+def _filter_timestamps(
+    header_list, from_timestamp, until_timestamp, metadata_prefix, set_spec
+):
+    """Filter header_list on the timestamps.
+
+    With CHANGE_LOG and from, only the headers in the change log since from are
+    considered.
+    """
+    if from_timestamp:
+        header_list = header_list.filter(timestamp__gte=from_timestamp)
+        if CHANGE_LOG:
+            changed = changelog.changed(
+                from_timestamp, until_timestamp, metadata_prefix, set_spec
+            )
+            if header_list.model is HarvestHeader:
+                header_list = header_list.filter(header_id__in=changed)
+            else:
+                header_list = header_list.filter(pk__in=changed)
+    if until_timestamp:
+        header_list = header_list.filter(timestamp__lte=until_timestamp)
+    return header_list
+
+
+def _cached_response(request, params, etag, last_modified):
+    """Get the compressed response from the cache, if there is one for etag."""
+    return _from_cache(
+        compression.cached_response(request, etag), params, etag, last_modified
+    )
+
+
+async def _acached_response(request, params, etag, last_modified):
+    """Get the compressed response from the cache, if there is one for etag."""
+    return _from_cache(
+        await compression.acached_response(request, etag),
+        params,
+        etag,
+        last_modified,
     )
 
 
+def _from_cache(response, params, etag, last_modified):
+    if response is None:
+        return None
+    metrics.set_request(params["verb"], 1 if params["verb"] == "GetRecord" else 0, [])
+    return _set_validators(response, etag, last_modified)
+
+
+def _snapshot_response(request, params):
+    """Serve a ListRecords request from a snapshot, if there is a page for it."""
+    page = snapshots.find(params)
+    if page is None:
+        return None
+    metrics.set_request("ListRecords", page[1], [])
+    return snapshots.serve(request, page[0])
+
+
+def _set_validators(response, etag, last_modified):
+    if etag:
+        response.headers["ETag"] = etag
+    if last_modified:
+        response.headers["Last-Modified"] = http_date(last_modified.timestamp())
+    if (etag or last_modified) and CACHE_CONTROL:
+        patch_cache_control(response, **CACHE_CONTROL)
+    return response
+
+
+@timing.phase("parse")
 def _check_bad_arguments(params, errors, msg=None):
     for k, v in params.copy().items():
         errors.append(
@@ -257,6 +749,7 @@ def _check_bad_arguments(params, errors, msg=None):
         params.pop(k)
 
 
+@timing.phase("parse")
 def _check_timestamps(params, errors):
     from_timestamp = None
     until_timestamp = None
@@ -283,49 +776,66 @@ def _check_timestamps(params, errors):
     return from_timestamp, until_timestamp
 
 
-def _do_resumption_token(params, errors, objs):
+def _do_resumption_token(params, errors, objs, records=False):
     set_spec = None
     metadata_prefix = None
     from_timestamp = None
     until_timestamp = None
     resumption_token = None
+    paginator = None
+    page = None
     if "resumptionToken" in params:
         resumption_token = params.pop("resumptionToken")[-1]
         try:
-            rt = ResumptionToken.objects.get(token=resumption_token)
-            if timezone.now() > rt.expiration_date:
-                errors.append(_error("badResumptionToken_expired.", resumption_token))
-            else:
-                if rt.set_spec:
-                    objs = objs.filter(sets=rt.set_spec)
-                    set_spec = rt.set_spec.spec
-                if rt.metadata_prefix:
-                    objs = objs.filter(metadata_formats=rt.metadata_prefix)
-                    metadata_prefix = rt.metadata_prefix.prefix
-                if rt.from_timestamp:
-                    objs = objs.filter(timestamp__gte=rt.from_timestamp)
-                    from_timestamp = rt.from_timestamp
-                if rt.until_timestamp:
-                    objs = objs.filter(timestamp__gte=rt.until_timestamp)
-                    until_timestamp = rt.until_timestamp
+            with timing.phase("parse"):
+                rt = tokens.load(resumption_token)
+        except tokens.ExpiredResumptionToken:
+            metrics.resumption_token("expired")
+            errors.append(_error("badResumptionToken_expired", resumption_token))
+        except tokens.BadResumptionToken:
+            metrics.resumption_token("invalid")
+            errors.append(_error("badResumptionToken", resumption_token))
+        else:
+            set_spec = rt["set_spec"]
+            metadata_prefix = rt["metadata_prefix"]
+            objs = _filter_headers(objs, metadata_prefix, set_spec)
+            if metadata_prefix and records:
+                objs = prefetch_records(objs, metadata_prefix)
+            from_timestamp = rt["from_timestamp"]
+            until_timestamp = rt["until_timestamp"]
+            objs = _filter_timestamps(
+                objs, from_timestamp, until_timestamp, metadata_prefix, set_spec
+            )
 
+            # The complete list size is fixed for the whole harvest.
+            count = None
+            if COMPLETE_LIST_SIZE == "materialized":
+                count = rt["complete_list_size"]
+
+            if rt["last_key"] is not None:
+                paginator, page = _paginate_headers(
+                    objs, rt["cursor"], rt["last_key"], count
+                )
+                if len(page) == 0:
+                    metrics.resumption_token("invalid")
+                    errors.append(_error("badResumptionToken", resumption_token))
+            else:
                 paginator = Paginator(objs, NUM_PER_PAGE)
+                if count is not None:
+                    paginator.count = count
                 try:
-                    page = paginator.page(rt.cursor / NUM_PER_PAGE + 1)
+                    with timing.phase("count"):
+                        page = paginator.page(rt["cursor"] / NUM_PER_PAGE + 1)
                 except EmptyPage:
+                    metrics.resumption_token("invalid")
                     errors.append(_error("badResumptionToken", resumption_token))
-        except ResumptionToken.DoesNotExist:
-            paginator = Paginator(objs, NUM_PER_PAGE)
-            page = paginator.page(1)
-            errors.append(_error("badResumptionToken", resumption_token))
         _check_bad_arguments(
             params,
             errors,
             msg="The usage of resumptionToken allows no other arguments.",
         )
     else:
-        paginator = Paginator(objs, NUM_PER_PAGE)
-        page = paginator.page(1)
+        paginator, page = _paginate_headers(objs)
 
     return (
         paginator,
@@ -338,6 +848,51 @@ def _do_resumption_token(params, errors, objs):
     )
 
 
+def _paginate_headers(objs, cursor=0, last=None, count=None):
+    """Paginate headers or sets according to the PAGINATION setting.
+
+    Resumption tokens that carry a last key are always continued with keyset
+    pagination, those that do not with offset pagination. Thus tokens issued before
+    the setting changed stay valid. If count is given, it is used as the complete
+    list size instead of counting objs. With keyset pagination sets are listed by
+    spec, so every set directly follows its parent.
+    """
+    if last is not None or (cursor == 0 and PAGINATION == "keyset"):
+        # Identifiers are unique within a metadata format, specs are unique.
+        ordering = "spec" if objs.model is Set else "identifier"
+        paginator = KeysetPaginator(
+            objs, NUM_PER_PAGE, cursor, last, ordering, unique=True
+        )
+        if count is not None:
+            paginator.count = count
+        with timing.phase("fetch"):
+            return paginator, paginator.page()
+    paginator = Paginator(objs, NUM_PER_PAGE)
+    if count is not None:
+        paginator.count = count
+    with timing.phase("count"):
+        return paginator, paginator.page(cursor // NUM_PER_PAGE + 1)
+
+
+@timing.phase("count")
+def _complete_list_size(header_list, metadata_prefix, set_spec, filtered):
+    """Get the complete list size from the materialized header counts.
+
+    Lists filtered by from or until, or by a set with sets below it, are estimated
+    according to COMPLETE_LIST_SIZE_ESTIMATE. Estimates are only used with keyset
+    pagination, the offset paginator relies on an exact count to cut the last page.
+    Returns None if COMPLETE_LIST_SIZE is "count", the paginator then counts the
+    headers.
+    """
+    if COMPLETE_LIST_SIZE != "materialized":
+        return None
+    elif not filtered and not (set_spec and sets.has_subsets(set_spec)):
+        return counts.get(metadata_prefix, set_spec)
+    elif COMPLETE_LIST_SIZE_ESTIMATE == "planner" and PAGINATION == "keyset":
+        return counts.estimate(header_list)
+    return header_list.count()
+
+
 def _error(code, *args):
     if code == "badArgument":
         return {
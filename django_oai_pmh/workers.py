@@ -0,0 +1,34 @@
+# Copyright (C) 2018-2026 J. Nathanael Philipp (jnphilipp) <nathanael@philipp.land>
+#
+# This file is part of django_oai_pmh.
+#
+# django_oai_pmh is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# django_oai_pmh is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with django_oai_pmh. If not, see <http://www.gnu.org/licenses/>.
+"""OAI-PMH Django app worker processes."""
+
+import django
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+
+def worker_pool(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Get a process pool whose workers set up Django before their first task.
+
+    The workers open their own database connections. Close the ones of this process
+    before, if it used any, so that they aren't shared.
+
+    Args:
+     * workers: number of worker processes, by default the number of CPUs
+    """
+    return ProcessPoolExecutor(max_workers=workers, initializer=django.setup)